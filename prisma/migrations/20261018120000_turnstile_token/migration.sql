@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "Registrant" ADD COLUMN     "turnstileToken" STRING;
+
+-- CreateIndex
+CREATE INDEX "Registrant_turnstileToken_idx" ON "Registrant"("turnstileToken");
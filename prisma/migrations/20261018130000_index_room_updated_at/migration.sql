@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "WaitingRoom_updatedAt_idx" ON "WaitingRoom"("updatedAt");
@@ -0,0 +1,20 @@
+-- CreateTable
+CREATE TABLE "RoomRegistrationCount" (
+    "waitingRoomId" UUID NOT NULL,
+    "eventChoice" STRING NOT NULL,
+    "turnstileSuccess" BOOL NOT NULL,
+    "count" INT8 NOT NULL DEFAULT 0,
+
+    CONSTRAINT "RoomRegistrationCount_pkey" PRIMARY KEY ("waitingRoomId","eventChoice","turnstileSuccess")
+);
+
+-- AddForeignKey
+ALTER TABLE "RoomRegistrationCount" ADD CONSTRAINT "RoomRegistrationCount_waitingRoomId_fkey" FOREIGN KEY ("waitingRoomId") REFERENCES "WaitingRoom"("id") ON DELETE RESTRICT ON UPDATE CASCADE;
+
+-- Backfill the counts of existing rooms
+INSERT INTO "RoomRegistrationCount" ("waitingRoomId", "eventChoice", "turnstileSuccess", "count")
+SELECT r."waitingRoomId", r."eventChoice", r."turnstileSuccess", count(*)
+FROM "Registrant" r
+JOIN "WaitingRoom" w ON w."id" = r."waitingRoomId"
+WHERE r."turnstileTimestamp" > w."opensAt" AND r."turnstileTimestamp" < w."closesAt"
+GROUP BY r."waitingRoomId", r."eventChoice", r."turnstileSuccess";
@@ -0,0 +1,35 @@
+-- CreateTable
+CREATE TABLE "ImageBlob" (
+    "hash" STRING NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT now(),
+    "contentType" STRING NOT NULL,
+    "size" INT4 NOT NULL,
+    "data" BYTES NOT NULL,
+
+    CONSTRAINT "ImageBlob_pkey" PRIMARY KEY ("hash")
+);
+
+-- Move inline images (base64 data URLs) to the blob table, rooms keep the hash
+-- (sha256(BYTES) returns the hex digest in CockroachDB)
+INSERT INTO "ImageBlob" ("hash", "contentType", "size", "data")
+SELECT sha256("data"), "contentType", length("data"), "data"
+FROM (
+    SELECT DISTINCT
+        split_part(split_part(substr("image", 6), ',', 1), ';', 1) AS "contentType",
+        decode(split_part("image", ',', 2), 'base64') AS "data"
+    FROM (
+        SELECT "desktopImageBlob" AS "image" FROM "WaitingRoom"
+        UNION
+        SELECT "mobileImageBlob" AS "image" FROM "WaitingRoom"
+    )
+    WHERE "image" LIKE 'data:image/%;base64,%'
+)
+ON CONFLICT ("hash") DO NOTHING;
+
+UPDATE "WaitingRoom"
+SET "desktopImageBlob" = sha256(decode(split_part("desktopImageBlob", ',', 2), 'base64'))
+WHERE "desktopImageBlob" LIKE 'data:image/%;base64,%';
+
+UPDATE "WaitingRoom"
+SET "mobileImageBlob" = sha256(decode(split_part("mobileImageBlob", ',', 2), 'base64'))
+WHERE "mobileImageBlob" LIKE 'data:image/%;base64,%';
@@ -0,0 +1,15 @@
+-- CreateTable
+CREATE TABLE "Deployment" (
+    "id" STRING NOT NULL,
+    "requests" INT4 NOT NULL DEFAULT 0,
+    "dispatchedRequests" INT4 NOT NULL DEFAULT 0,
+    "requestedAt" TIMESTAMP(3),
+    "leaseExpiresAt" TIMESTAMP(3),
+    "lastDispatchAt" TIMESTAMP(3),
+    "lastDispatchStatus" INT4,
+    "lastError" STRING,
+    "failedAttempts" INT4 NOT NULL DEFAULT 0,
+    "dispatches" INT4 NOT NULL DEFAULT 0,
+
+    CONSTRAINT "Deployment_pkey" PRIMARY KEY ("id")
+);
@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "Registrant_waitingRoomId_createdAt_idx" ON "Registrant"("waitingRoomId", "createdAt" ASC);
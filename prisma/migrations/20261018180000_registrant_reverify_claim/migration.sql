@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "Registrant" ADD COLUMN     "reverifyClaimedAt" TIMESTAMP(3);
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "Deployment" ADD COLUMN     "nextAttemptAt" TIMESTAMP(3);
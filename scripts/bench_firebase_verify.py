@@ -0,0 +1,141 @@
+"""
+Benchmark Firebase ID token verification
+
+Compares:
+ - firebase_admin's auth.verify_id_token on the anyio thread pool (the previous FirebaseAuthBackend.decode_token)
+ - the native FirebaseTokenVerifier (in-memory signing keys, signature checks on a dedicated executor)
+
+Every token is distinct (no result caching), Google's certificates are served by an in-process mock,
+so the numbers are the verification cost itself.
+
+Usage (from the repository root):
+
+    python scripts/bench_firebase_verify.py [tokens] [concurrency]
+"""
+
+import asyncio
+import datetime
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import asyncer
+import firebase_admin
+import httpx
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from firebase_admin import auth
+
+from server.firebase_token import FirebaseTokenVerifier, GoogleSigningKeys
+
+PROJECT_ID = "bench-project"
+KID = "bench-key"
+
+private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def certificate_pem() -> str:
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.UTC)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_tokens(count: int) -> list[str]:
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {
+                "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+                "aud": PROJECT_ID,
+                "auth_time": now - 60,
+                "sub": f"user-{i}",
+                "iat": now - 60,
+                "exp": now + 3600,
+            },
+            private_key,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        for i in range(count)
+    ]
+
+
+async def run(name: str, verify, tokens: list[str], concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(token: str) -> None:
+        async with semaphore:
+            claims = await verify(token)
+            assert claims["uid"].startswith("user-")
+
+    await one(tokens[0])  # warmup (fetch certificates)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(token) for token in tokens))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:16} {len(tokens) / elapsed:8.0f} tokens/s"
+        f"  {elapsed / len(tokens) * 1e6:8.1f} us/token"
+    )
+
+
+async def bench(count: int, concurrency: int) -> None:
+    tokens = make_tokens(count)
+
+    # firebase_admin fetches PEM certificates through google.auth (blocking)
+    app = firebase_admin.initialize_app(
+        credential=mock.Mock(spec=firebase_admin.credentials.Base),
+        options={"projectId": PROJECT_ID},
+        name="bench",
+    )
+    certificates = {KID: certificate_pem()}
+    with mock.patch("google.oauth2.id_token._fetch_certs", return_value=certificates):
+        await run(
+            "firebase_admin",
+            asyncer.asyncify(
+                lambda token: auth.verify_id_token(token, app=app, check_revoked=False)
+            ),
+            tokens,
+            concurrency,
+        )
+
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwks = {"keys": [{**jwk, "kid": KID, "alg": "RS256", "use": "sig"}]}
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200, json=jwks, headers={"Cache-Control": "public, max-age=3600"}
+            )
+        )
+    )
+    for threads in (0, 2, 4):
+        executor = ThreadPoolExecutor(threads) if threads else None
+        verifier = FirebaseTokenVerifier(
+            PROJECT_ID, GoogleSigningKeys(http_client), executor=executor
+        )
+        await run(f"native ({threads} thr)", verifier.verify, tokens, concurrency)
+        if executor is not None:
+            executor.shutdown()
+    await http_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        bench(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        )
+    )
@@ -0,0 +1,93 @@
+"""
+Benchmark serialization of tRPC responses
+
+Compares, for pages of rows of increasing size:
+ - FastAPI's response handling of a TrpcResponse model (dump, re-validation against the response model,
+   jsonable dump and the stdlib JSON encoder), what every route paid before
+ - trpc_json / TrpcJSONResponse (the envelope written once, with the compiled serializer of the row model)
+
+Usage (from the repository root):
+
+    python scripts/bench_trpc_serialization.py [rounds]
+"""
+
+import asyncio
+import datetime
+import sys
+import time
+import uuid
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from server.routes.room import RoomSummary
+from server.trpc import TrpcJSONResponse
+from server.types import TrpcData, TrpcResponse
+
+PAGE_SIZES = (1, 10, 100, 1000)
+
+
+def make_rows(count: int) -> list[RoomSummary]:
+    now = datetime.datetime.now(datetime.UTC)
+    return [
+        RoomSummary(
+            id=uuid.uuid4(),
+            title=f"Room {i}",
+            createdAt=now,
+            updatedAt=now,
+            opensAt=now + datetime.timedelta(days=1),
+            closesAt=now + datetime.timedelta(days=2),
+            eventChoices="Saturday,Sunday",
+            published=i % 2 == 0,
+            registrantsCount=i * 10,
+            cursor="MjAyNi0xMC0xOFQxNDowMDowMCIsIjEyMyJd",
+        )
+        for i in range(count)
+    ]
+
+
+async def fastapi_path(field, rows: list[RoomSummary]) -> bytes:
+    content = await serialize_response(
+        field=field, response_content=TrpcResponse(result=TrpcData(data=rows))
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(rows: list[RoomSummary]) -> bytes:
+    return TrpcJSONResponse(rows).body
+
+
+async def main(rounds: int) -> None:
+    field = create_model_field(
+        name="Response_bench",
+        type_=TrpcResponse[list[RoomSummary]],
+        mode="serialization",
+    )
+    print(f"{'rows':>6} {'fastapi us/row':>15} {'fast us/row':>12} {'speedup':>8}")
+    for size in PAGE_SIZES:
+        rows = make_rows(size)
+        # Same document, modulo the stdlib encoder's whitespace
+        assert orjson.loads(await fastapi_path(field, rows)) == orjson.loads(
+            fast_path(rows)
+        )
+        repeat = max(rounds // size, 10)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await fastapi_path(field, rows)
+        before = (time.perf_counter() - start) / (repeat * size)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fast_path(rows)
+        after = (time.perf_counter() - start) / (repeat * size)
+
+        print(
+            f"{size:>6} {before * 1e6:>15.2f} {after * 1e6:>12.2f} {before / after:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,136 @@
+"""
+Benchmark the per-request overhead of the Turnstile middleware
+
+Compares:
+ - no middleware at all
+ - the previous BaseHTTPMiddleware implementation (validates every request carrying a token)
+ - the current pure ASGI TurnstileMiddleware (validates only routes depending on turnstile_verification)
+
+Cloudflare is replaced by an in-process mock transport, so the numbers are the middleware's own overhead.
+
+Usage (from the repository root):
+
+    python scripts/bench_turnstile_middleware.py [requests]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, UTC
+from typing import Annotated
+
+import fastapi
+import httpx
+from fastapi import Depends
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from server.middleware.turnstile import TurnstileMiddleware, turnstile_verification
+from server.turnstile import verify_turnstile_token
+
+
+def cloudflare(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200, json={"success": True, "challenge_ts": datetime.now(UTC).isoformat()}
+    )
+
+
+class LegacyTurnstileMiddleware(BaseHTTPMiddleware):
+    """
+    The previous implementation: validate before calling the app, for any request carrying a token
+    """
+
+    async def dispatch(self, request, call_next):
+        token = request.headers.get("X-Turnstile-Token")
+        if token is not None:
+            outcome = await verify_turnstile_token(request.state.cf_http_client, token)
+            request.state.turnstile_outcome = outcome
+        # Keep the route code identical between variants
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(getattr(request.state, "turnstile_outcome", None))
+        request.state.turnstile_verification = future
+        return await call_next(request)
+
+
+def make_app(middleware: str) -> fastapi.FastAPI:
+    app = fastapi.FastAPI()
+
+    @app.get("/dashboard")
+    async def dashboard():
+        return {"ok": True}
+
+    @app.post("/register")
+    async def register(
+        verification: Annotated[asyncio.Future, Depends(turnstile_verification)],
+    ):
+        outcome = await verification
+        return {"ok": outcome is not None}
+
+    if middleware == "legacy":
+        app.add_middleware(LegacyTurnstileMiddleware)
+    elif middleware == "asgi":
+        app.add_middleware(TurnstileMiddleware, routes=app.routes)
+    return app
+
+
+async def call(app, state: dict, method: str, path: str) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"x-turnstile-token", b"token"), (b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+        "state": dict(state),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def bench(requests: int) -> None:
+    cf_http_client = httpx.AsyncClient(
+        base_url="https://challenges.cloudflare.com",
+        transport=httpx.MockTransport(cloudflare),
+    )
+    state = {"cf_http_client": cf_http_client}
+    for method, path in (("GET", "/dashboard"), ("POST", "/register")):
+        baseline = None
+        for middleware in ("none", "legacy", "asgi"):
+            app = make_app(middleware)
+            state_for_run = state
+            if middleware == "none":
+                # The route still needs a verification, give it a finished one
+                state_for_run = {**state, "turnstile_verification": _done()}
+            for _ in range(100):  # warmup
+                await call(app, state_for_run, method, path)
+            start = time.perf_counter()
+            for _ in range(requests):
+                await call(app, state_for_run, method, path)
+            per_request = (time.perf_counter() - start) / requests * 1e6
+            baseline = baseline or per_request
+            print(
+                f"{method:4} {path:10} {middleware:6} {per_request:8.1f} us/request"
+                f"  (+{per_request - baseline:.1f} us)"
+            )
+    await cf_http_client.aclose()
+
+
+def _done() -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(None)
+    return future
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
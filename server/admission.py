@@ -0,0 +1,68 @@
+"""
+Admission of registrations
+
+Classify a registration request before it touches the database,
+so doomed requests (bots, too early, too late) don't cost a write transaction.
+"""
+
+import enum
+
+from .db.waiting_room import CachedWaitingRoomQueryResult
+from .types import TurnstileOutcome
+
+
+class Admission(enum.Enum):
+    ACCEPT = "ACCEPT"
+    """
+    A real person registering while the waiting room is open
+    """
+    PENDING = "PENDING"
+    """
+    Registering while the waiting room is open, but the turnstile token will only be validated later
+    (Cloudflare is unavailable). Recorded and accepted for now.
+    """
+    BOT = "BOT"
+    """
+    Failed the turnstile challenge, recorded for the organizers (audit) and rejected
+    """
+    TOO_EARLY = "TOO_EARLY"
+    """
+    Submitted before the waiting room opened, recorded for the organizers (audit) and rejected
+    """
+    TOO_LATE = "TOO_LATE"
+    """
+    Submitted after the waiting room closed, rejected without being recorded
+    """
+
+
+def admit(outcome: TurnstileOutcome, room: CachedWaitingRoomQueryResult) -> Admission:
+    """
+    Classify a registration by its turnstile outcome and the waiting room's (cached) time window
+
+    >>> from datetime import datetime, UTC
+    >>> import uuid
+    >>> room = CachedWaitingRoomQueryResult(
+    ...     id=uuid.uuid4(),
+    ...     opens_at=datetime(2024, 1, 1, 10, tzinfo=UTC),
+    ...     closes_at=datetime(2024, 1, 1, 11, tzinfo=UTC),
+    ...     published=True,
+    ...     owner_id=uuid.uuid4(),
+    ... )
+    >>> admit(TurnstileOutcome(success=True, challenge_ts=datetime(2024, 1, 1, 10, 30, tzinfo=UTC)), room)
+    <Admission.ACCEPT: 'ACCEPT'>
+    >>> admit(TurnstileOutcome(success=True, challenge_ts=datetime(2024, 1, 1, 9, tzinfo=UTC)), room)
+    <Admission.TOO_EARLY: 'TOO_EARLY'>
+    >>> admit(TurnstileOutcome(success=True, challenge_ts=datetime(2024, 1, 1, 12, tzinfo=UTC)), room)
+    <Admission.TOO_LATE: 'TOO_LATE'>
+    >>> admit(TurnstileOutcome.NO_TOKEN(), room)
+    <Admission.BOT: 'BOT'>
+    """
+    if not (outcome.success or outcome.pending) or outcome.challenge_ts is None:
+        return Admission.BOT
+    if outcome.challenge_ts > room.closes_at:
+        return Admission.TOO_LATE
+    if outcome.challenge_ts < room.opens_at:
+        return Admission.TOO_EARLY
+    if outcome.pending:
+        return Admission.PENDING
+    return Admission.ACCEPT
@@ -0,0 +1,50 @@
+"""
+Background work that runs for the lifetime of the application
+"""
+
+import asyncio
+
+from .logger import logger
+
+
+class PeriodicTask:
+    """
+    Run `tick` every `interval` seconds in the background
+
+    Use as an async context manager (entered in the application lifespan),
+    the task is cancelled when the context exits.
+    Exceptions raised by `tick` are logged and don't stop the task.
+    """
+
+    name: str = "periodic-task"
+
+    def __init__(self, interval: float):
+        """
+        :param interval: Seconds between the end of one tick and the start of the next
+        """
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def tick(self) -> None:
+        raise NotImplementedError
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run(), name=self.name)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("[%s] tick failed", self.name)
+            await asyncio.sleep(self.interval)
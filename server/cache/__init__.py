@@ -0,0 +1,6 @@
+"""
+Named caches: in-process (LRU with TTL), optionally backed by a cache shared by every worker (Redis)
+
+Every cache counts hits, misses, evictions, expirations and invalidations (logged by CacheStatsReporter),
+its size and TTL can be overridden by name (CACHE_OVERRIDES).
+"""
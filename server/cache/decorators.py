@@ -0,0 +1,40 @@
+import functools
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from cachetools.keys import hashkey
+
+from ..singleflight import SingleFlight
+from .local import MISSING, Cache
+
+T = TypeVar("T")
+
+
+def cached(cache: Cache, key: Callable[..., Hashable] = hashkey):
+    """
+    Decorator to cache the results of a coroutine function in a named cache
+
+    Local misses are looked up in the shared cache (for shareable caches), then computed.
+    Concurrent misses of the same key share a single lookup and call (see SingleFlight)::
+
+        @cached(Cache("rooms", maxsize=1024, ttl=60, value_type=Room | None), key=methodkey)
+        async def fetch(session, id): ...
+
+    :param cache: Where results are cached
+    :param key: Computes the key of a call from its arguments
+    """
+
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        group = SingleFlight()
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> T:
+            k = key(*args, **kwargs)
+            if (value := cache.get(k, MISSING)) is not MISSING:
+                return value
+            return await group.do(k, lambda: cache.load(k, lambda: fn(*args, **kwargs)))
+
+        wrapper.cache = cache
+        wrapper.singleflight = group
+        return wrapper
+
+    return decorator
@@ -0,0 +1,326 @@
+"""
+Named in-process caches, with counters, optionally backed by the shared cache
+"""
+
+import asyncio
+import dataclasses
+import functools
+import math
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Hashable, Iterator
+
+import pydantic
+from cachetools import TLRUCache
+from pydantic import TypeAdapter
+
+from ..config import CONFIG
+from ..logger import logger
+
+if TYPE_CHECKING:
+    from .shared import SharedCache
+
+MISSING: Any = object()
+"""
+Returned by lookups of keys that are not cached (None is a value that can be cached)
+"""
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    """
+    Lookups answered from this process
+    """
+    misses: int = 0
+    evictions: int = 0
+    """
+    Entries evicted to make room for others (the cache is too small)
+    """
+    expirations: int = 0
+    invalidations: int = 0
+    shared_hits: int = 0
+    """
+    Local misses answered by the shared cache
+    """
+    shared_misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclasses.dataclass
+class _Loading:
+    loads: int = 0
+    invalidations: int = 0
+    """
+    Invalidations of the key since the first of its loads started
+    """
+
+
+class CacheRegistry:
+    """
+    The named caches of the process, and the shared cache they use (if any)
+    """
+
+    def __init__(self):
+        self._caches: dict[str, "Cache"] = {}
+        self.shared: "SharedCache | None" = None
+
+    def register(self, cache: "Cache") -> None:
+        # Replaces a cache of the same name (e.g. an app created again)
+        self._caches[cache.name] = cache
+
+    def __getitem__(self, name: str) -> "Cache":
+        return self._caches[name]
+
+    def __iter__(self) -> Iterator["Cache"]:
+        return iter(list(self._caches.values()))
+
+    def __len__(self) -> int:
+        return len(self._caches)
+
+
+caches = CacheRegistry()
+
+
+class Cache(TLRUCache):
+    """
+    A named cache (LRU, with optional TTL), counting hits, misses, evictions, expirations and invalidations
+
+    Size and TTL can be overridden per name (see CONFIG.cache_overrides).
+    Caches given a value type are shareable: when the process has a shared cache (see SharedCache),
+    local misses are looked up there before being computed, so workers don't repeat each other's misses.
+
+    Lookups are counted through get() (and fetch()), item access isn't.
+    A load that overlapped an invalidation of its key returns its value without caching it (it may be stale).
+
+    >>> cache = Cache("example", maxsize=2, ttl=60)
+    >>> cache["a"], cache["b"], cache["c"] = 1, 2, 3
+    >>> cache.get("a"), cache.get("c")
+    (None, 3)
+    >>> cache.stats.hits, cache.stats.misses, cache.stats.evictions
+    (1, 1, 1)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: float,
+        ttl: float | None = None,
+        *,
+        expires_at: Callable[[Any], float] | None = None,
+        timer: Callable[[], float] = time.monotonic,
+        getsizeof: Callable[[Any], float] | None = None,
+        value_type: Any = None,
+    ):
+        """
+        :param name: Unique name of the cache (in logs, stats and the shared cache's keys)
+        :param maxsize: Maximum number of entries (or total size, with getsizeof)
+        :param ttl: Seconds an entry is kept for (None to keep entries until evicted)
+        :param expires_at: Time (of timer) past which a value must not be served, whatever the TTL
+        :param timer: Clock of TTLs and expires_at
+        :param getsizeof: Size of a value (defaults to 1 per entry)
+        :param value_type: Type of the values, makes the cache shareable (values are shared as JSON)
+        """
+        overrides = CONFIG.cache_overrides.get(name, {})
+        maxsize = overrides.get("maxsize", maxsize)
+        ttl = overrides.get("ttl", ttl)
+
+        def ttu(_key, value, now: float) -> float:
+            expires = math.inf if ttl is None else now + ttl
+            return expires if expires_at is None else min(expires, expires_at(value))
+
+        super().__init__(maxsize, ttu, timer, getsizeof)
+        self.name = name
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._adapter = TypeAdapter(value_type) if value_type is not None else None
+        self._loading: dict[Hashable, _Loading] = {}
+        """
+        Keys being loaded (see load)
+        """
+        self._deletions: dict[Hashable, asyncio.Task] = {}
+        """
+        Shared entries being deleted by invalidate, by key
+        """
+        caches.register(self)
+
+    def get(self, key: Hashable, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return value
+
+    def popitem(self):
+        self.stats.evictions += 1
+        return super().popitem()
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.stats.expirations += len(expired)
+        return expired
+
+    @property
+    def shared(self) -> "SharedCache | None":
+        return caches.shared if self._adapter is not None else None
+
+    async def fetch(self, key: Hashable, load: Callable[[], Awaitable[Any]]):
+        """
+        The cached value of key, looked up in the shared cache on a local miss, loaded (and cached) on a miss
+        """
+        if (value := self.get(key, MISSING)) is not MISSING:
+            return value
+        return await self.load(key, load)
+
+    async def load(self, key: Hashable, load: Callable[[], Awaitable[Any]]):
+        """
+        The value of a key missing locally: from the shared cache, or loaded (and cached)
+
+        The value isn't cached if the key is invalidated meanwhile (it may be older than the invalidation).
+        """
+        loading = self._loading.setdefault(key, _Loading())
+        loading.loads += 1
+        try:
+            return await self._load(key, load, loading)
+        finally:
+            loading.loads -= 1
+            if not loading.loads:
+                del self._loading[key]
+
+    async def _load(
+        self, key: Hashable, load: Callable[[], Awaitable[Any]], loading: "_Loading"
+    ):
+        invalidations = loading.invalidations
+        shared = self.shared
+        if shared is not None:
+            if (deletion := self._deletions.get(key)) is not None:
+                # Don't read back the entry being invalidated
+                await asyncio.shield(deletion)
+            value = await self._shared_get(shared, key)
+            if value is not MISSING:
+                if loading.invalidations == invalidations:
+                    self[key] = value
+                return value
+
+        value = await load()
+        if loading.invalidations != invalidations:
+            return value
+        self[key] = value
+        if shared is not None:
+            await self._shared_set(shared, key, value)
+            if loading.invalidations != invalidations:
+                # Invalidated while writing, the deletion may have run first
+                await shared.delete(self.name, key)
+        return value
+
+    async def lookup(self, key: Hashable):
+        """
+        The cached value of key, looked up in the shared cache on a local miss (MISSING if neither has it)
+        """
+        if (value := self.get(key, MISSING)) is not MISSING:
+            return value
+        shared = self.shared
+        if shared is None:
+            return MISSING
+        value = await self._shared_get(shared, key)
+        if value is not MISSING:
+            self[key] = value
+        return value
+
+    async def store(self, key: Hashable, value: Any) -> None:
+        """
+        Cache a value computed elsewhere (not by load), in the shared cache too
+        """
+        self[key] = value
+        shared = self.shared
+        if shared is not None:
+            await self._shared_set(shared, key, value)
+
+    async def claim(self, key: Hashable, value: Any):
+        """
+        Cache a value unless the key is already cached, atomically across workers when sharing
+
+        :return: The cached value: value if it was claimed, the value the key was claimed with otherwise
+        """
+        if (cached := self.get(key, MISSING)) is not MISSING:
+            return cached
+        shared = self.shared
+        if shared is not None and (ttl := self._shared_ttl(key, value)) > 0:
+            data = await shared.add(
+                self.name,
+                key,
+                self._adapter.dump_json(value),
+                None if ttl == math.inf else ttl,
+            )
+            if data is not None:
+                try:
+                    cached = self._adapter.validate_json(data)
+                except pydantic.ValidationError:
+                    logger.warning(
+                        "[cache:%s] dropping invalid shared entry", self.name
+                    )
+                else:
+                    self[key] = cached
+                    return cached
+        # Without the shared cache, claims are only atomic within this process
+        if key in self:
+            return self[key]
+        self[key] = value
+        return value
+
+    async def _shared_get(self, shared: "SharedCache", key: Hashable):
+        data = await shared.get(self.name, key)
+        if data is not None:
+            try:
+                value = self._adapter.validate_json(data)
+            except pydantic.ValidationError:
+                # Written by another version of the app
+                logger.warning("[cache:%s] dropping invalid shared entry", self.name)
+            else:
+                self.stats.shared_hits += 1
+                return value
+        self.stats.shared_misses += 1
+        return MISSING
+
+    async def _shared_set(
+        self, shared: "SharedCache", key: Hashable, value: Any
+    ) -> None:
+        ttl = self._shared_ttl(key, value)
+        if ttl > 0:
+            await shared.set(
+                self.name,
+                key,
+                self._adapter.dump_json(value),
+                None if ttl == math.inf else ttl,
+            )
+
+    def _shared_ttl(self, key: Hashable, value: Any) -> float:
+        """
+        Seconds a value would be cached for, from now
+        """
+        now = self.timer()
+        return self.ttu(key, value, now) - now
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Evict an entry, from the shared cache too (in the background)
+        """
+        self.stats.invalidations += 1
+        self.pop(key, None)
+        if (loading := self._loading.get(key)) is not None:
+            loading.invalidations += 1
+        shared = self.shared
+        if shared is not None:
+            task = asyncio.get_running_loop().create_task(shared.delete(self.name, key))
+            # Keep a reference until it's done
+            self._deletions[key] = task
+            task.add_done_callback(functools.partial(self._deleted, key))
+
+    def _deleted(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._deletions.get(key) is task:
+            del self._deletions[key]
@@ -0,0 +1,198 @@
+"""
+Cache entries shared by every worker process, in Redis (or anything speaking its protocol)
+
+Every worker process has its own local caches, and used to repeat the same misses (the same user upserted,
+the same room read, the same token verified once per worker). Shareable caches (see Cache) look up their
+local misses here first.
+
+The shared cache is an optimization, never a dependency: errors and timeouts count as misses,
+and after a few consecutive failures it is skipped for a while (see CircuitBreaker).
+
+The server is not trusted: cached values decide who a user is (users) and who passed a challenge
+(Turnstile outcomes), so whoever could write to it could impersonate users. Entries are signed with
+SHARED_CACHE_SECRET (HMAC-SHA256 of the key, the expiry and the value), entries failing the check are misses.
+A signature is bound to its key and expires with the entry, so entries can't be moved to other keys or replayed later.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import time
+from typing import Hashable, Protocol
+
+from ..circuit_breaker import CircuitBreaker
+from ..logger import logger
+
+
+class RedisClient(Protocol):
+    """
+    The commands used, as provided by redis.asyncio.Redis (and fakeredis.FakeAsyncRedis in tests)
+    """
+
+    async def get(self, name: str) -> bytes | None: ...
+
+    async def set(
+        self, name: str, value: bytes, px: int | None = None, nx: bool = False
+    ): ...
+
+    async def delete(self, *names: str) -> int: ...
+
+    async def aclose(self) -> None: ...
+
+
+class SharedCache:
+    """
+    Get, set (or add) and delete cache entries in a Redis-protocol server
+
+    Keys are namespaced by cache name, and hashed (keys can hold secrets, e.g. ID tokens).
+    Values are stored signed (see sign), every worker must be given the same secret.
+    Use as an async context manager (entered in the application lifespan), the client is closed on exit.
+    """
+
+    def __init__(
+        self,
+        client: RedisClient,
+        secret: bytes,
+        namespace: str = "tix-q",
+        timeout: float = 0.1,
+        breaker: CircuitBreaker | None = None,
+    ):
+        """
+        :param client: A Redis client (e.g. redis.asyncio.Redis.from_url(...))
+        :param secret: Key of the entries' signatures
+        :param namespace: Prefix of every key
+        :param timeout: Seconds a command can take before it counts as a miss
+        :param breaker: Skips the server while it's failing
+        """
+        self._client = client
+        self._secret = secret
+        self._namespace = namespace
+        self._timeout = timeout
+        self._breaker = breaker or CircuitBreaker(
+            "shared-cache", failure_threshold=5, reset_timeout=30
+        )
+
+    @classmethod
+    def from_url(cls, url: str, secret: bytes, **kwargs) -> "SharedCache":
+        """
+        Connect to the server at url (requires the redis package, pip install tix-q[redis])
+        """
+        import redis.asyncio
+
+        return cls(redis.asyncio.Redis.from_url(url), secret, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+
+    def key(self, cache: str, key: Hashable) -> str:
+        """
+        The server's key of a cache entry
+
+        >>> SharedCache(client=None, secret=b"").key("users", ("firebase-uid",))
+        'tix-q:users:d0fab0f3879856b6cc8fc3312af4ba9be3467af4186a24c43bf68d064199db72'
+        """
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return f"{self._namespace}:{cache}:{digest}"
+
+    def sign(self, key: str, value: bytes, expires_at: int) -> bytes:
+        """
+        A value as stored: its signature (32 bytes), its expiry (8 bytes, milliseconds since the epoch, 0 for none),
+        then the value
+
+        >>> shared = SharedCache(client=None, secret=b"secret")
+        >>> shared.verify("a", shared.sign("a", b"value", 0))
+        b'value'
+        >>> shared.verify("b", shared.sign("a", b"value", 0)) is None
+        True
+        >>> shared.verify("a", shared.sign("a", b"value", 1)) is None
+        True
+        """
+        payload = expires_at.to_bytes(8, "big") + value
+        return self._signature(key, payload) + payload
+
+    def verify(self, key: str, data: bytes) -> bytes | None:
+        """
+        The value of a stored entry (None if it isn't signed by us for this key, or expired)
+        """
+        signature, payload = data[:32], data[32:]
+        if len(payload) < 8 or not hmac.compare_digest(
+            signature, self._signature(key, payload)
+        ):
+            return None
+        expires_at = int.from_bytes(payload[:8], "big")
+        if expires_at and expires_at < time.time() * 1000:
+            return None
+        return payload[8:]
+
+    def _signature(self, key: str, payload: bytes) -> bytes:
+        return hmac.digest(self._secret, key.encode("utf-8") + payload, "sha256")
+
+    async def get(self, cache: str, key: Hashable) -> bytes | None:
+        key = self.key(cache, key)
+        data = await self._call(self._client.get(key))
+        if data is None:
+            return None
+        value = self.verify(key, data)
+        if value is None:
+            logger.warning("[shared-cache] dropping unsigned entry of %s", cache)
+        return value
+
+    async def set(
+        self, cache: str, key: Hashable, value: bytes, ttl: float | None
+    ) -> None:
+        """
+        :param ttl: Seconds the entry is kept for (None to keep it until the server evicts it)
+        """
+        key = self.key(cache, key)
+        expires_at = 0 if ttl is None else int((time.time() + ttl) * 1000)
+        await self._call(
+            self._client.set(
+                key,
+                self.sign(key, value, expires_at),
+                px=None if ttl is None else max(1, int(ttl * 1000)),
+            )
+        )
+
+    async def add(
+        self, cache: str, key: Hashable, value: bytes, ttl: float | None
+    ) -> bytes | None:
+        """
+        Set an entry unless the key is already set (SET NX, atomic across workers)
+
+        :param ttl: Seconds the entry is kept for (None to keep it until the server evicts it)
+        :return: The entry's value: value if it was set, the existing one otherwise
+            (None if the server is unavailable, or the existing entry isn't valid)
+        """
+        server_key = self.key(cache, key)
+        expires_at = 0 if ttl is None else int((time.time() + ttl) * 1000)
+        added = await self._call(
+            self._client.set(
+                server_key,
+                self.sign(server_key, value, expires_at),
+                px=None if ttl is None else max(1, int(ttl * 1000)),
+                nx=True,
+            )
+        )
+        if added:
+            return value
+        # Already set (or the server failed, then so does this)
+        return await self.get(cache, key)
+
+    async def delete(self, cache: str, key: Hashable) -> None:
+        await self._call(self._client.delete(self.key(cache, key)))
+
+    async def _call(self, command):
+        if not self._breaker.allow():
+            command.close()
+            return None
+        try:
+            result = await asyncio.wait_for(command, self._timeout)
+        except Exception as e:
+            self._breaker.record_failure()
+            logger.warning("[shared-cache] %r", e)
+            return None
+        self._breaker.record_success()
+        return result
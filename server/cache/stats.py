@@ -0,0 +1,33 @@
+from ..background import PeriodicTask
+from ..logger import logger
+from .local import caches
+
+
+class CacheStatsReporter(PeriodicTask):
+    """
+    Log the size and counters of every named cache, to size them (see CONFIG.cache_overrides)
+
+    A low hit rate with evictions means a cache is too small, expirations mean its TTL is too short.
+    Counters are cumulative, since the worker started.
+    """
+
+    name = "cache-stats"
+
+    async def tick(self) -> None:
+        for cache in caches:
+            stats = cache.stats
+            logger.info(
+                "[cache:%s] size=%d/%d hits=%d misses=%d hit_rate=%.3f evictions=%d expirations=%d "
+                "invalidations=%d shared_hits=%d shared_misses=%d",
+                cache.name,
+                cache.currsize,
+                cache.maxsize,
+                stats.hits,
+                stats.misses,
+                stats.hit_rate,
+                stats.evictions,
+                stats.expirations,
+                stats.invalidations,
+                stats.shared_hits,
+                stats.shared_misses,
+            )
@@ -0,0 +1,107 @@
+"""
+Circuit breaker for calls to external services
+"""
+
+import enum
+import time
+
+from .logger import logger
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "CLOSED"
+    """
+    Calls go through
+    """
+    OPEN = "OPEN"
+    """
+    The service is failing, calls are skipped until the reset timeout passes
+    """
+    HALF_OPEN = "HALF_OPEN"
+    """
+    The reset timeout passed, a single probe call is let through
+    """
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing service for a while, instead of making every caller wait for a timeout
+
+    >>> breaker = CircuitBreaker("example", failure_threshold=2, reset_timeout=60)
+    >>> breaker.allow()
+    True
+    >>> breaker.record_failure(); breaker.record_failure()
+    >>> breaker.state
+    <CircuitState.OPEN: 'OPEN'>
+    >>> breaker.allow()
+    False
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30
+    ):
+        """
+        :param name: Used in logs
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param reset_timeout: Seconds to wait before probing the service again
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started_at = 0.0
+
+    def is_open(self) -> bool:
+        """
+        Whether or not calls are currently skipped (without probing the service)
+        """
+        return (
+            self.state is CircuitState.OPEN
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def allow(self) -> bool:
+        """
+        Whether or not a call should be made right now
+        """
+        if self.state is CircuitState.CLOSED:
+            return True
+        if self.state is CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            logger.info("[%s] circuit half open, probing", self.name)
+            self.state = CircuitState.HALF_OPEN
+            self._probing = False
+        if (
+            self._probing
+            and time.monotonic() - self._probe_started_at < self.reset_timeout
+        ):
+            # A probe is in flight (it is given up on if it never reports back)
+            return False
+        self._probing = True
+        self._probe_started_at = time.monotonic()
+        return True
+
+    def record_success(self) -> None:
+        if self.state is not CircuitState.CLOSED:
+            logger.info("[%s] circuit closed", self.name)
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if (
+            self.state is CircuitState.HALF_OPEN
+            or self._failures >= self.failure_threshold
+        ):
+            if self.state is not CircuitState.OPEN:
+                logger.warning(
+                    "[%s] circuit open after %s failures", self.name, self._failures
+                )
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
@@ -1,4 +1,6 @@
+import json
 import os
+import secrets
 
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings
@@ -23,6 +25,14 @@ class Config(BaseSettings):
     The secret used to validate turnstile requests
     """
 
+    live_ticket_secret: SecretStr = Field(
+        os.environ.get("LIVE_TICKET_SECRET") or secrets.token_urlsafe(32)
+    )
+    """
+    The secret used to sign live feed tickets (see /room.liveTicket)
+    Generated when unset, which is only fine for a single machine (its workers share the app loaded before they fork)
+    """
+
     github_token: SecretStr | None = Field(os.environ.get("GITHUB_TOKEN"))
     """
     The GitHub API key used to create deployments
@@ -40,6 +50,39 @@ class Config(BaseSettings):
     The GitHub repo to deploy
     """
 
+    github_api_url: str = Field(
+        os.environ.get("GITHUB_API_URL", "https://api.github.com")
+    )
+    """
+    GitHub's API base URL (point it at a stand-in server to test deployments)
+    """
+
+    deploy_debounce_seconds: float = Field(
+        float(os.environ.get("DEPLOY_DEBOUNCE_SECONDS", "10"))
+    )
+    """
+    Time (seconds) publishes are collected before a single deployment is dispatched
+    """
+
+    deploy_max_attempts: int = Field(int(os.environ.get("DEPLOY_MAX_ATTEMPTS", "5")))
+    """
+    Number of times a deployment dispatch is attempted before giving up (until the next publish)
+    """
+
+    deploy_retry_backoff_seconds: float = Field(
+        float(os.environ.get("DEPLOY_RETRY_BACKOFF_SECONDS", "2"))
+    )
+    """
+    Time (seconds) before retrying a failed deployment dispatch (doubled on every retry, up to a minute)
+    """
+
+    deploy_poll_seconds: float = Field(
+        float(os.environ.get("DEPLOY_POLL_SECONDS", "2"))
+    )
+    """
+    Time (seconds) between checks for requested deployments (every worker checks, one dispatches)
+    """
+
     production: bool = Field(os.environ.get("PRODUCTION", "true").lower() == "true")
     """
     Whether or not the server is running in production mode (affects CORS origins and deployment triggers)
@@ -52,8 +95,328 @@ class Config(BaseSettings):
     The URL to the database (cockroachdb)
     """
 
+    db_pool_size: int = Field(int(os.environ.get("DB_POOL_SIZE", "30")))
+    """
+    Number of database connections kept open (and opened ahead of a room opening), split between worker processes
+    """
+
+    db_max_overflow: int = Field(int(os.environ.get("DB_MAX_OVERFLOW", "70")))
+    """
+    Number of database connections opened on top of the pool under load (closed when returned),
+    split between worker processes
+    """
+
+    web_concurrency: int = Field(int(os.environ.get("WEB_CONCURRENCY", "1")))
+    """
+    Number of server worker processes (set by serve.py, one per available CPU unless set)
+    """
+
+    server_max_requests: int = Field(
+        int(os.environ.get("SERVER_MAX_REQUESTS", "0"))
+    )
+    """
+    Requests a worker process serves before it is gracefully replaced (0, the default, to never replace workers)
+
+    Workers share the load evenly, so they reach the limit together (a stampede, when every worker is busy).
+    Only set it to bound a leak, it's jittered by up to 50% so replacements are spread out.
+    """
+
+    server_graceful_timeout: int = Field(
+        int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "30"))
+    )
+    """
+    Time (seconds) a stopping worker process has to finish its requests (and flush its batchers)
+    """
+
+    registration_batching: bool = Field(
+        os.environ.get("REGISTRATION_BATCHING", "false").lower() == "true"
+    )
+    """
+    Whether or not to write registrants through the write-behind batcher (multi-row inserts)
+    instead of one insert + commit per registration
+    """
+
+    registration_batch_size: int = Field(
+        int(os.environ.get("REGISTRATION_BATCH_SIZE", "256"))
+    )
+    """
+    Maximum number of registrants written in a single INSERT statement
+    """
+
+    registration_batch_delay_ms: float = Field(
+        float(os.environ.get("REGISTRATION_BATCH_DELAY_MS", "5"))
+    )
+    """
+    Maximum time (milliseconds) a registrant waits for its batch to fill up before it is flushed
+    """
+
+    registration_audit_delay_ms: float = Field(
+        float(os.environ.get("REGISTRATION_AUDIT_DELAY_MS", "100"))
+    )
+    """
+    Maximum time (milliseconds) a rejected registration (bot, too early) waits before it is recorded
+    Nobody waits for these records, so we can afford large batches
+    """
+
+    registration_audit_max_pending: int = Field(
+        int(os.environ.get("REGISTRATION_AUDIT_MAX_PENDING", "10000"))
+    )
+    """
+    Maximum number of rejected registrations (bot, too early) waiting to be recorded, more are dropped (and counted)
+    """
+
+    registration_count_interval_seconds: float = Field(
+        float(os.environ.get("REGISTRATION_COUNT_INTERVAL_SECONDS", "1"))
+    )
+    """
+    How often (seconds) each worker adds the registrations it counted to the room stats
+    """
+
+    live_feed_interval_seconds: float = Field(
+        float(os.environ.get("LIVE_FEED_INTERVAL_SECONDS", "1"))
+    )
+    """
+    How often (seconds) watched rooms are polled for the live dashboard feed
+    """
+
+    timeline_settle_seconds: float = Field(
+        float(os.environ.get("TIMELINE_SETTLE_SECONDS", "300"))
+    )
+    """
+    Time (seconds) a registration can take to be written after its turnstile timestamp
+    (timeline buckets older than this are not recounted, and closed rooms' timelines are final)
+    """
+
+    registrants_settle_seconds: float = Field(
+        float(os.environ.get("REGISTRANTS_SETTLE_SECONDS", "10"))
+    )
+    """
+    Time (seconds) a registrant can take to be committed after its createdAt (its transaction's timestamp),
+    /room.registrants cursors and the live feed stay this far behind so they never step over a registrant
+    """
+
+    turnstile_timeout: float = Field(float(os.environ.get("TURNSTILE_TIMEOUT", "5")))
+    """
+    Timeout (seconds) for Cloudflare's siteverify API
+    """
+
+    turnstile_max_connections: int = Field(
+        int(os.environ.get("TURNSTILE_MAX_CONNECTIONS", "100"))
+    )
+    """
+    Maximum number of concurrent connections to Cloudflare's siteverify API
+    """
+
+    turnstile_breaker_failures: int = Field(
+        int(os.environ.get("TURNSTILE_BREAKER_FAILURES", "5"))
+    )
+    """
+    Consecutive siteverify failures after which registrations are accepted unverified (pending)
+    """
+
+    turnstile_breaker_reset_seconds: float = Field(
+        float(os.environ.get("TURNSTILE_BREAKER_RESET_SECONDS", "10"))
+    )
+    """
+    Time (seconds) to wait before calling siteverify again once the circuit opened
+    """
+
+    turnstile_cache_size: int = Field(
+        int(os.environ.get("TURNSTILE_CACHE_SIZE", "10000"))
+    )
+    """
+    Maximum number of validated turnstile outcomes remembered (to answer client retries)
+    """
+
+    turnstile_cache_ttl_seconds: float = Field(
+        float(os.environ.get("TURNSTILE_CACHE_TTL_SECONDS", "120"))
+    )
+    """
+    Time (seconds) a validated turnstile outcome is remembered for
+    """
+
+    turnstile_reverify_interval_seconds: float = Field(
+        float(os.environ.get("TURNSTILE_REVERIFY_INTERVAL_SECONDS", "5"))
+    )
+    """
+    How often (seconds) pending registrations are validated against siteverify
+    """
+
+    turnstile_reverify_concurrency: int = Field(
+        int(os.environ.get("TURNSTILE_REVERIFY_CONCURRENCY", "8"))
+    )
+    """
+    Maximum number of concurrent siteverify calls made for pending registrations
+    """
+
+    room_cache_ttl_seconds: float = Field(
+        float(os.environ.get("ROOM_CACHE_TTL_SECONDS", "3600"))
+    )
+    """
+    Time (seconds) a room's opening window is cached for (rooms are evicted as soon as they change)
+    """
+
+    room_invalidation_poll_seconds: float = Field(
+        float(os.environ.get("ROOM_INVALIDATION_POLL_SECONDS", "2"))
+    )
+    """
+    How often (seconds) each worker polls for rooms changed by other workers (0 for a single worker)
+    """
+
+    public_room_cache_ttl_seconds: float = Field(
+        float(os.environ.get("PUBLIC_ROOM_CACHE_TTL_SECONDS", "60"))
+    )
+    """
+    Time (seconds) a published room's rendered response is kept in memory (rooms are evicted as soon as they change)
+    """
+
+    public_room_max_age_seconds: int = Field(
+        int(os.environ.get("PUBLIC_ROOM_MAX_AGE_SECONDS", "10"))
+    )
+    """
+    Time (seconds) browsers and CDNs may reuse a published room's response without revalidating it
+    """
+
+    room_prewarm_horizon_seconds: float = Field(
+        float(os.environ.get("ROOM_PREWARM_HORIZON_SECONDS", "600"))
+    )
+    """
+    Time (seconds) before a room opens that it is pinned in memory
+    (the connection pool is filled in the last ROOM_PREWARM_INTERVAL_SECONDS or two)
+    """
+
+    room_prewarm_interval_seconds: float = Field(
+        float(os.environ.get("ROOM_PREWARM_INTERVAL_SECONDS", "30"))
+    )
+    """
+    How often (seconds) upcoming rooms are looked up
+    """
+
+    public_server_url: str | None = Field(os.environ.get("PUBLIC_SERVER_URL"))
+    """
+    URL browsers reach this server at (e.g. https://api.example.com), image URLs are built from it
+    (never from the request's Host header, responses are cached and shared), unset for relative URLs
+    """
+
+    blob_max_bytes: int = Field(int(os.environ.get("BLOB_MAX_BYTES", "5000000")))
+    """
+    Maximum size (bytes) of a stored image
+    """
+
+    blob_cache_bytes: int = Field(int(os.environ.get("BLOB_CACHE_BYTES", "64000000")))
+    """
+    Total size (bytes) of the images each worker keeps in memory
+    """
+
+    markdown_cache_bytes: int = Field(
+        int(os.environ.get("MARKDOWN_CACHE_BYTES", "16000000"))
+    )
+    """
+    Total size (characters) of the rendered room descriptions each worker keeps in memory
+    """
+
+    markdown_render_threads: int = Field(
+        int(os.environ.get("MARKDOWN_RENDER_THREADS", "2"))
+    )
+    """
+    Number of threads dedicated to rendering markdown (off the event loop)
+    """
+
+    firebase_token_cache_size: int = Field(
+        int(os.environ.get("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+    )
+    """
+    Maximum number of verified Firebase ID tokens remembered
+    """
+
+    firebase_token_cache_ttl_seconds: float = Field(
+        float(os.environ.get("FIREBASE_TOKEN_CACHE_TTL_SECONDS", "300"))
+    )
+    """
+    Maximum time (seconds) a verified Firebase ID token is remembered for (never past its own expiry)
+    """
+
+    firebase_verify_threads: int = Field(
+        int(os.environ.get("FIREBASE_VERIFY_THREADS", "2"))
+    )
+    """
+    Number of threads dedicated to Firebase ID token signature checks (0 to check on the event loop)
+    """
+
+    compression_minimum_bytes: int = Field(
+        int(os.environ.get("COMPRESSION_MINIMUM_BYTES", "1000"))
+    )
+    """
+    Responses smaller than this (bytes) are not compressed
+    """
+
+    compression_offload_bytes: int = Field(
+        int(os.environ.get("COMPRESSION_OFFLOAD_BYTES", "32768"))
+    )
+    """
+    Responses (or stream chunks) at least this large (bytes) are compressed in a thread, not on the event loop
+    """
+
+    compression_threads: int = Field(int(os.environ.get("COMPRESSION_THREADS", "2")))
+    """
+    Number of threads dedicated to compressing large responses
+    """
+
+    compression_cache_bytes: int = Field(
+        int(os.environ.get("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+    )
+    """
+    Maximum total size (bytes) of compressed immutable responses (with a strong ETag) kept in memory
+    """
+
+    trpc_max_batch_size: int = Field(int(os.environ.get("TRPC_MAX_BATCH_SIZE", "20")))
+    """
+    Maximum number of procedures in a batched tRPC request
+    """
+
+    cache_overrides: dict[str, dict[str, float]] = Field(
+        json.loads(os.environ.get("CACHE_OVERRIDES", "{}"))
+    )
+    """
+    Size and TTL of named caches, overriding their defaults (e.g. {"users": {"maxsize": 50000, "ttl": 600}})
+    """
+
+    redis_url: SecretStr | None = Field(os.environ.get("REDIS_URL"))
+    """
+    Redis server of the cache shared by every worker (e.g. redis://localhost:6379/0), unset to cache per worker only
+    """
+
+    shared_cache_secret: SecretStr = Field(
+        os.environ.get("SHARED_CACHE_SECRET") or secrets.token_urlsafe(32)
+    )
+    """
+    The secret used to sign shared cache entries (the Redis server is not trusted, see SharedCache)
+    Generated when unset, which is only fine for a single machine (its workers share the app loaded before they fork)
+    """
+
+    cache_stats_interval_seconds: float = Field(
+        float(os.environ.get("CACHE_STATS_INTERVAL_SECONDS", "60"))
+    )
+    """
+    Time (seconds) between logs of the caches' sizes and hit rates (0 to disable)
+    """
+
     sentry_dsn: str | None = os.environ.get("SENTRY_DSN")
 
+    @property
+    def worker_db_pool_size(self) -> int:
+        """
+        Database connections kept open by each worker process
+        """
+        return max(1, self.db_pool_size // self.web_concurrency)
+
+    @property
+    def worker_db_max_overflow(self) -> int:
+        """
+        Database connections each worker process opens on top of its pool under load
+        """
+        return self.db_max_overflow // self.web_concurrency
+
     @property
     def environment(self) -> str:
         """
@@ -0,0 +1,137 @@
+"""
+Content-addressed image store
+
+Room images used to live inline (as data URLs) in the WaitingRoom row, and travelled in every room response.
+Each image is now stored once in the ImageBlob table, keyed by the SHA-256 of its content,
+and rooms only keep the hash. Images are served by GET /blob/{hash} (see routes/blob.py).
+
+Rooms saved before the ImageBlob table was created may still hold data URLs until migrated,
+they are passed through as they are.
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+from typing import NamedTuple
+
+import fastapi
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache.local import Cache
+from ..config import CONFIG
+from ..models import ImageBlob
+
+BLOB_HASH = re.compile(r"[0-9a-f]{64}")
+
+_DATA_URL = re.compile(r"data:(?P<content_type>image/[\w.+-]+)(;[^,]*)?;base64,")
+_BLOB_URL = re.compile(r".*/blob/(?P<hash>[0-9a-f]{64})")
+
+
+class Blob(NamedTuple):
+    hash: str
+    content_type: str
+    data: bytes
+
+
+blob_cache = Cache(
+    "blobs", maxsize=CONFIG.blob_cache_bytes, getsizeof=lambda blob: len(blob.data)
+)
+"""
+Blobs by hash (content never changes, so entries are never stale), bounded by total size in bytes
+"""
+
+
+async def store_image(session: AsyncSession, image: str | None) -> str | None:
+    """
+    Store an image sent by a client, and return what the room row keeps instead
+
+    :param image: A data URL (a new image), the URL or hash of a stored image, or empty (no image)
+    :raises fastapi.HTTPException: If the image is not a valid image data URL, is too large,
+        or refers to an image that isn't stored
+    """
+    if not image:
+        return image
+    if BLOB_HASH.fullmatch(image):
+        return await _stored_hash(session, image)
+    if match := _BLOB_URL.fullmatch(image):
+        return await _stored_hash(session, match["hash"])
+
+    match = _DATA_URL.match(image)
+    if match is None:
+        raise fastapi.HTTPException(
+            status_code=422, detail="Images must be base64 encoded image data URLs"
+        )
+    try:
+        data = base64.b64decode(image[match.end() :], validate=True)
+    except binascii.Error:
+        raise fastapi.HTTPException(status_code=422, detail="Invalid image encoding")
+    if len(data) > CONFIG.blob_max_bytes:
+        raise fastapi.HTTPException(
+            status_code=413,
+            detail=f"Images must be smaller than {CONFIG.blob_max_bytes} bytes",
+        )
+
+    blob = Blob(hashlib.sha256(data).hexdigest(), match["content_type"], data)
+    await session.execute(
+        insert(ImageBlob)
+        .values(
+            hash=blob.hash,
+            content_type=blob.content_type,
+            size=len(data),
+            data=data,
+        )
+        .on_conflict_do_nothing(index_elements=[ImageBlob.hash])
+    )
+    blob_cache[blob.hash] = blob
+    return blob.hash
+
+
+async def _stored_hash(session: AsyncSession, blob_hash: str) -> str:
+    """
+    The hash of a stored image, a room must not refer to a blob that doesn't exist (it would serve 404s)
+    """
+    if blob_hash in blob_cache:
+        return blob_hash
+    stored = (
+        await session.execute(select(ImageBlob.hash).where(ImageBlob.hash == blob_hash))
+    ).scalar_one_or_none()
+    if stored is None:
+        raise fastapi.HTTPException(status_code=422, detail="Unknown image")
+    return blob_hash
+
+
+async def fetch_blob(session: AsyncSession, blob_hash: str) -> Blob | None:
+    """
+    Fetch a blob by hash (cached in memory)
+    """
+    if (blob := blob_cache.get(blob_hash)) is not None:
+        return blob
+    row = (
+        await session.execute(
+            select(ImageBlob.content_type, ImageBlob.data).where(
+                ImageBlob.hash == blob_hash
+            )
+        )
+    ).one_or_none()
+    if row is None:
+        return None
+    blob = Blob(blob_hash, row[0], row[1])
+    if len(blob.data) <= blob_cache.maxsize:
+        blob_cache[blob_hash] = blob
+    return blob
+
+
+def image_url(request: fastapi.Request, image: str | None) -> str | None:
+    """
+    What clients get for a room's image: the URL of the stored blob (legacy data URLs are returned as they are)
+
+    URLs are built from CONFIG.public_server_url, not from the request's Host header:
+    responses holding them are cached and shared with every visitor (see /room.readPublic).
+    """
+    if image and BLOB_HASH.fullmatch(image):
+        path = request.app.url_path_for("blob", blob_hash=image)
+        return f"{(CONFIG.public_server_url or '').rstrip('/')}{path}"
+    return image
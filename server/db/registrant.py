@@ -0,0 +1,427 @@
+"""
+Write-behind ingestion of registrants
+
+When a room opens we receive thousands of registrations within the first second.
+Instead of running one INSERT + COMMIT per request (each holding a pooled connection),
+registrations are put on an in-process queue and flushed as multi-row
+INSERT statements, triggered by batch size or a short delay (a few ms).
+
+Each caller awaits a future that is resolved with the ID of its row once it is written.
+IDs are generated here (random UUIDs, like the column's default) unless the caller chose one,
+a batch is a single INSERT ... VALUES (...), (...) with nothing to return.
+Rows whose ID is already written are skipped (a retried registration, see TurnstileOutcomeCache.claim).
+The turnstile timestamp is taken from the request itself, so batching does not affect
+the ordering (fairness) of registrants, only the time their row hits the database.
+
+Registrants accepted while Cloudflare was unavailable are validated later by TurnstileReverifier.
+"""
+
+import asyncio
+import uuid
+from datetime import UTC, datetime, timedelta
+from typing import Any, Sequence, cast
+
+import fastapi
+import httpx
+from sqlalchemy import Row, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..background import PeriodicTask
+from ..circuit_breaker import CircuitBreaker
+from ..logger import logger
+from ..models import Registrant
+from ..turnstile import TurnstileOutcomeCache, verify_turnstile_token
+from ..types import TurnstileOutcome
+from .room_stats import RegistrationCounter
+from .waiting_room import read_waiting_rooms
+
+RegistrantValues = dict[str, Any]
+"""
+Column values of a registrant row, keyed by ORM attribute name (e.g. legal_name)
+"""
+
+
+class RegistrantBatcher:
+    """
+    Batch concurrent registrant inserts into multi-row INSERT statements
+
+    Use as an async context manager, the flusher task runs while the context is active
+    and pending registrants are flushed when the context exits.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        max_batch_size: int = 256,
+        max_delay: float = 0.005,
+        max_concurrent_flushes: int = 4,
+        max_pending: int | None = None,
+    ):
+        """
+        :param session_maker: Used to open a session per flushed batch
+        :param max_batch_size: Flush as soon as this many registrants are pending
+        :param max_delay: Flush at most this many seconds after the first pending registrant
+        :param max_concurrent_flushes: Number of batches that may be written concurrently
+        :param max_pending: Records (see record) are dropped while this many registrants are pending (None for no limit)
+        """
+        self._session_maker = session_maker
+        self._max_batch_size = max_batch_size
+        self._max_pending = max_pending
+        self._max_delay = max_delay
+        self._flush_slots = asyncio.Semaphore(max_concurrent_flushes)
+        self._pending: list[tuple[RegistrantValues, asyncio.Future[uuid.UUID]]] = []
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._flushes: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.batches = 0
+        """
+        Number of flushed batches (i.e. write transactions)
+        """
+        self.registrants = 0
+        """
+        Number of registrants written
+        """
+        self.dropped = 0
+        """
+        Number of records dropped because too many registrants were pending
+        """
+
+    async def __aenter__(self) -> "RegistrantBatcher":
+        self._task = asyncio.create_task(self._run(), name="registrant-batcher")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._closing = True
+        self._has_pending.set()
+        self._batch_full.set()
+        if self._task is not None:
+            await self._task
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def submit(self, values: RegistrantValues) -> uuid.UUID:
+        """
+        Queue a registrant for insertion
+
+        :param values: The registrant's column values (keyed by ORM attribute name), with or without an id
+        :return: The ID of the registrant, once it is written
+        """
+        return await self._enqueue(values)
+
+    def record(self, values: RegistrantValues) -> bool:
+        """
+        Queue a registrant for insertion without waiting for it to be written
+
+        Used for audit records (bots, too early registrations), where nobody needs the ID.
+        Failures are logged. While max_pending registrants are pending (e.g. a bot wave outpacing the database)
+        records are dropped instead of growing the queue without bounds.
+
+        :return: Whether or not the registrant was queued
+        """
+        if self._max_pending is not None and len(self._pending) >= self._max_pending:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(
+                    "RegistrantBatcher: %s registrants pending, dropped %s records so far",
+                    len(self._pending),
+                    self.dropped,
+                )
+            return False
+        self._enqueue(values).add_done_callback(_log_failed_record)
+        return True
+
+    def _enqueue(self, values: RegistrantValues) -> asyncio.Future[uuid.UUID]:
+        if self._closing:
+            raise RuntimeError("RegistrantBatcher is closed")
+        future: asyncio.Future[uuid.UUID] = asyncio.get_running_loop().create_future()
+        self._pending.append((values, future))
+        self._has_pending.set()
+        if len(self._pending) >= self._max_batch_size:
+            self._batch_full.set()
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            if not self._pending and self._closing:
+                return
+            if not self._closing:
+                # Give concurrent requests a few ms to join the batch
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self._max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush_slots.acquire()
+            batch = self._pending[: self._max_batch_size]
+            del self._pending[: self._max_batch_size]
+            if len(self._pending) < self._max_batch_size and not self._closing:
+                self._batch_full.clear()
+            if not self._pending and not self._closing:
+                self._has_pending.clear()
+            if not batch:
+                self._flush_slots.release()
+                continue
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(
+        self, batch: list[tuple[RegistrantValues, asyncio.Future[uuid.UUID]]]
+    ) -> None:
+        try:
+            rows = [{"id": uuid.uuid4(), **values} for values, _future in batch]
+            try:
+                async with self._session_maker() as session, session.begin():
+                    await session.execute(
+                        insert(Registrant)
+                        .values(rows)
+                        .on_conflict_do_nothing(index_elements=[Registrant.id])
+                    )
+            except Exception:
+                logger.exception(
+                    "RegistrantBatcher: batch of %s failed, inserting one by one",
+                    len(batch),
+                )
+                await self._flush_one_by_one(batch, rows)
+                return
+
+            self.batches += 1
+            self.registrants += len(rows)
+            for (_values, future), row in zip(batch, rows):
+                if not future.done():
+                    future.set_result(row["id"])
+        finally:
+            self._flush_slots.release()
+
+    async def _flush_one_by_one(
+        self,
+        batch: list[tuple[RegistrantValues, asyncio.Future[uuid.UUID]]],
+        rows: list[RegistrantValues],
+    ) -> None:
+        """
+        Fallback for a failed batch, so a single bad row doesn't fail its neighbours
+        """
+        for (_values, future), row in zip(batch, rows):
+            try:
+                async with self._session_maker() as session, session.begin():
+                    await session.execute(
+                        insert(Registrant)
+                        .values(**row)
+                        .on_conflict_do_nothing(index_elements=[Registrant.id])
+                    )
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.registrants += 1
+            if not future.done():
+                future.set_result(row["id"])
+
+
+class TurnstileReverifier(PeriodicTask):
+    """
+    Validate the turnstile tokens of registrations accepted while Cloudflare was unavailable
+
+    Pending registrants are the ones with a stored turnstile token.
+    Once validated, their turnstile columns are updated with the real outcome
+    (success, challenge timestamp, fail reason) and the token is dropped.
+
+    Cloudflare only accepts a token within 5 minutes of the challenge,
+    tokens validated later than that come back as timeout-or-duplicate.
+    So does a token validated twice: every worker runs a reverifier, a batch is claimed
+    (reverifyClaimedAt is set, in a short transaction) so other workers skip it for `lease` seconds,
+    and outcomes are only written to registrants that still hold the validated token.
+    No transaction is open while Cloudflare is called.
+    """
+
+    name = "turnstile-reverifier"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        cf_http_client: httpx.AsyncClient,
+        breaker: CircuitBreaker,
+        cache: TurnstileOutcomeCache | None = None,
+        counter: RegistrationCounter | None = None,
+        interval: float = 5,
+        concurrency: int = 8,
+        batch_size: int = 100,
+        lease: float = 120,
+    ):
+        """
+        :param session_maker: Used to open a session per batch of pending registrants
+        :param cf_http_client: HTTP client for https://challenges.cloudflare.com
+        :param breaker: The circuit breaker shared with request-time validation
+        :param cache: Outcomes validated at request time (e.g. a client retried with the same token)
+        :param counter: Registration counts to update once registrants are validated
+        :param interval: Seconds between checks for pending registrants
+        :param concurrency: Maximum number of concurrent siteverify calls
+        :param batch_size: Number of pending registrants loaded at once
+        :param lease: Seconds a claimed batch is left to its worker, before other workers take it over
+        """
+        super().__init__(interval)
+        self._session_maker = session_maker
+        self._cf_http_client = cf_http_client
+        self._breaker = breaker
+        self._cache = cache
+        self._counter = counter
+        self._slots = asyncio.Semaphore(concurrency)
+        self._batch_size = batch_size
+        self._lease = timedelta(seconds=lease)
+
+    async def tick(self) -> None:
+        while not self._breaker.is_open():
+            if await self._verify_batch() < self._batch_size:
+                return
+
+    async def _verify_batch(self) -> int:
+        """
+        Validate a batch of pending registrants, and write their outcomes
+
+        :return: The number of pending registrants in the batch (0 when there are none left)
+        """
+        pending = await self._claim()
+        if not pending:
+            return 0
+
+        outcomes = await asyncio.gather(
+            *(self._verify(registrant.turnstile_token) for registrant in pending)
+        )
+        verified = [
+            (registrant, outcome)
+            for registrant, outcome in zip(pending, outcomes)
+            if not outcome.pending
+        ]
+        logger.info(
+            "[%s] validated %s of %s pending registrants",
+            self.name,
+            len(verified),
+            len(pending),
+        )
+        async with self._session_maker() as session, session.begin():
+            updated = []
+            for registrant, outcome in verified:
+                result = await session.execute(
+                    update(Registrant)
+                    .where(Registrant.id == registrant.id)
+                    # Only while it is still pending
+                    .where(Registrant.turnstile_token == registrant.turnstile_token)
+                    .values(**_verified_values(outcome))
+                )
+                if result.rowcount:
+                    updated.append((registrant, outcome))
+            if unverified := [
+                registrant.id
+                for registrant, outcome in zip(pending, outcomes)
+                if outcome.pending
+            ]:
+                # Cloudflare is unavailable again, release them for the next attempt
+                await session.execute(
+                    update(Registrant)
+                    .where(Registrant.id.in_(unverified))
+                    .values(reverify_claimed_at=None)
+                )
+            rooms = await read_waiting_rooms(
+                session, {registrant.waiting_room_id for registrant, _ in updated}
+            )
+
+        if self._counter is not None:
+            # Outcomes (and timestamps) changed, move the registrants to their new counts
+            for registrant, outcome in updated:
+                room = rooms.get(registrant.waiting_room_id)
+                if room is None:
+                    continue
+                values = {
+                    "event_choice": registrant.event_choice,
+                    "turnstile_success": registrant.turnstile_success,
+                    # Re attach UTC timezone
+                    "turnstile_timestamp": registrant.turnstile_timestamp.replace(
+                        tzinfo=UTC
+                    ),
+                }
+                self._counter.add(room, values, -1)
+                self._counter.add(room, {**values, **_verified_values(outcome)})
+        return len(pending)
+
+    async def _claim(self) -> Sequence[Row]:
+        """
+        Claim a batch of pending registrants that no other worker is validating
+        """
+        now = datetime.now(UTC)
+        async with self._session_maker() as session, session.begin():
+            pending = (
+                await session.execute(
+                    select(
+                        Registrant.id,
+                        Registrant.turnstile_token,
+                        Registrant.waiting_room_id,
+                        Registrant.event_choice,
+                        Registrant.turnstile_success,
+                        Registrant.turnstile_timestamp,
+                    )
+                    .where(Registrant.turnstile_token.is_not(None))
+                    .where(
+                        or_(
+                            Registrant.reverify_claimed_at.is_(None),
+                            Registrant.reverify_claimed_at <= now - self._lease,
+                        )
+                    )
+                    .order_by(Registrant.turnstile_timestamp.asc())
+                    .limit(self._batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if pending:
+                await session.execute(
+                    update(Registrant)
+                    .where(Registrant.id.in_([registrant.id for registrant in pending]))
+                    .values(reverify_claimed_at=now)
+                )
+        return pending
+
+    async def _verify(self, token: str) -> TurnstileOutcome:
+        async with self._slots:
+            return await verify_turnstile_token(
+                self._cf_http_client, token, self._breaker, self._cache
+            )
+
+
+def _verified_values(outcome: TurnstileOutcome) -> RegistrantValues:
+    values = {
+        "turnstile_success": outcome.success,
+        "turnstile_fail_reason": (
+            str(outcome.error_codes) if outcome.error_codes else None
+        ),
+        "turnstile_token": None,
+        "reverify_claimed_at": None,
+    }
+    if outcome.challenge_ts is not None:
+        # The actual time the challenge was solved replaces the time of the request
+        values["turnstile_timestamp"] = outcome.challenge_ts
+    return values
+
+
+def _log_failed_record(future: asyncio.Future[uuid.UUID]) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(
+            "RegistrantBatcher: failed to record registrant",
+            exc_info=future.exception(),
+        )
+
+
+def registrant_batcher(request: fastapi.Request) -> RegistrantBatcher | None:
+    """
+    Get the registrant batcher from the request state (None when batching is disabled)
+    """
+    return cast(RegistrantBatcher | None, request.state.registrant_batcher)
+
+
+def registrant_audit(request: fastapi.Request) -> RegistrantBatcher:
+    """
+    Get the batcher used to record rejected registrations (bots, too early) from the request state
+    """
+    return cast(RegistrantBatcher, request.state.registrant_audit)
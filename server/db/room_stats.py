@@ -0,0 +1,185 @@
+"""
+Registration counters for /room.stats
+
+Counting registrants with a range scan on every dashboard poll is the most expensive read
+during the busiest minutes. Instead, every worker counts the registrations it writes,
+and adds its counts to the RoomRegistrationCount table every second (one upsert per room, event choice
+and turnstile outcome, so there is no hot row per registration).
+
+Reading the stats of a room is then a lookup of a handful of rows.
+Counts are reconciled against the Registrant table on demand (and whenever the opening window
+changes after the fact), see RegistrationCounter.reconcile.
+"""
+
+import collections
+import uuid
+from datetime import datetime
+from typing import Any, Mapping, cast
+
+import fastapi
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..background import PeriodicTask
+from ..logger import logger
+from ..models import Registrant, RoomRegistrationCount, WaitingRoom
+from .waiting_room import CachedWaitingRoomQueryResult
+
+CounterKey = tuple[uuid.UUID, str, bool]
+"""
+(waiting room ID, event choice, turnstile success)
+"""
+
+RoomCounts = dict[tuple[str, bool], int]
+"""
+Registrants of a room by (event choice, turnstile success)
+"""
+
+
+class RegistrationCounter(PeriodicTask):
+    """
+    Count registrations in memory and add the counts to the RoomRegistrationCount table periodically
+    """
+
+    name = "registration-counter"
+
+    def __init__(
+        self, session_maker: async_sessionmaker[AsyncSession], interval: float = 1
+    ):
+        """
+        :param session_maker: Used to write and reconcile the counts
+        :param interval: Seconds between writes of the counts
+        """
+        super().__init__(interval)
+        self._session_maker = session_maker
+        self._deltas: collections.Counter[CounterKey] = collections.Counter()
+
+    def add(
+        self,
+        room: CachedWaitingRoomQueryResult,
+        registrant: Mapping[str, Any],
+        count: int = 1,
+    ) -> None:
+        """
+        Count a registrant written to the database (ORM attribute names, see RegistrantValues)
+
+        Only registrants within the room's opening window are counted (like /room.stats always did)
+
+        :param count: -1 to uncount a registrant (e.g. before counting it again with its updated values)
+        """
+        timestamp: datetime | None = registrant["turnstile_timestamp"]
+        if timestamp is None or not room.opens_at < timestamp < room.closes_at:
+            return
+        key = (room.id, registrant["event_choice"], registrant["turnstile_success"])
+        self._deltas[key] += count
+
+    async def tick(self) -> None:
+        deltas, self._deltas = self._deltas, collections.Counter()
+        if not deltas:
+            return
+        statement = insert(RoomRegistrationCount).values(
+            [
+                {
+                    "waiting_room_id": room_id,
+                    "event_choice": event_choice,
+                    "turnstile_success": success,
+                    "count": count,
+                }
+                for (room_id, event_choice, success), count in deltas.items()
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                RoomRegistrationCount.waiting_room_id,
+                RoomRegistrationCount.event_choice,
+                RoomRegistrationCount.turnstile_success,
+            ],
+            set_={"count": RoomRegistrationCount.count + statement.excluded.count},
+        )
+        try:
+            async with self._session_maker() as session, session.begin():
+                await session.execute(statement)
+        except Exception:
+            # Try again on the next tick
+            self._deltas.update(deltas)
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        await super().__aexit__(*exc_info)
+        await self.tick()
+
+    async def read(self, session: AsyncSession, room_id: uuid.UUID) -> RoomCounts:
+        """
+        Counts of a room (including counts of this worker that were not written yet)
+        """
+        rows = await session.execute(
+            select(
+                RoomRegistrationCount.event_choice,
+                RoomRegistrationCount.turnstile_success,
+                RoomRegistrationCount.count,
+            ).where(RoomRegistrationCount.waiting_room_id == room_id)
+        )
+        counts: RoomCounts = collections.Counter()
+        for event_choice, success, count in rows:
+            counts[(event_choice, success)] += count
+        for (_room_id, event_choice, success), count in self._deltas.items():
+            if _room_id == room_id:
+                counts[(event_choice, success)] += count
+        return dict(counts)
+
+    async def reconcile(self, room_id: uuid.UUID) -> RoomCounts:
+        """
+        Count the registrants of a room, and replace the stored counts with the real ones
+
+        Counts of other workers that were not written yet (at most one interval's worth)
+        are added on top of the real count, reconcile again once things settle for an exact count.
+        """
+        for key in [key for key in self._deltas if key[0] == room_id]:
+            del self._deltas[key]
+        async with self._session_maker() as session, session.begin():
+            rows = (
+                await session.execute(
+                    select(
+                        Registrant.event_choice,
+                        Registrant.turnstile_success,
+                        func.count(Registrant.id),
+                    )
+                    .join(WaitingRoom, Registrant.waiting_room_id == WaitingRoom.id)
+                    .where(WaitingRoom.id == room_id)
+                    .where(Registrant.turnstile_timestamp > WaitingRoom.opens_at)
+                    .where(Registrant.turnstile_timestamp < WaitingRoom.closes_at)
+                    .group_by(Registrant.event_choice, Registrant.turnstile_success)
+                )
+            ).all()
+            await session.execute(
+                delete(RoomRegistrationCount).where(
+                    RoomRegistrationCount.waiting_room_id == room_id
+                )
+            )
+            if rows:
+                await session.execute(
+                    insert(RoomRegistrationCount).values(
+                        [
+                            {
+                                "waiting_room_id": room_id,
+                                "event_choice": event_choice,
+                                "turnstile_success": success,
+                                "count": count,
+                            }
+                            for event_choice, success, count in rows
+                        ]
+                    )
+                )
+        counts = {
+            (event_choice, success): count for event_choice, success, count in rows
+        }
+        logger.info("Reconciled registration counts of room %s: %s", room_id, counts)
+        return counts
+
+
+def registration_counter(request: fastapi.Request) -> RegistrationCounter:
+    """
+    Get the registration counter from the request state
+    """
+    return cast(RegistrationCounter, request.state.registration_counter)
@@ -0,0 +1,172 @@
+"""
+Registration arrival timeline for /room.timeline
+
+Registrants are counted per time bucket after the room opens, in SQL (a range scan of the
+(waitingRoomId, turnstileTimestamp) index), so drawing the arrival curve never ships registrant rows.
+
+Timelines of closed rooms never change, and are cached as they are.
+Timelines of open rooms are cached too, and each refresh only recounts the latest buckets:
+registrants are timestamped when they solve the challenge, and written up to `settle` seconds later,
+so buckets older than that are final.
+"""
+
+import math
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import Integer, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache.local import Cache
+from ..config import CONFIG
+from ..models import Registrant
+from ..singleflight import SingleFlight
+from .waiting_room import CachedWaitingRoomQueryResult
+
+TimelineKey = tuple[uuid.UUID, int, datetime, datetime]
+"""
+(waiting room ID, bucket seconds, opens at, closes at), a changed opening window is a different timeline
+"""
+
+
+@dataclass
+class Timeline:
+    bucket_seconds: int
+    buckets: dict[int, list[int]] = field(default_factory=dict)
+    """
+    [turnstile successes, turnstile failures] by bucket number (bucket 0 starts at opens_at)
+    """
+    early_count: int = 0
+    """
+    Registrations timestamped before the room opened
+    """
+    late_count: int = 0
+    """
+    Registrations timestamped after the room closed
+    """
+    untimed_failures: int = 0
+    """
+    Turnstile failures without a timestamp (can't be placed in a bucket)
+    """
+    computed_at: datetime | None = None
+    complete: bool = False
+    """
+    The room closed (and settled), the timeline won't change
+    """
+
+
+closed_timelines = Cache("closed_timelines", maxsize=256)
+"""
+Timelines of closed rooms, kept until evicted by newer ones
+"""
+
+open_timelines = Cache("open_timelines", maxsize=256, ttl=600)
+"""
+Timelines of open rooms, dropped once nobody looks at them for a while
+"""
+
+_refreshes = SingleFlight()
+
+
+async def room_timeline(
+    session: AsyncSession,
+    room: CachedWaitingRoomQueryResult,
+    bucket_seconds: int,
+    settle: float = CONFIG.timeline_settle_seconds,
+) -> Timeline:
+    """
+    Registration counts of a room per bucket_seconds (concurrent refreshes of a timeline are shared)
+
+    :param room: The room (the caller checked the user may see it)
+    :param bucket_seconds: Width of the buckets
+    :param settle: Seconds a registration can take to be written after its turnstile timestamp
+    """
+    key: TimelineKey = (room.id, bucket_seconds, room.opens_at, room.closes_at)
+    if (timeline := closed_timelines.get(key)) is not None:
+        return timeline
+
+    async def refresh() -> Timeline:
+        timeline = open_timelines.get(key) or Timeline(bucket_seconds)
+        await _refresh(session, room, timeline, timedelta(seconds=settle))
+        if timeline.complete:
+            open_timelines.pop(key, None)
+            closed_timelines[key] = timeline
+        else:
+            open_timelines[key] = timeline
+        return timeline
+
+    return await _refreshes.do(key, refresh)
+
+
+async def _refresh(
+    session: AsyncSession,
+    room: CachedWaitingRoomQueryResult,
+    timeline: Timeline,
+    settle: timedelta,
+) -> None:
+    """
+    Recount the buckets that may have changed since the timeline was last computed
+    """
+    now = datetime.now(UTC)
+    first_bucket = 0
+    if timeline.computed_at is not None:
+        since = timeline.computed_at - settle - room.opens_at
+        first_bucket = max(
+            0, math.floor(since.total_seconds() / timeline.bucket_seconds)
+        )
+    since = room.opens_at + timedelta(seconds=first_bucket * timeline.bucket_seconds)
+
+    bucket = cast(
+        func.floor(
+            (
+                func.extract("epoch", Registrant.turnstile_timestamp)
+                - room.opens_at.timestamp()
+            )
+            / timeline.bucket_seconds
+        ),
+        Integer,
+    ).label("bucket")
+    rows = await session.execute(
+        select(
+            bucket,
+            func.count().filter(Registrant.turnstile_success == True),
+            func.count().filter(Registrant.turnstile_success == False),
+        )
+        .where(Registrant.waiting_room_id == room.id)
+        .where(Registrant.turnstile_timestamp > room.opens_at)
+        .where(Registrant.turnstile_timestamp >= since)
+        .where(Registrant.turnstile_timestamp < room.closes_at)
+        .group_by(bucket)
+    )
+    for number in [number for number in timeline.buckets if number >= first_bucket]:
+        del timeline.buckets[number]
+    for number, successes, failures in rows:
+        timeline.buckets[number] = [successes, failures]
+
+    # Outside the opening window (few rows, recounted every time)
+    timestamp = Registrant.turnstile_timestamp
+    early, late, untimed = (
+        await session.execute(
+            select(
+                func.count().filter(timestamp <= room.opens_at),
+                func.count().filter(timestamp >= room.closes_at),
+                func.count().filter(
+                    timestamp.is_(None), Registrant.turnstile_success == False
+                ),
+            )
+            .where(Registrant.waiting_room_id == room.id)
+            .where(
+                or_(
+                    timestamp.is_(None),
+                    timestamp <= room.opens_at,
+                    timestamp >= room.closes_at,
+                )
+            )
+        )
+    ).one()
+    timeline.early_count = early
+    timeline.late_count = late
+    timeline.untimed_failures = untimed
+    timeline.computed_at = now
+    timeline.complete = now > room.closes_at + settle
@@ -1,9 +1,7 @@
 import uuid
 from typing import Annotated
 
-from asyncache import cached
-from cachetools import TTLCache
-from cachetools.keys import methodkey
+from cachetools.keys import hashkey
 from fastapi import Depends, HTTPException
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy.dialects.postgresql import insert
@@ -11,6 +9,8 @@ from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from starlette.authentication import UnauthenticatedUser
 from starlette.requests import Request
 
+from ..cache.decorators import cached
+from ..cache.local import Cache
 from ..constants import TTL_FIVE_MINUTES
 from ..db.session import db_session
 from ..models import User as DbUser
@@ -25,13 +25,18 @@ class User(BaseModel):
     email: str
 
 
-@cached(cache=TTLCache(maxsize=1024, ttl=TTL_FIVE_MINUTES), key=methodkey)
+@cached(
+    Cache("users", maxsize=10_000, ttl=TTL_FIVE_MINUTES, value_type=User),
+    # By Firebase UID, a FirebaseUser is created per request
+    key=lambda _session, user: hashkey(user.identity),
+)
 async def fetch_or_create_cached_user(
     session: AsyncSession, user: FirebaseUser
 ) -> User:
     """
     Fetch or create a user by their Firebase UID
     This is cached for 5 minutes as user records are immutable
+    Concurrent cache misses for the same user share a single upsert
     """
 
     async with session.begin():
@@ -1,15 +1,19 @@
+import asyncio
 import uuid
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
 from typing import cast
 
-from asyncache import cached
-from cachetools import TTLCache
-from cachetools.keys import methodkey
+from cachetools.keys import hashkey, methodkey
 from pydantic import BaseModel, AwareDatetime
-from sqlalchemy import select, or_
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import QueuePool
 
-from ..constants import TTL_FIVE_MINUTES
+from ..background import PeriodicTask
+from ..cache.decorators import cached
+from ..cache.local import Cache
+from ..config import CONFIG
+from ..logger import logger
 from ..models import WaitingRoom
 
 
@@ -17,40 +21,211 @@ class CachedWaitingRoomQueryResult(BaseModel):
     id: uuid.UUID
     opens_at: AwareDatetime
     closes_at: AwareDatetime
+    published: bool
+    owner_id: uuid.UUID
+
+
+_ROOM_COLUMNS = (
+    WaitingRoom.id,
+    WaitingRoom.opens_at,
+    WaitingRoom.closes_at,
+    WaitingRoom.published,
+    WaitingRoom.owner_id,
+)
+
+
+class PinnedRooms:
+    """
+    Published rooms about to open (or open), kept in memory until they close
+
+    Unlike the TTL cache, entries are never evicted or expired before closes_at,
+    so the registration rush never hits a cold cache.
+    """
+
+    def __init__(self):
+        self._rooms: dict[uuid.UUID, CachedWaitingRoomQueryResult] = {}
+
+    def replace(self, rooms: list[CachedWaitingRoomQueryResult]) -> None:
+        """
+        Pin exactly these rooms (rooms that got unpublished or closed are unpinned)
+        """
+        self._rooms = {room.id: room for room in rooms}
+
+    def get(self, room_id: uuid.UUID) -> CachedWaitingRoomQueryResult | None:
+        room = self._rooms.get(room_id)
+        if room is not None and room.closes_at < datetime.now(UTC):
+            self._rooms.pop(room.id, None)
+            return None
+        return room
+
+    def unpin(self, room_id: uuid.UUID) -> None:
+        self._rooms.pop(room_id, None)
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+
+pinned_rooms = PinnedRooms()
+
+room_cache = Cache(
+    "rooms",
+    maxsize=1024,
+    ttl=CONFIG.room_cache_ttl_seconds,
+    value_type=CachedWaitingRoomQueryResult | None,
+)
+"""
+Rooms by ID (None for unknown IDs), evicted by invalidate_waiting_room when a room changes
+"""
 
 
-@cached(cache=TTLCache(maxsize=1024, ttl=TTL_FIVE_MINUTES), key=methodkey)
 async def fetch_waiting_room(
     session: AsyncSession,
     waiting_room_id: str,
     maybe_user_id: str | None,
 ) -> CachedWaitingRoomQueryResult | None:
     """
-    Fetch a waiting room by ID
-    This is cached for 5 minutes, as we don't expect waiting rooms to change once published
+    Fetch a waiting room by ID (published rooms, or rooms owned by the user)
+    Rooms pinned by RoomPrewarmer are served from memory,
+    other rooms are cached (for ROOM_CACHE_TTL_SECONDS, or until the room changes, see invalidate_waiting_room)
+    Concurrent cache misses for the same room share a single query
 
     :param session: The database session to use
     :param waiting_room_id: The ID of the waiting room to fetch
+    :param maybe_user_id: The ID of the logged-in user, if any
     """
-    if maybe_user_id is not None:
-        cond = or_(WaitingRoom.published == True, WaitingRoom.owner_id == maybe_user_id)
-    else:
-        cond = WaitingRoom.published == True
-
-    _room = await session.execute(
-        (
-            select(WaitingRoom.id, WaitingRoom.opens_at, WaitingRoom.closes_at)
-            .where(WaitingRoom.id == waiting_room_id)
-            .where(cond)
-        )
-    )
-
-    room = _room.one_or_none()
+    try:
+        room_id = uuid.UUID(waiting_room_id)
+    except ValueError:
+        return None
+    room = pinned_rooms.get(room_id) or await _query_waiting_room(session, room_id)
     if room is None:
         return None
+    if not room.published and str(room.owner_id) != str(maybe_user_id):
+        return None
+    return room
+
+
+def invalidate_waiting_room(room_id: uuid.UUID) -> None:
+    """
+    Evict a room from the caches (subscribed to the room invalidation channel)
+    """
+    room_cache.invalidate(hashkey(room_id))
+    pinned_rooms.unpin(room_id)
+
+
+async def read_waiting_rooms(
+    session: AsyncSession, room_ids: set[uuid.UUID]
+) -> dict[uuid.UUID, CachedWaitingRoomQueryResult]:
+    """
+    Read rooms by ID, straight from the database (published or not, for background work)
+    """
+    if not room_ids:
+        return {}
+    rooms = await session.execute(
+        select(*_ROOM_COLUMNS).where(WaitingRoom.id.in_(room_ids))
+    )
+    return {room[0]: _to_result(room) for room in rooms}
+
+
+@cached(room_cache, key=methodkey)
+async def _query_waiting_room(
+    session: AsyncSession, room_id: uuid.UUID
+) -> CachedWaitingRoomQueryResult | None:
+    room = (
+        await session.execute(select(*_ROOM_COLUMNS).where(WaitingRoom.id == room_id))
+    ).one_or_none()
+    return None if room is None else _to_result(room)
+
+
+def _to_result(room: Row) -> CachedWaitingRoomQueryResult:
     return CachedWaitingRoomQueryResult(
         id=room[0],
         # Re attach UTC timezone
         opens_at=cast(datetime, room[1]).replace(tzinfo=UTC),
         closes_at=cast(datetime, room[2]).replace(tzinfo=UTC),
+        published=room[3],
+        owner_id=room[4],
     )
+
+
+class RoomPrewarmer(PeriodicTask):
+    """
+    Get ready for published rooms that open soon
+
+    Pins the rooms opening within the horizon (see PinnedRooms),
+    and fills the connection pool shortly before each opening, so the first second of an opening
+    doesn't pay for cold caches or connection establishment.
+    The pool is filled once per room (the last tick or two before it opens), only with the connections
+    it is missing. Rooms already open are left alone (their registrations keep the pool warm),
+    other rooms opening meanwhile still get their pool filled.
+    """
+
+    name = "room-prewarmer"
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        session_maker: async_sessionmaker[AsyncSession],
+        horizon: float = 600,
+        interval: float = 30,
+        pool_connections: int = 30,
+    ):
+        """
+        :param engine: The engine whose pool is filled
+        :param session_maker: Used to look up upcoming rooms
+        :param horizon: Seconds before opens_at a room is pinned
+        :param interval: Seconds between lookups (should be well below the horizon)
+        :param pool_connections: Number of connections opened ahead of an opening (at most the pool size)
+        """
+        super().__init__(interval)
+        self._engine = engine
+        self._session_maker = session_maker
+        self._horizon = timedelta(seconds=horizon)
+        self._pool_connections = pool_connections
+        self._warmed: set[uuid.UUID] = set()
+
+    async def tick(self) -> None:
+        now = datetime.now(UTC)
+        async with self._session_maker() as session:
+            rooms = (
+                await session.execute(
+                    select(*_ROOM_COLUMNS)
+                    .where(WaitingRoom.published == True)
+                    .where(WaitingRoom.opens_at <= now + self._horizon)
+                    .where(WaitingRoom.closes_at > now)
+                )
+            ).all()
+        results = [_to_result(room) for room in rooms]
+        pinned_rooms.replace(results)
+        if rooms:
+            logger.info("Pinned %s upcoming / open rooms", len(rooms))
+        self._warmed &= {room.id for room in results}
+        opening = {
+            room.id
+            for room in results
+            if now < room.opens_at <= now + timedelta(seconds=2 * self.interval)
+        }
+        if opening - self._warmed:
+            self._warmed |= opening
+            await self._fill_pool()
+
+    async def _fill_pool(self) -> None:
+        """
+        Open the connections the pool is missing: check out its idle connections and the missing ones
+        concurrently (forcing the pool to open them), then return them all to the pool
+        """
+        pool = self._engine.pool
+        if not isinstance(pool, QueuePool):
+            # Doesn't keep connections
+            return
+        idle = pool.checkedin()
+        missing = self._pool_connections - idle - pool.checkedout()
+        if missing <= 0:
+            return
+
+        async def connect() -> None:
+            async with self._engine.connect() as connection:
+                await connection.execute(select(1))
+
+        logger.info("Opening %s database connections", missing)
+        await asyncio.gather(*(connect() for _ in range(idle + missing)))
@@ -0,0 +1,348 @@
+"""
+Debounced deployments of the website
+
+Published rooms are pre-rendered by the website's CI workflow, which we dispatch through GitHub's API.
+Publishing used to dispatch the workflow inline (the organizer waited for GitHub),
+and every publish / unpublish toggle dispatched a run of its own.
+
+Deployments are now requested, and a background task dispatches a single run per debounce window,
+retrying with exponential backoff when GitHub fails. Requests (and failed attempts) are recorded in the database,
+so a single worker (of every worker process, on every machine) dispatches each run.
+
+https://docs.github.com/en/rest/actions/workflows?apiVersion=2022-11-28#create-a-workflow-dispatch-event
+"""
+
+import datetime
+from typing import cast
+
+import fastapi
+import httpx
+from pydantic import BaseModel
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .background import PeriodicTask
+from .logger import logger
+from .models import Deployment
+from .trpc import TrpcMixin
+
+
+class DeployStatus(BaseModel, TrpcMixin):
+    pending: bool
+    """
+    A deployment was requested, and not dispatched yet
+    """
+    requestedAt: datetime.datetime | None
+    """
+    When the pending deployment was first requested
+    """
+    lastDispatchAt: datetime.datetime | None
+    lastDispatchStatus: int | None
+    """
+    GitHub's response status of the last dispatch attempt (None if it failed without a response)
+    """
+    lastError: str | None
+    failedAttempts: int
+    """
+    Failed dispatch attempts of the pending deployment
+    """
+    dispatches: int
+
+
+class DeployScheduler(PeriodicTask):
+    """
+    Dispatch the deploy workflow once per debounce window, whatever the number of requests and of workers
+
+    Requests are counted in the Deployment row, shared by every worker (of every machine).
+    Every worker polls it, the first to lease a pending deployment (once its debounce window is over)
+    dispatches it, the others skip it. Requests made while a dispatch is in flight are dispatched after it.
+    A worker that stops mid-dispatch leaves the deployment pending, another one dispatches it once the lease expires.
+
+    A lease covers a single attempt. Failed attempts and the time of the next one are recorded in the row,
+    so retries back off whichever worker makes them, and requests made meanwhile join the next attempt
+    (they don't restart the attempts).
+
+    Use as an async context manager (entered in the application lifespan).
+    """
+
+    name = "deploy-scheduler"
+
+    ROW_ID = "website"
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        session_maker: async_sessionmaker[AsyncSession],
+        repo: str | None,
+        workflow_id: str | None,
+        token: str | None,
+        ref: str = "main",
+        debounce: float = 10,
+        max_attempts: int = 5,
+        backoff: float = 2,
+        max_backoff: float = 60,
+        interval: float = 2,
+        lease: float = 120,
+    ):
+        """
+        :param http_client: Client for GitHub's API (its base URL is the API's)
+        :param session_maker: Used to read and update the Deployment row
+        :param repo: The repo to deploy (owner/name)
+        :param workflow_id: The workflow to dispatch
+        :param token: GitHub token allowed to dispatch the workflow
+        :param ref: The git ref the workflow runs on
+        :param debounce: Seconds requests are collected before a dispatch
+        :param max_attempts: Dispatch attempts before giving up (until the next request)
+        :param backoff: Seconds before the first retry (doubled on every retry)
+        :param max_backoff: Maximum seconds between retries
+        :param interval: Seconds between polls of the Deployment row
+        :param lease: Seconds a worker may take per dispatch attempt before another worker takes over
+        """
+        super().__init__(interval)
+        self._http_client = http_client
+        self._session_maker = session_maker
+        self._repo = repo
+        self._workflow_id = workflow_id
+        self._token = token
+        self._ref = ref
+        self._debounce = datetime.timedelta(seconds=debounce)
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._lease = datetime.timedelta(seconds=lease)
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._repo and self._workflow_id and self._token)
+
+    async def request(self, session: AsyncSession) -> None:
+        """
+        Request a deployment, in the caller's transaction (a worker dispatches it in the background)
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        idle = Deployment.requests == Deployment.dispatched_requests
+        await session.execute(
+            insert(Deployment)
+            .values(id=self.ROW_ID, requests=1, requested_at=now)
+            .on_conflict_do_update(
+                index_elements=[Deployment.id],
+                set_={
+                    Deployment.requests: Deployment.requests + 1,
+                    # The first request since the last dispatch opens the debounce window
+                    Deployment.requested_at: case(
+                        (idle, now), else_=Deployment.requested_at
+                    ),
+                    Deployment.failed_attempts: case(
+                        (idle, 0), else_=Deployment.failed_attempts
+                    ),
+                    Deployment.next_attempt_at: case(
+                        (idle, None), else_=Deployment.next_attempt_at
+                    ),
+                },
+            )
+        )
+
+    async def status(self) -> DeployStatus:
+        async with self._session_maker() as session:
+            row = (
+                await session.execute(
+                    select(Deployment).where(Deployment.id == self.ROW_ID)
+                )
+            ).scalar_one_or_none()
+        if row is None:
+            return DeployStatus(
+                pending=False,
+                requestedAt=None,
+                lastDispatchAt=None,
+                lastDispatchStatus=None,
+                lastError=None,
+                failedAttempts=0,
+                dispatches=0,
+            )
+        pending = row.requests > row.dispatched_requests
+        return DeployStatus(
+            pending=pending,
+            requestedAt=_utc(row.requested_at) if pending else None,
+            lastDispatchAt=_utc(row.last_dispatch_at),
+            lastDispatchStatus=row.last_dispatch_status,
+            lastError=row.last_error,
+            failedAttempts=row.failed_attempts,
+            dispatches=row.dispatches,
+        )
+
+    async def tick(self) -> None:
+        if not self.configured:
+            return
+        claimed = await self._claim()
+        if claimed is not None:
+            requests, failed_attempts = claimed
+            await self._attempt(requests, failed_attempts)
+
+    async def _claim(self) -> tuple[int, int] | None:
+        """
+        Lease a pending deployment whose debounce window (or retry backoff) is over, for one attempt
+
+        :return: The requests the dispatch covers and the failed attempts before it
+            (None if there is nothing to dispatch, or another worker is on it)
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        async with self._session_maker() as session, session.begin():
+            row = (
+                await session.execute(
+                    select(
+                        Deployment.requests,
+                        Deployment.dispatched_requests,
+                        Deployment.requested_at,
+                        Deployment.lease_expires_at,
+                        Deployment.next_attempt_at,
+                    ).where(Deployment.id == self.ROW_ID)
+                )
+            ).one_or_none()
+            # Checked before writing, polls of an idle row stay reads
+            if (
+                row is None
+                or row.requests == row.dispatched_requests
+                or _utc(row.requested_at) > now - self._debounce
+                or (
+                    row.lease_expires_at is not None
+                    and _utc(row.lease_expires_at) > now
+                )
+                or (row.next_attempt_at is not None and _utc(row.next_attempt_at) > now)
+            ):
+                return None
+            # Whoever updates the lease first dispatches (the row may have changed since it was read)
+            return (
+                await session.execute(
+                    update(Deployment)
+                    .where(Deployment.id == self.ROW_ID)
+                    .where(Deployment.requests > Deployment.dispatched_requests)
+                    .where(Deployment.requested_at <= now - self._debounce)
+                    .where(
+                        (Deployment.lease_expires_at == None)
+                        | (Deployment.lease_expires_at <= now)
+                    )
+                    .where(
+                        (Deployment.next_attempt_at == None)
+                        | (Deployment.next_attempt_at <= now)
+                    )
+                    .values(lease_expires_at=now + self._lease)
+                    .returning(Deployment.requests, Deployment.failed_attempts)
+                )
+            ).one_or_none()
+
+    async def _attempt(self, requests: int, failed_attempts: int) -> None:
+        """
+        Make an attempt at the leased deployment, covering `requests`
+        """
+        status_code, error, retry = await self._dispatch()
+        attempt = failed_attempts + 1
+        if retry and attempt >= self._max_attempts:
+            logger.error(
+                "[%s] giving up after %s attempts: %s", self.name, attempt, error
+            )
+        elif retry:
+            logger.warning(
+                "[%s] dispatch attempt %s failed, retrying in %ss",
+                self.name,
+                attempt,
+                self._retry_delay(attempt),
+            )
+        await self._record(requests, attempt, status_code, error, retry)
+
+    def _retry_delay(self, failed_attempts: int) -> float:
+        """
+        Seconds before the next attempt, after `failed_attempts` in a row
+
+        >>> scheduler = DeployScheduler(None, None, None, None, None, backoff=2, max_backoff=60)
+        >>> [scheduler._retry_delay(attempts) for attempts in range(1, 7)]
+        [2, 4, 8, 16, 32, 60]
+        """
+        return min(self._backoff * 2 ** (failed_attempts - 1), self._max_backoff)
+
+    async def _dispatch(self) -> tuple[int | None, str | None, bool]:
+        """
+        Dispatch the workflow once
+
+        :return: GitHub's response status (None without a response), the error (None on success),
+            and whether or not retrying may succeed
+        """
+        logger.info("Triggering deployment")
+        try:
+            response = await self._http_client.post(
+                url=f"/repos/{self._repo}/actions/workflows/{self._workflow_id}/dispatches",
+                headers={
+                    "Accept": "application/vnd.github+json",
+                    "Authorization": f"Bearer {self._token}",
+                    "X-GitHub-Api-Version": "2022-11-28",
+                },
+                json={"ref": self._ref},
+            )
+        except httpx.HTTPError as e:
+            return None, repr(e), True
+
+        logger.info(f"Triggered deployment: {response.status_code} {response.text}")
+        if response.is_success:
+            return response.status_code, None, False
+        error = f"{response.status_code} {response.text}"
+        # Retrying won't fix a bad token or workflow
+        retry = response.status_code in (408, 429) or response.is_server_error
+        return response.status_code, error, retry
+
+    async def _record(
+        self,
+        requests: int,
+        attempt: int,
+        status_code: int | None,
+        error: str | None,
+        retry: bool,
+    ) -> None:
+        """
+        Record a dispatch attempt and release the lease
+
+        A failed attempt that may be retried is scheduled after its backoff, the deployment stays pending.
+        Otherwise (a success, an error retrying won't fix, the last attempt) the requests are dispatched.
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        values = {
+            Deployment.last_dispatch_at: now,
+            Deployment.last_dispatch_status: status_code,
+            Deployment.last_error: error,
+            Deployment.lease_expires_at: None,
+        }
+        if error is None:
+            values[Deployment.failed_attempts] = 0
+            values[Deployment.next_attempt_at] = None
+            values[Deployment.dispatches] = Deployment.dispatches + 1
+        elif retry:
+            values[Deployment.failed_attempts] = attempt
+            values[Deployment.next_attempt_at] = now + datetime.timedelta(
+                seconds=self._retry_delay(attempt)
+            )
+        if not retry or attempt >= self._max_attempts:
+            # Requests from the start of the attempt on need a dispatch of their own
+            requested_again = Deployment.requests > requests
+            values[Deployment.dispatched_requests] = requests
+            values[Deployment.requested_at] = case(
+                (requested_again, now), else_=Deployment.requested_at
+            )
+            if retry:
+                # Gave up, requests made meanwhile get attempts of their own (still after the backoff)
+                values[Deployment.failed_attempts] = case(
+                    (requested_again, 0), else_=attempt
+                )
+        async with self._session_maker() as session, session.begin():
+            await session.execute(
+                update(Deployment).where(Deployment.id == self.ROW_ID).values(values)
+            )
+
+
+def _utc(timestamp: datetime.datetime | None) -> datetime.datetime | None:
+    return timestamp and timestamp.replace(tzinfo=datetime.UTC)
+
+
+def deploy_scheduler(request: fastapi.Request) -> DeployScheduler:
+    """
+    Get the deploy scheduler from the request state
+    """
+    return cast(DeployScheduler, request.state.deploy_scheduler)
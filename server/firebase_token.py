@@ -0,0 +1,176 @@
+"""
+Native async verification of Firebase ID tokens
+
+firebase_admin's auth.verify_id_token is blocking (certificate fetching and RSA verification),
+so it has to run on the shared anyio thread pool, which saturates during an opening.
+
+Here Google's signing keys are kept in memory (refreshed according to their Cache-Control header),
+the claims are checked on the event loop, and only the signature check runs on a small dedicated executor.
+
+Verification follows https://firebase.google.com/docs/auth/admin/verify-id-tokens#verify_id_tokens_using_a_third-party_jwt_library
+"""
+
+import asyncio
+import re
+import time
+from concurrent.futures import Executor
+
+import httpx
+import jwt
+
+from .logger import logger
+
+JWKS_URL = "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+class InvalidIdTokenError(ValueError):
+    """
+    The ID token is malformed, expired, or not signed by Google for our project
+    """
+
+
+class GoogleSigningKeys:
+    """
+    Google's public keys used to sign Firebase ID tokens, cached for as long as Google allows
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        url: str = JWKS_URL,
+        min_refresh_interval: float = 60,
+    ):
+        """
+        :param http_client: Used to fetch the keys
+        :param url: The JWKS endpoint
+        :param min_refresh_interval: Minimum seconds between fetches triggered by an unknown key ID
+            (keys rotate, but a stream of tokens with bogus key IDs must not hammer Google)
+        """
+        self._http_client = http_client
+        self._url = url
+        self._min_refresh_interval = min_refresh_interval
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, kid: str) -> jwt.PyJWK | None:
+        """
+        Get the key with the given ID, fetching the keys if they expired or the ID is unknown
+        """
+        now = time.monotonic()
+        stale = now >= self._expires_at
+        unknown = (
+            kid not in self._keys
+            and now - self._fetched_at > self._min_refresh_interval
+        )
+        if stale or unknown:
+            async with self._lock:
+                # Someone else may have refreshed the keys while we waited for the lock
+                if self._fetched_at <= now:
+                    await self._refresh()
+        return self._keys.get(kid)
+
+    async def _refresh(self) -> None:
+        response = await self._http_client.get(self._url)
+        response.raise_for_status()
+        self._keys = {
+            key.key_id: key
+            for key in jwt.PyJWKSet.from_dict(response.json()).keys
+            if key.key_id
+        }
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + _max_age(
+            response.headers.get("Cache-Control", "")
+        )
+        logger.info(
+            "Fetched Google signing keys %s (valid for %ss)",
+            list(self._keys),
+            int(self._expires_at - self._fetched_at),
+        )
+
+
+def _max_age(cache_control: str) -> int:
+    """
+    >>> _max_age("public, max-age=19302, must-revalidate, no-transform")
+    19302
+    >>> _max_age("no-cache")
+    0
+    """
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class FirebaseTokenVerifier:
+    """
+    Verify Firebase ID tokens without blocking the event loop
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        keys: GoogleSigningKeys,
+        executor: Executor | None = None,
+        clock_skew: int = 10,
+    ):
+        """
+        :param project_id: The Firebase project ID (audience of the tokens)
+        :param keys: Google's signing keys
+        :param executor: Runs signature checks (None to run them on the event loop)
+        :param clock_skew: Seconds of clock skew tolerated for exp / iat / auth_time
+        """
+        self.project_id = project_id
+        self.issuer = ISSUER_PREFIX + project_id
+        self._keys = keys
+        self._executor = executor
+        self._clock_skew = clock_skew
+
+    async def verify(self, token: str) -> dict:
+        """
+        Verify an ID token and return its claims (with a "uid" claim, like firebase_admin)
+
+        :raises InvalidIdTokenError: If the token is invalid
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"Malformed ID token: {e}") from e
+        if header.get("alg") != "RS256":
+            raise InvalidIdTokenError(f"Unexpected algorithm {header.get('alg')!r}")
+        kid = header.get("kid")
+        if not kid:
+            raise InvalidIdTokenError('ID token has no "kid" header')
+
+        key = await self._keys.get(kid)
+        if key is None:
+            raise InvalidIdTokenError(f"ID token signed with unknown key {kid!r}")
+
+        if self._executor is None:
+            claims = self._decode(token, key)
+        else:
+            claims = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._decode, token, key
+            )
+
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidIdTokenError('ID token has an invalid "sub" claim')
+        if claims.get("auth_time", 0) > time.time() + self._clock_skew:
+            raise InvalidIdTokenError('ID token has an "auth_time" in the future')
+        claims["uid"] = subject
+        return claims
+
+    def _decode(self, token: str, key: jwt.PyJWK) -> dict:
+        try:
+            return jwt.decode(
+                token,
+                key=key.key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=self._clock_skew,
+                options={"require": ["exp", "iat", "aud", "iss", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"Invalid ID token: {e}") from e
@@ -0,0 +1,132 @@
+"""
+Cross-worker invalidation of cached room data
+
+Room data is cached in every worker (see fetch_waiting_room).
+Writes to a room publish its ID on an invalidation channel, and every worker evicts the room precisely,
+so caches can hold rooms for hours instead of serving stale opening windows for minutes.
+
+Two channels are available:
+ - InvalidationChannel: in-process only (a single worker, or tests)
+ - PollingInvalidationChannel: every worker polls WaitingRoom."updatedAt" (bumped by every write)
+
+CockroachDB has no LISTEN / NOTIFY, so polling an indexed timestamp is the cheapest shared signal.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, cast
+
+import fastapi
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .background import PeriodicTask
+from .logger import logger
+from .models import WaitingRoom
+
+Subscriber = Callable[[uuid.UUID], None]
+"""
+Called with the ID of a room whose cached data is stale
+"""
+
+
+class InvalidationChannel:
+    """
+    Deliver room invalidations to the subscribers of this process
+    """
+
+    def __init__(self):
+        self._subscribers: list[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.append(subscriber)
+
+    async def publish(
+        self, room_id: uuid.UUID | str, updated_at: datetime | None = None
+    ) -> None:
+        """
+        Announce that a room changed (call after the write committed)
+
+        :param room_id: The room that changed
+        :param updated_at: The room's new updatedAt, if known
+        """
+        self._notify(uuid.UUID(str(room_id)))
+
+    def _notify(self, room_id: uuid.UUID) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber(room_id)
+            except Exception:
+                logger.exception("Room invalidation subscriber %s failed", subscriber)
+
+
+class PollingInvalidationChannel(InvalidationChannel, PeriodicTask):
+    """
+    Deliver room invalidations to every worker, by polling for recently updated rooms
+
+    Rooms published in this worker are invalidated immediately,
+    other workers see the change within one poll interval.
+
+    updatedAt is the (transaction) time of the write, which can be older than its commit,
+    so every poll looks back `overlap` seconds and skips changes it already delivered.
+    """
+
+    name = "room-invalidation"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        interval: float = 2,
+        overlap: float = 30,
+    ):
+        """
+        :param session_maker: Used to poll the rooms table
+        :param interval: Seconds between polls
+        :param overlap: Seconds each poll looks back (longer than any write transaction)
+        """
+        InvalidationChannel.__init__(self)
+        PeriodicTask.__init__(self, interval)
+        self._session_maker = session_maker
+        self._overlap = timedelta(seconds=overlap)
+        self._watermark: datetime | None = None
+        self._delivered: set[tuple[uuid.UUID, datetime]] = set()
+
+    async def publish(
+        self, room_id: uuid.UUID | str, updated_at: datetime | None = None
+    ) -> None:
+        room_id = uuid.UUID(str(room_id))
+        if updated_at is not None:
+            # This worker is up to date, skip it when the poll finds the change
+            self._delivered.add((room_id, updated_at.replace(tzinfo=None)))
+        self._notify(room_id)
+
+    async def tick(self) -> None:
+        async with self._session_maker() as session:
+            first_poll = self._watermark is None
+            if first_poll:
+                now = (await session.execute(select(func.now()))).scalar_one()
+                self._watermark = now.replace(tzinfo=None)
+            changes = (
+                await session.execute(
+                    select(WaitingRoom.id, WaitingRoom.updated_at).where(
+                        WaitingRoom.updated_at > self._watermark - self._overlap
+                    )
+                )
+            ).all()
+
+        delivered = set()
+        for room_id, updated_at in changes:
+            delivered.add((room_id, updated_at))
+            # Caches start empty, changes made before the first poll don't matter
+            if not first_poll and (room_id, updated_at) not in self._delivered:
+                logger.info("Room %s changed at %s, invalidating", room_id, updated_at)
+                self._notify(room_id)
+            self._watermark = max(self._watermark, updated_at)
+        self._delivered = delivered
+
+
+def room_invalidation(request: fastapi.Request) -> InvalidationChannel:
+    """
+    Get the room invalidation channel from the request state
+    """
+    return cast(InvalidationChannel, request.state.room_invalidation)
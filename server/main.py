@@ -13,19 +13,33 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from starlette.middleware.authentication import AuthenticationMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 from timing_asgi import TimingClient, TimingMiddleware
 from timing_asgi.integrations import StarletteScopeToName
 import sentry_sdk
 
+from .cache.local import caches
+from .cache.shared import SharedCache
+from .cache.stats import CacheStatsReporter
 from .config import CONFIG
 from .constants import DEV_CORS_ORIGINS, log_config, PROD_CORS_ORIGINS
+from .circuit_breaker import CircuitBreaker
+from .db.registrant import RegistrantBatcher, TurnstileReverifier
+from .db.room_stats import RegistrationCounter
+from .db.waiting_room import RoomPrewarmer, invalidate_waiting_room
+from .deploy import DeployScheduler
+from .invalidation import InvalidationChannel, PollingInvalidationChannel
 from .logger import logger
+from .middleware.compression import CompressionMiddleware
 from .middleware.firebase import FirebaseAuthBackend
+from .middleware.trpc_batch import TrpcBatchMiddleware
 from .middleware.turnstile import TurnstileMiddleware
+from .routes import blob
+from .routes import live
 from .routes import markdown_edit
+from .routes import public_room
 from .routes import register as register_routes
 from .routes import room
+from .turnstile import TurnstileOutcomeCache
 from .types import State
 
 dictConfig(log_config)
@@ -48,10 +62,21 @@ async def lifespan(_app: fastapi.FastAPI) -> typing.AsyncIterator[State]:
      - connect to the database
      - create an HTTP client (for making requests to the turnstile)
      - Load secrets from the environment
+     - start the registrant batchers (audit records, and registrations if enabled)
+     - start counting registrations (for room stats)
+     - start validating turnstile tokens of registrations accepted while Cloudflare was unavailable
+     - start listening for room changes made by other workers (to evict cached rooms)
+     - start pre-warming rooms that open soon (pinned in memory, connection pool filled)
+     - start the live dashboard feed
+     - start the website deploy scheduler (debounced workflow dispatches, by one worker at a time)
+     - connect to the shared cache (if REDIS_URL is set), start logging cache stats
 
     __aexit__ is called when the application stops
     When the application stops we want to:
+     - flush pending registrants (and their counts)
      - disconnect from the database
+     - close the Firebase token verifier (HTTP client and signature-check threads)
+     - disconnect from the shared cache
 
     """
     exit_stack = AsyncExitStack()
@@ -63,24 +88,134 @@ async def lifespan(_app: fastapi.FastAPI) -> typing.AsyncIterator[State]:
         and CONFIG.sqlalchemy_database_url.get_secret_value(),
         echo=not CONFIG.production,
         hide_parameters=CONFIG.production,
-        pool_size=30,
-        max_overflow=70,
+        pool_size=CONFIG.worker_db_pool_size,
+        max_overflow=CONFIG.worker_db_max_overflow,
     )
     exit_stack.push_async_callback(engine.dispose)
+    exit_stack.push_async_callback(firebase_auth_backend.aclose)
     session_maker = async_sessionmaker(engine)
 
     async with exit_stack:
+        if CONFIG.redis_url is not None:
+            caches.shared = await exit_stack.enter_async_context(
+                SharedCache.from_url(
+                    CONFIG.redis_url.get_secret_value(),
+                    CONFIG.shared_cache_secret.get_secret_value().encode(),
+                )
+            )
+            # Stop using it before it's closed
+            exit_stack.callback(setattr, caches, "shared", None)
+        if CONFIG.cache_stats_interval_seconds > 0:
+            await exit_stack.enter_async_context(
+                CacheStatsReporter(interval=CONFIG.cache_stats_interval_seconds)
+            )
         gh_http_client = await exit_stack.enter_async_context(
-            httpx.AsyncClient(base_url="https://api.github.com")
+            httpx.AsyncClient(base_url=CONFIG.github_api_url)
+        )
+        deploy_scheduler = await exit_stack.enter_async_context(
+            DeployScheduler(
+                gh_http_client,
+                session_maker,
+                repo=CONFIG.github_repo,
+                workflow_id=CONFIG.github_workflow_id,
+                token=CONFIG.github_token and CONFIG.github_token.get_secret_value(),
+                debounce=CONFIG.deploy_debounce_seconds,
+                max_attempts=CONFIG.deploy_max_attempts,
+                backoff=CONFIG.deploy_retry_backoff_seconds,
+                interval=CONFIG.deploy_poll_seconds,
+            )
         )
         cf_http_client = await exit_stack.enter_async_context(
-            httpx.AsyncClient(base_url="https://challenges.cloudflare.com")
+            httpx.AsyncClient(
+                base_url="https://challenges.cloudflare.com",
+                timeout=CONFIG.turnstile_timeout,
+                limits=httpx.Limits(
+                    max_connections=CONFIG.turnstile_max_connections,
+                    max_keepalive_connections=CONFIG.turnstile_max_connections,
+                ),
+            )
+        )
+        turnstile_breaker = CircuitBreaker(
+            "turnstile",
+            failure_threshold=CONFIG.turnstile_breaker_failures,
+            reset_timeout=CONFIG.turnstile_breaker_reset_seconds,
+        )
+        turnstile_cache = TurnstileOutcomeCache(
+            maxsize=CONFIG.turnstile_cache_size,
+            ttl=CONFIG.turnstile_cache_ttl_seconds,
         )
         await db_connection_check(engine)
+        registration_counter = await exit_stack.enter_async_context(
+            RegistrationCounter(
+                session_maker, interval=CONFIG.registration_count_interval_seconds
+            )
+        )
+        registrant_audit = await exit_stack.enter_async_context(
+            RegistrantBatcher(
+                session_maker,
+                max_batch_size=CONFIG.registration_batch_size,
+                max_delay=CONFIG.registration_audit_delay_ms / 1000,
+                max_concurrent_flushes=1,
+                max_pending=CONFIG.registration_audit_max_pending,
+            )
+        )
+        await exit_stack.enter_async_context(
+            TurnstileReverifier(
+                session_maker,
+                cf_http_client,
+                turnstile_breaker,
+                turnstile_cache,
+                registration_counter,
+                interval=CONFIG.turnstile_reverify_interval_seconds,
+                concurrency=CONFIG.turnstile_reverify_concurrency,
+            )
+        )
+        if CONFIG.room_invalidation_poll_seconds > 0:
+            room_invalidation = await exit_stack.enter_async_context(
+                PollingInvalidationChannel(
+                    session_maker, interval=CONFIG.room_invalidation_poll_seconds
+                )
+            )
+        else:
+            room_invalidation = InvalidationChannel()
+        room_invalidation.subscribe(invalidate_waiting_room)
+        room_invalidation.subscribe(public_room.invalidate_public_room)
+        await exit_stack.enter_async_context(
+            RoomPrewarmer(
+                engine,
+                session_maker,
+                horizon=CONFIG.room_prewarm_horizon_seconds,
+                interval=CONFIG.room_prewarm_interval_seconds,
+                pool_connections=CONFIG.worker_db_pool_size,
+            )
+        )
+        live_feed_hub = await exit_stack.enter_async_context(
+            live.LiveFeedHub(
+                session_maker,
+                registration_counter,
+                interval=CONFIG.live_feed_interval_seconds,
+            )
+        )
+        registrant_batcher = None
+        if CONFIG.registration_batching:
+            registrant_batcher = await exit_stack.enter_async_context(
+                RegistrantBatcher(
+                    session_maker,
+                    max_batch_size=CONFIG.registration_batch_size,
+                    max_delay=CONFIG.registration_batch_delay_ms / 1000,
+                )
+            )
         yield {
-            "gh_http_client": gh_http_client,
+            "deploy_scheduler": deploy_scheduler,
             "cf_http_client": cf_http_client,
             "db": session_maker,
+            "registrant_batcher": registrant_batcher,
+            "registrant_audit": registrant_audit,
+            "turnstile_breaker": turnstile_breaker,
+            "turnstile_cache": turnstile_cache,
+            "room_invalidation": room_invalidation,
+            "registration_counter": registration_counter,
+            "live_feed_hub": live_feed_hub,
         }
 
 
@@ -94,6 +229,15 @@ async def db_connection_check(engine: AsyncEngine) -> None:
         logger.info("db_connection_check: select %s", connection_check)
 
 
+firebase_auth_backend = FirebaseAuthBackend(
+    credential=CONFIG.firebase_credentials
+    and CONFIG.firebase_credentials.get_secret_value(),
+    cache_size=CONFIG.firebase_token_cache_size,
+    cache_ttl=CONFIG.firebase_token_cache_ttl_seconds,
+    verify_threads=CONFIG.firebase_verify_threads,
+)
+
+
 class TimingLogger(TimingClient):
     def timing(self, metric_name, timing, tags):
         logger.info("%s %s %s", metric_name, timing, tags)
@@ -106,7 +250,15 @@ if not CONFIG.production:
         client=TimingLogger(),
         metric_namer=StarletteScopeToName(prefix="tix-q", starlette_app=app),
     )
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(TurnstileMiddleware, routes=app.routes)
+# Procedures of a batch go through turnstile validation (and the routes) one by one,
+# the batch response through compression and CORS once
+app.add_middleware(TrpcBatchMiddleware, max_batch_size=CONFIG.trpc_max_batch_size)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=CONFIG.compression_minimum_bytes,
+    offload_size=CONFIG.compression_offload_bytes,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=PROD_CORS_ORIGINS if CONFIG.production else DEV_CORS_ORIGINS,
@@ -120,18 +272,14 @@ app.add_middleware(
     ],
     max_age=3600,
 )
-app.add_middleware(TurnstileMiddleware)
-app.add_middleware(
-    AuthenticationMiddleware,
-    backend=FirebaseAuthBackend(
-        credential=CONFIG.firebase_credentials
-        and CONFIG.firebase_credentials.get_secret_value()
-    ),
-)
+app.add_middleware(AuthenticationMiddleware, backend=firebase_auth_backend)
 
 app.include_router(register_routes.router)
 app.include_router(markdown_edit.router)
 app.include_router(room.router)
+app.include_router(live.router)
+app.include_router(blob.router)
+app.include_router(public_room.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,110 @@
+"""
+Render room markdown to sanitized HTML on the server
+
+Browsers used to parse (and sanitize) the markdown of a room on every page view,
+which is slow on low-end phones at opening time. The markdown is now rendered when it is written,
+and the HTML is cached by the hash of the markdown, so room reads serve it without rendering again.
+
+Rendering runs in a thread, not on the event loop (organizers paste long descriptions).
+Room pages show the output as is (MarkdownCard), and it matches the editor's preview (MarkdownPreview):
+GitHub flavoured markdown, a handful of elements, links and images with http(s) URLs only,
+and dir="auto" on every element (right-to-left text).
+"""
+
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import nh3
+from markdown_it import MarkdownIt
+
+from .cache.local import Cache
+from .config import CONFIG
+from .singleflight import SingleFlight
+
+ALLOWED_TAGS = {
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "img",
+    "p",
+    "a",
+    "ul",
+    "ol",
+    "li",
+    "b",
+    "i",
+    "strong",
+    "em",
+}
+
+ALLOWED_ATTRIBUTES = {
+    "*": {"dir"},
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+}
+
+_md = MarkdownIt("gfm-like", {"linkify": False})
+# Raw HTML is dropped (like MarkdownPreview does), the sanitizer is a second line of defense
+_md.add_render_rule("html_block", lambda *args: "")
+_md.add_render_rule("html_inline", lambda *args: "")
+
+
+def _dir_auto(state) -> None:
+    for token in state.tokens:
+        if token.nesting == 1:
+            token.attrSet("dir", "auto")
+        for child in token.children or ():
+            if child.nesting == 1 or child.type == "image":
+                child.attrSet("dir", "auto")
+
+
+_md.core.ruler.push("dir_auto", _dir_auto)
+
+
+def render(markdown: str) -> str:
+    """
+    Render markdown to sanitized HTML (CPU bound, see render_markdown)
+
+    >>> render("# Hi\\n\\n[link](https://example.com) <script>alert(1)</script>")
+    '<h1 dir="auto">Hi</h1>\\n<p dir="auto"><a href="https://example.com" dir="auto" rel="noopener noreferrer nofollow">link</a> alert(1)</p>\\n'
+    """
+    return nh3.clean(
+        _md.render(markdown),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes={"http", "https", "mailto"},
+        link_rel="noopener noreferrer nofollow",
+    )
+
+
+html_cache = Cache("markdown_html", maxsize=CONFIG.markdown_cache_bytes, getsizeof=len)
+"""
+Rendered HTML by the SHA-256 of the markdown, bounded by total size (characters)
+"""
+
+_executor = ThreadPoolExecutor(
+    CONFIG.markdown_render_threads, thread_name_prefix="markdown-render"
+)
+_renders = SingleFlight()
+
+
+async def render_markdown(markdown: str) -> str:
+    """
+    Sanitized HTML of markdown, rendered in a thread on a cache miss (concurrent misses share a render)
+    """
+    key = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+    if (html := html_cache.get(key)) is not None:
+        return html
+
+    async def _render() -> str:
+        html = await asyncio.get_running_loop().run_in_executor(
+            _executor, render, markdown
+        )
+        if len(html) <= html_cache.maxsize:
+            html_cache[key] = html
+        return html
+
+    return await _renders.do(key, _render)
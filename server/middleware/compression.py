@@ -0,0 +1,295 @@
+"""
+Response compression, off the event loop
+
+GZipMiddleware compressed every response on the event loop, a large registrants page stalled every other request
+of the worker while it was compressed. Bodies larger than `offload_size` are now compressed in a thread pool
+(zlib, brotli and zstandard release the GIL), smaller ones inline (a thread hop costs more than compressing them).
+
+Clients get zstd or brotli when they accept it and the package is installed (pip install tix-q[compression]),
+gzip otherwise.
+
+Responses with a strong ETag are immutable by definition (published rooms, exports of closed rooms),
+they are compressed once and served from compressed_cache afterwards, keyed by path, ETag and encoding.
+"""
+
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..cache.local import Cache
+from ..config import CONFIG
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+}
+"""
+Compressed media types, besides text/* (except text/event-stream, events must not wait for a compressor's buffer)
+"""
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class Codec(NamedTuple):
+    encoding: str
+    compressor: Callable[[], Compressor]
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+CODECS: list[Codec] = [
+    # Server preference, first accepted wins
+    *(
+        [Codec("zstd", lambda: zstandard.ZstdCompressor(level=3).compressobj())]
+        if zstandard
+        else []
+    ),
+    *([Codec("br", _BrotliCompressor)] if brotli else []),
+    Codec("gzip", lambda: zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)),
+]
+
+compressed_cache = Cache(
+    "compressed_responses", maxsize=CONFIG.compression_cache_bytes, getsizeof=len
+)
+"""
+Compressed bodies of immutable responses by (path, ETag, encoding), bounded by total size in bytes
+"""
+
+_executor = ThreadPoolExecutor(
+    CONFIG.compression_threads, thread_name_prefix="compression"
+)
+
+
+def negotiate(accept_encoding: str) -> Codec | None:
+    """
+    The preferred codec the client accepts (None if it accepts none)
+
+    >>> negotiate("gzip, deflate").encoding
+    'gzip'
+    >>> negotiate("gzip;q=0, identity") is None
+    True
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        encoding, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.strip())
+    for codec in CODECS:
+        if codec.encoding in accepted or "*" in accepted:
+            return codec
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compress responses the client accepts compressed, in a thread pool when they are large
+
+    Responses that are already encoded, partial, server-sent events and media types that don't compress
+    (e.g. images, which are compressed already) are passed through untouched, by their own headers.
+    Streams are compressed as they go.
+
+    This is a pure ASGI middleware (no BaseHTTPMiddleware task / stream wrapping per request)
+    """
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = 1000, offload_size: int = 32768
+    ):
+        """
+        :param app: The ASGI app to wrap
+        :param minimum_size: Bodies smaller than this (bytes) are not compressed
+        :param offload_size: Bodies (or stream chunks) at least this large (bytes) are compressed in a thread
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, codec, scope["path"], send)
+        try:
+            await self.app(scope, receive, responder.send)
+        except Exception:
+            # _ServedFromCache may reach us wrapped (streams run in a task group)
+            if not responder.served_from_cache:
+                raise
+            # The rest of the response (e.g. an export's rows) is not needed
+
+
+class _ServedFromCache(Exception):
+    """
+    Raised to stop an app whose response was served from compressed_cache
+    """
+
+
+class _CompressingResponder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        codec: Codec,
+        path: str,
+        send: Send,
+    ):
+        self.middleware = middleware
+        self.codec = codec
+        self.path = path
+        self._send = send
+        self.start: Message | None = None
+        self.passthrough = False
+        self.served_from_cache = False
+        self.compressor: Compressor | None = None
+        self.cache_key: tuple[str, str, str] | None = None
+        self.cached_chunks: list[bytes] | None = None
+        self.cached_size = 0
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            await self._start(message)
+        elif message["type"] == "http.response.body":
+            if self.compressor is None:
+                await self._first_body(message)
+            else:
+                await self._stream_body(message)
+        else:
+            await self._send(message)
+
+    async def _start(self, message: Message) -> None:
+        headers = Headers(raw=message.get("headers", []))
+        media_type = headers.get("content-type", "").partition(";")[0].strip()
+        if (
+            "content-encoding" in headers
+            or "content-range" in headers
+            or message["status"] in (204, 304)
+            or not (
+                media_type in COMPRESSIBLE_TYPES
+                or (
+                    media_type.startswith("text/") and media_type != "text/event-stream"
+                )
+            )
+        ):
+            self.passthrough = True
+            await self._send(message)
+            return
+
+        self.start = {**message, "headers": list(message.get("headers", []))}
+        etag = headers.get("etag")
+        if message["status"] == 200 and etag and not etag.startswith("W/"):
+            self.cache_key = (self.path, etag, self.codec.encoding)
+            if (cached := compressed_cache.get(self.cache_key)) is not None:
+                self._set_encoding_headers(len(cached))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": cached})
+                self.served_from_cache = True
+                raise _ServedFromCache()
+
+    async def _first_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not more_body:
+            if len(body) < self.middleware.minimum_size:
+                await self._send(self.start)
+                await self._send(message)
+                return
+            compressor = self.codec.compressor()
+            compressed = await self._run(
+                lambda: compressor.compress(body) + compressor.flush(), len(body)
+            )
+            self._store(compressed)
+            self._set_encoding_headers(len(compressed))
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        self.compressor = self.codec.compressor()
+        if self.cache_key is not None:
+            self.cached_chunks = []
+        self._set_encoding_headers(None)
+        await self._send(self.start)
+        await self._stream_body(message)
+
+    async def _stream_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        compressor = self.compressor
+        if more_body:
+            compressed = await self._run(lambda: compressor.compress(body), len(body))
+        else:
+            compressed = await self._run(
+                lambda: compressor.compress(body) + compressor.flush(), len(body)
+            )
+        if self.cached_chunks is not None:
+            self.cached_chunks.append(compressed)
+            self.cached_size += len(compressed)
+            if self.cached_size > compressed_cache.maxsize:
+                # Too large to be cached, stop collecting it
+                self.cached_chunks = None
+            elif not more_body:
+                self._store(b"".join(self.cached_chunks))
+        if compressed or not more_body:
+            await self._send(
+                {
+                    "type": "http.response.body",
+                    "body": compressed,
+                    "more_body": more_body,
+                }
+            )
+
+    async def _run(self, compress: Callable[[], bytes], size: int) -> bytes:
+        if size < self.middleware.offload_size:
+            return compress()
+        return await asyncio.get_running_loop().run_in_executor(_executor, compress)
+
+    def _set_encoding_headers(self, content_length: int | None) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.codec.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    def _store(self, compressed: bytes) -> None:
+        if self.cache_key is not None and len(compressed) <= compressed_cache.maxsize:
+            compressed_cache[self.cache_key] = compressed
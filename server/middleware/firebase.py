@@ -1,29 +1,47 @@
 import json
+import time
 import typing
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
-import asyncer
 import firebase_admin
+import httpx
 import starlette.middleware.authentication
-from asyncache import cachedmethod
-from cachetools import TTLCache
-from cachetools.keys import hashkey
-from firebase_admin import auth
 from starlette.authentication import AuthCredentials, AuthenticationError
 from starlette.requests import HTTPConnection
 
+from ..cache.decorators import cached
+from ..cache.local import Cache
 from ..constants import TTL_FIVE_MINUTES
+from ..firebase_token import FirebaseTokenVerifier, GoogleSigningKeys
 from ..logger import logger
 from ..types import FirebaseUser
 
 
 class FirebaseAuthBackend(starlette.middleware.authentication.AuthenticationBackend):
-    def __init__(self, name: str = "FirebaseAuthBackend", credential: str = None):
+    def __init__(
+        self,
+        name: str = "FirebaseAuthBackend",
+        credential: str = None,
+        cache_size: int = 1024,
+        cache_ttl: float = TTL_FIVE_MINUTES,
+        verify_threads: int = 2,
+    ):
         """
         Initialize the Firebase App for the authentication backend
         The rest of the logic is handled by starlette (see https://www.starlette.io/authentication/)
+
+        :param cache_size: Maximum number of verified tokens remembered
+        :param cache_ttl: Maximum time (seconds) a verified token is remembered for (never past its expiry)
+        :param verify_threads: Threads dedicated to signature checks (0 to check on the event loop)
         """
-        self.cache = TTLCache(maxsize=1024, ttl=TTL_FIVE_MINUTES)
+        # Not shared between workers (no value type), checking a signature locally is faster than a round trip
+        self.cache = Cache(
+            "firebase_tokens",
+            maxsize=cache_size,
+            ttl=cache_ttl,
+            expires_at=lambda claims: claims["exp"],
+            timer=time.time,
+        )
         try:
             self.fb_app = firebase_admin.get_app(name)
         except ValueError:
@@ -39,12 +57,26 @@ class FirebaseAuthBackend(starlette.middleware.authentication.AuthenticationBack
             self.fb_app = firebase_admin.initialize_app(
                 name=name, credential=firebase_admin.credentials.Certificate(credential)
             )
+        self.http_client = httpx.AsyncClient()
+        self.executor = (
+            ThreadPoolExecutor(verify_threads, thread_name_prefix="firebase-verify")
+            if verify_threads > 0
+            else None
+        )
+        self.verifier = FirebaseTokenVerifier(
+            self.fb_app.project_id,
+            GoogleSigningKeys(self.http_client),
+            executor=self.executor,
+        )
+        self._verify = cached(self.cache)(self.verifier.verify)
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
-    @cachedmethod(cache=lambda self: self.cache, key=partial(hashkey, "decode_token"))
     async def decode_token(self, credentials: str) -> dict:
-        return await asyncer.asyncify(auth.verify_id_token)(
-            credentials, app=self.fb_app, check_revoked=False
-        )
+        return await self._verify(credentials)
 
     async def authenticate(
         self, conn: HTTPConnection
@@ -76,14 +108,6 @@ class FirebaseAuthBackend(starlette.middleware.authentication.AuthenticationBack
         try:
             decoded = await self.decode_token(credentials)
             return AuthCredentials(["authenticated"]), FirebaseUser(decoded)
-        except (
-            ValueError,
-            auth.InvalidIdTokenError,
-            auth.ExpiredIdTokenError,
-            auth.RevokedIdTokenError,
-            auth.CertificateFetchError,
-            auth.UnexpectedResponseError,
-            auth.UserDisabledError,
-        ):
+        except (ValueError, httpx.HTTPError):
             logger.exception("Invalid authorization header")
             raise AuthenticationError("Invalid authorization header")
@@ -0,0 +1,236 @@
+import asyncio
+import json
+from http import HTTPStatus
+from urllib.parse import parse_qs, quote
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..logger import logger
+
+# https://trpc.io/docs/server/error-handling#error-codes
+TRPC_ERROR_CODES = {
+    400: ("BAD_REQUEST", -32600),
+    401: ("UNAUTHORIZED", -32001),
+    403: ("FORBIDDEN", -32003),
+    404: ("NOT_FOUND", -32004),
+    405: ("METHOD_NOT_SUPPORTED", -32005),
+    408: ("TIMEOUT", -32008),
+    409: ("CONFLICT", -32009),
+    412: ("PRECONDITION_FAILED", -32012),
+    413: ("PAYLOAD_TOO_LARGE", -32013),
+    422: ("UNPROCESSABLE_CONTENT", -32022),
+    429: ("TOO_MANY_REQUESTS", -32029),
+    499: ("CLIENT_CLOSED_REQUEST", -32099),
+}
+
+# Describe the batch, not its procedures (a 304 or a byte range can't be part of a batch response)
+_PROCEDURE_SKIPPED_HEADERS = {
+    b"content-length",
+    b"content-type",
+    b"if-none-match",
+    b"if-modified-since",
+    b"if-range",
+    b"range",
+}
+
+
+class TrpcBatchMiddleware:
+    """
+    Middleware to serve batched tRPC calls (httpBatchLink)
+
+    A batch names its procedures in the path, separated by commas, with ?batch=1:
+     - GET /room.readUnique,room.stats?batch=1&input={"0": {...}, "1": {...}}
+     - POST /room.create,room.publish?batch=1 with a body of {"0": {...}, "1": {...}}
+
+    Every procedure is dispatched to the wrapped app as a request of its own (its input as the query / body),
+    concurrently, and the batch is answered with the array of their tRPC responses (or errors).
+    Procedure requests share the batch's scope: the authenticated user (resolved once by the authentication
+    middleware), the headers and the application state. Every procedure opens its own database session,
+    an AsyncSession can't be used concurrently.
+
+    Only JSON procedures can be batched (not the live feed, exports or blobs).
+    A batch response is never cached: conditional and range headers are not passed to its procedures,
+    and their ETag / Cache-Control are dropped. Cacheable procedures (room.readPublic) are sent unbatched.
+
+    This is a pure ASGI middleware, requests without ?batch=1 pass through untouched
+    """
+
+    def __init__(self, app: ASGIApp, max_batch_size: int = 20):
+        """
+        :param app: The ASGI app to wrap
+        :param max_batch_size: Maximum number of procedures in a batch
+        """
+        self.app = app
+        self.max_batch_size = max_batch_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "POST")
+            or b"batch=1" not in scope["query_string"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        if query.get("batch") != ["1"]:
+            await self.app(scope, receive, send)
+            return
+
+        paths = scope["path"].removeprefix("/").split(",")
+        if len(paths) > self.max_batch_size:
+            response = _error_response(
+                400, f"Batches are limited to {self.max_batch_size} procedures"
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            if scope["method"] == "GET":
+                inputs = json.loads(query.get("input", ["{}"])[0])
+            else:
+                inputs = json.loads(await _read_body(receive) or b"{}")
+            if not isinstance(inputs, dict):
+                raise ValueError("The batch input must be an object")
+        except ValueError as e:
+            response = _error_response(400, f"Invalid batch input: {e}")
+            await response(scope, receive, send)
+            return
+
+        results = await asyncio.gather(
+            *(
+                self._call(scope, path, inputs.get(str(index)))
+                for index, path in enumerate(paths)
+            )
+        )
+        statuses = {status for status, _ in results}
+        response = Response(
+            b"[" + b",".join(body for _, body in results) + b"]",
+            status_code=statuses.pop() if len(statuses) == 1 else 207,
+            media_type="application/json",
+        )
+        await response(scope, receive, send)
+
+    async def _call(
+        self, scope: Scope, path: str, procedure_input
+    ) -> tuple[int, bytes]:
+        """
+        Dispatch one procedure of a batch
+
+        :return: The status and the tRPC response (or error) of the procedure
+        """
+        headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in _PROCEDURE_SKIPPED_HEADERS
+        ]
+        body = b""
+        query_string = b""
+        if scope["method"] == "POST":
+            body = json.dumps(procedure_input).encode("utf-8")
+            headers += [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ]
+        elif procedure_input is not None:
+            query_string = b"input=" + quote(json.dumps(procedure_input)).encode(
+                "latin-1"
+            )
+
+        procedure_scope = {
+            **scope,
+            "path": f"/{path}",
+            "raw_path": f"/{path}".encode("utf-8"),
+            "query_string": query_string,
+            "headers": headers,
+            # Per procedure state (e.g. its turnstile outcome), on top of the application state
+            "state": dict(scope.get("state", {})),
+        }
+        received = False
+
+        async def receive() -> Message:
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Procedures answer with a single response, they never see a disconnect
+            await asyncio.get_running_loop().create_future()
+
+        start: Message | None = None
+        chunks: list[bytes] = []
+
+        async def send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                if not _is_json(start):
+                    raise _NotBatchable()
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(procedure_scope, receive, send)
+        except Exception:
+            # _NotBatchable may reach us wrapped (streams run in a task group)
+            if start is not None and not _is_json(start):
+                return _error(400, f"{path} can't be batched", path)
+            logger.exception("[trpc-batch] %s failed", path)
+            return _error(500, "Internal Server Error", path)
+
+        status = start["status"]
+        body = b"".join(chunks)
+        if status < 400:
+            return status, body
+        try:
+            detail = json.loads(body)["detail"]
+        except (ValueError, KeyError, TypeError):
+            detail = HTTPStatus(status).phrase
+        return _error(
+            status, detail if isinstance(detail, str) else json.dumps(detail), path
+        )
+
+
+class _NotBatchable(Exception):
+    """
+    Raised to stop a procedure that doesn't answer with JSON (e.g. a stream)
+    """
+
+
+def _is_json(start: Message) -> bool:
+    return (
+        Headers(raw=start.get("headers", []))
+        .get("content-type", "")
+        .startswith("application/json")
+    )
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+def _error(status: int, message: str, path: str | None = None) -> tuple[int, bytes]:
+    """
+    A tRPC error response
+
+    >>> _error(404, "Room not found", "room.readUnique")
+    (404, b'{"error": {"message": "Room not found", "code": -32004, "data": {"code": "NOT_FOUND", "httpStatus": 404, "path": "room.readUnique"}}}')
+    """
+    code, json_rpc_code = TRPC_ERROR_CODES.get(
+        status, ("INTERNAL_SERVER_ERROR", -32603)
+    )
+    error = {
+        "message": message,
+        "code": json_rpc_code,
+        "data": {"code": code, "httpStatus": status, "path": path},
+    }
+    return status, json.dumps({"error": error}).encode("utf-8")
+
+
+def _error_response(status: int, message: str) -> Response:
+    return Response(_error(status, message)[1], status, media_type="application/json")
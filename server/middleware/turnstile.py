@@ -1,83 +1,109 @@
-from datetime import datetime
+import asyncio
+import re
+from typing import Sequence, cast
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.responses import Response
-import httpx
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from ..config import CONFIG
 from ..logger import logger
+from ..turnstile import verify_turnstile_token
 from ..types import TurnstileOutcome
 
 
-class TurnstileMiddleware(BaseHTTPMiddleware):
+class TurnstileMiddleware:
     """
     Middleware to validate Cloudflare's Turnstile token
 
     Tokens are sent in the X-Turnstile-Token header
+
+    Only routes that declare they need the outcome (by depending on turnstile_verification)
+    are validated, every other request passes through untouched.
+
+    Validation starts as soon as the header is read and runs in the background,
+    concurrently with body validation and database lookups.
+    Routes join it only where they need the outcome (see turnstile_verification).
+    Once validated, the outcome is also available as request.state.turnstile_outcome
+
+    This is a pure ASGI middleware (no BaseHTTPMiddleware task / stream wrapping per request)
     """
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute]):
         """
-        Validate the turnstile token
+        :param app: The ASGI app to wrap
+        :param routes: The application's routes (e.g. app.routes), scanned on the first request
         """
-        token = request.headers.get("X-Turnstile-Token")
+        self.app = app
+        self.routes = routes
+        self._path_regexes: list[re.Pattern] | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requires_turnstile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        token = Headers(scope=scope).get("X-Turnstile-Token")
         if token is None:
             logger.debug("No turnstile token provided")
-            request.state.turnstile_outcome = TurnstileOutcome.NO_TOKEN()
-            return await call_next(request)
-
-        client = request.state.cf_http_client
-        response = await client.post(
-            "/turnstile/v0/siteverify",
-            timeout=5,
-            data={
-                "secret": (
-                    CONFIG.turnstile_secret
-                    and CONFIG.turnstile_secret.get_secret_value()
-                ),  # Our secret
-                "response": token,  # Came from the client
-            },
-        )
+            state["turnstile_outcome"] = TurnstileOutcome.NO_TOKEN()
+            verification = asyncio.get_running_loop().create_future()
+            verification.set_result(state["turnstile_outcome"])
+            state["turnstile_verification"] = verification
+            await self.app(scope, receive, send)
+            return
 
-        try:
-            response.raise_for_status()
-            data = response.json()
-            challenge_ts = datetime.fromisoformat(data["challenge_ts"])
-        except (KeyError, ValueError):
-            logger.debug("Invalid turnstile token (challenge_ts)")
-            request.state.turnstile_outcome = TurnstileOutcome(
-                success=False,
-                challenge_ts=None,
-                error_codes=data.get("error-codes", []),
-                hostname=data.get("hostname"),
-                action=data.get("action"),
-                data=data,
-            )
-            return await call_next(request)
-        except httpx.HTTPStatusError as e:
-            logger.exception(
-                "Error validating turnstile token: %s", e.response.text, exc_info=e
+        verification = asyncio.create_task(
+            verify_turnstile_token(
+                state["cf_http_client"],
+                token,
+                state.get("turnstile_breaker"),
+                state.get("turnstile_cache"),
             )
-            request.state.turnstile_outcome = TurnstileOutcome(
-                success=False,
-                challenge_ts=None,
-                error_codes=[e.response.text],
-                hostname=None,
-                action=None,
-                data=None,
-            )
-            return await call_next(request)
-
-        request.state.turnstile_outcome = TurnstileOutcome(
-            success=data["success"],
-            challenge_ts=challenge_ts,
-            error_codes=data.get("error-codes", []),
-            hostname=data.get("hostname"),
-            action=data.get("action"),
-            data=data,
         )
+        verification.add_done_callback(lambda task: _store_outcome(state, task))
+        state["turnstile_verification"] = verification
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Nobody waited for the outcome, no need to keep validating
+            verification.cancel()
 
-        return await call_next(request)
+    def _requires_turnstile(self, path: str) -> bool:
+        if self._path_regexes is None:
+            self._path_regexes = [
+                route.path_regex
+                for route in self.routes
+                if isinstance(route, APIRoute)
+                and _depends_on(route.dependant, turnstile_verification)
+            ]
+            logger.info(
+                "TurnstileMiddleware: validating %s",
+                [regex.pattern for regex in self._path_regexes],
+            )
+        return any(regex.match(path) for regex in self._path_regexes)
+
+
+def _depends_on(dependant: Dependant, call) -> bool:
+    return any(
+        dependency.call is call or _depends_on(dependency, call)
+        for dependency in dependant.dependencies
+    )
+
+
+def _store_outcome(state: dict, task: asyncio.Task[TurnstileOutcome]) -> None:
+    if not task.cancelled() and task.exception() is None:
+        state["turnstile_outcome"] = task.result()
+
+
+def turnstile_verification(request: Request) -> asyncio.Future[TurnstileOutcome]:
+    """
+    Get the (possibly still running) turnstile validation from the request state
+
+    Depending on this marks the route for validation by TurnstileMiddleware.
+    Await it where the outcome is needed, so the validation overlaps with everything before that point
+    """
+    return cast(asyncio.Future[TurnstileOutcome], request.state.turnstile_verification)
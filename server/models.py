@@ -74,6 +74,15 @@ class Registrant(Base):
         nullable=True,
         name="turnstileFailReason",
     )
+    turnstile_token: Mapped[str | None] = mapped_column(
+        nullable=True,
+        name="turnstileToken",
+    )
+    reverify_claimed_at: Mapped[datetime | None] = mapped_column(
+        types.DateTime(timezone=True),
+        nullable=True,
+        name="reverifyClaimedAt",
+    )
 
     waiting_room_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("WaitingRoom.id"),
@@ -114,19 +123,25 @@ class WaitingRoom(Base):
     )
     published: Mapped[bool] = mapped_column(nullable=False, default=False)
 
-    markdown: Mapped[str] = mapped_column(nullable=False)
+    # Heavy columns are only loaded when accessed (listing rooms doesn't need them)
+    markdown: Mapped[str] = mapped_column(nullable=False, deferred=True)
     title: Mapped[str] = mapped_column(nullable=False)
     event_choices: Mapped[str] = mapped_column(nullable=False, name="eventChoices")
     desktop_image_blob: Mapped[str | None] = mapped_column(
         nullable=True,
         name="desktopImageBlob",
+        deferred=True,
     )
     mobile_image_blob: Mapped[str | None] = mapped_column(
         nullable=True,
         name="mobileImageBlob",
+        deferred=True,
     )
 
     registrants: Mapped[List[Registrant]] = relationship(back_populates="waiting_room")
+    registration_counts: Mapped[List[RoomRegistrationCount]] = relationship(
+        back_populates="waiting_room"
+    )
 
     owner_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("User.id"),
@@ -136,6 +151,47 @@ class WaitingRoom(Base):
     owner: Mapped[User] = relationship(back_populates="waiting_rooms")
 
 
+class RoomRegistrationCount(Base):
+    """
+    Number of registrants of a room (within its opening window),
+    by event choice and turnstile outcome
+    """
+
+    __tablename__ = "RoomRegistrationCount"
+    waiting_room_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("WaitingRoom.id"),
+        primary_key=True,
+        name="waitingRoomId",
+    )
+    event_choice: Mapped[str] = mapped_column(primary_key=True, name="eventChoice")
+    turnstile_success: Mapped[bool] = mapped_column(
+        primary_key=True, name="turnstileSuccess"
+    )
+    count: Mapped[int] = mapped_column(types.BigInteger, nullable=False, default=0)
+    waiting_room: Mapped[WaitingRoom] = relationship(
+        back_populates="registration_counts"
+    )
+
+
+class ImageBlob(Base):
+    """
+    An image, stored once and referenced by the SHA-256 hash of its content (hex)
+    """
+
+    __tablename__ = "ImageBlob"
+    hash: Mapped[str] = mapped_column(primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=sqlalchemy.sql.func.now(),
+        name="createdAt",
+        nullable=False,
+    )
+    content_type: Mapped[str] = mapped_column(nullable=False, name="contentType")
+    size: Mapped[int] = mapped_column(nullable=False)
+    data: Mapped[bytes] = mapped_column(
+        types.LargeBinary, nullable=False, deferred=True
+    )
+
+
 class User(Base):
     __tablename__ = "User"
     id: Mapped[uuid.UUID] = mapped_column(
@@ -163,3 +219,52 @@ class User(Base):
     email: Mapped[str] = mapped_column(nullable=False)
 
     waiting_rooms: Mapped[List[WaitingRoom]] = relationship(back_populates="owner")
+
+
+class Deployment(Base):
+    """
+    Website deployments requested by every worker, dispatched by one of them (see DeployScheduler)
+    """
+
+    __tablename__ = "Deployment"
+    id: Mapped[str] = mapped_column(primary_key=True)
+    requests: Mapped[int] = mapped_column(nullable=False, default=0)
+    """
+    Deployments requested, ever
+    """
+    dispatched_requests: Mapped[int] = mapped_column(
+        nullable=False, default=0, name="dispatchedRequests"
+    )
+    """
+    Requests covered by the last finished dispatch (requests > dispatched_requests: a deployment is pending)
+    """
+    requested_at: Mapped[datetime | None] = mapped_column(
+        types.DateTime(timezone=True), name="requestedAt"
+    )
+    """
+    When the pending deployment was first requested (its debounce window starts then)
+    """
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        types.DateTime(timezone=True), name="leaseExpiresAt"
+    )
+    """
+    A worker is dispatching until then
+    """
+    last_dispatch_at: Mapped[datetime | None] = mapped_column(
+        types.DateTime(timezone=True), name="lastDispatchAt"
+    )
+    last_dispatch_status: Mapped[int | None] = mapped_column(name="lastDispatchStatus")
+    last_error: Mapped[str | None] = mapped_column(name="lastError")
+    failed_attempts: Mapped[int] = mapped_column(
+        nullable=False, default=0, name="failedAttempts"
+    )
+    """
+    Failed attempts in a row at the pending deployment
+    """
+    next_attempt_at: Mapped[datetime | None] = mapped_column(
+        types.DateTime(timezone=True), name="nextAttemptAt"
+    )
+    """
+    The pending deployment is retried from then on (None until an attempt fails)
+    """
+    dispatches: Mapped[int] = mapped_column(nullable=False, default=0)
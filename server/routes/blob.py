@@ -0,0 +1,84 @@
+"""
+Serve stored images (see db/blob.py)
+
+A blob's URL is derived from its content, so responses are cached forever (immutable),
+the hash is a strong ETag, and byte ranges are served for partial downloads.
+"""
+
+import re
+from typing import Annotated
+
+import fastapi
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.blob import BLOB_HASH, fetch_blob
+from ..db.session import db_session
+
+router = fastapi.APIRouter()
+
+_RANGE = re.compile(r"bytes=(?P<start>\d*)-(?P<end>\d*)")
+
+BLOB_HEADERS = {
+    "Cache-Control": "public, max-age=31536000, immutable",
+    "Accept-Ranges": "bytes",
+    # Never render a stored image as anything else (e.g. an SVG with scripts)
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+}
+
+
+@router.get("/blob/{blob_hash}", name="blob")
+async def blob(
+    request: fastapi.Request,
+    blob_hash: str,
+    session: Annotated[AsyncSession, Depends(db_session)],
+) -> fastapi.Response:
+    """
+    An image by content hash
+
+    Supports If-None-Match (304), and a single byte range (Range, If-Range)
+    """
+    if not BLOB_HASH.fullmatch(blob_hash):
+        raise fastapi.HTTPException(status_code=404, detail="Blob not found")
+    etag = f'"{blob_hash}"'
+    headers = {**BLOB_HEADERS, "ETag": etag}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return fastapi.Response(status_code=304, headers=headers)
+
+    found = await fetch_blob(session, blob_hash)
+    if found is None:
+        raise fastapi.HTTPException(status_code=404, detail="Blob not found")
+    data = found.data
+
+    byte_range = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if byte_range and (if_range is None or if_range == etag):
+        match = _RANGE.fullmatch(byte_range.strip())
+        # Anything else (e.g. multiple ranges) is answered with the whole blob
+        if match and (match["start"] or match["end"]):
+            size = len(data)
+            if match["start"]:
+                start = int(match["start"])
+                end = min(int(match["end"] or size - 1), size - 1)
+            else:
+                start = max(size - int(match["end"]), 0)
+                end = size - 1
+            if start >= size or start > end:
+                return fastapi.Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+            return fastapi.Response(
+                data[start : end + 1],
+                status_code=206,
+                media_type=found.content_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+
+    return fastapi.Response(data, media_type=found.content_type, headers=headers)
@@ -0,0 +1,321 @@
+"""
+Live registration feed for the dashboard (Server-Sent Events)
+
+Instead of every open dashboard polling /room.stats and /room.registrants,
+viewers subscribe to a room's feed, and a single hub per worker polls the database once per tick
+for every watched room, pushing what changed to all of the room's viewers.
+Database load depends on the number of watched rooms, not on the number of viewers.
+
+Browsers subscribe with an EventSource, which can't send an Authorization header:
+the dashboard asks /room.liveTicket for a short-lived ticket (signed, bound to the room and the owner)
+and opens the feed with it in the query string, the Firebase ID token never appears in a URL.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Annotated, AsyncIterator, cast
+
+import fastapi
+from fastapi import Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.authentication import requires
+
+from ..background import PeriodicTask
+from ..config import CONFIG
+from ..db.room_stats import RegistrationCounter
+from ..db.session import db_session
+from ..db.user import MaybeUser, User, authenticated_user
+from ..logger import logger
+from ..models import Registrant as DbRegistrant, WaitingRoom
+from ..trpc import TrpcMixin
+from ..types import TrpcResponse
+from .room import (
+    REGISTRANTS_MAX_PAGE_SIZE,
+    RegistrantCursor,
+    RoomId,
+    RoomStats,
+    read_registrants,
+    room_stats,
+)
+
+router = fastapi.APIRouter()
+
+Event = tuple[str, BaseModel] | None
+"""
+An SSE event (name, data), None tells the viewer to disconnect
+"""
+
+
+class _Feed:
+    """
+    A watched room: its viewers, and what they were already sent
+    """
+
+    def __init__(self):
+        self.viewers: set[asyncio.Queue[Event]] = set()
+        self.cursor: RegistrantCursor | None = None
+        self.stats: RoomStats | None = None
+        self.started = False
+
+
+class LiveFeedHub(PeriodicTask):
+    """
+    Poll the watched rooms once per tick, and fan the changes out to their viewers
+
+    Events:
+     - stats: the room's RoomStats, whenever they change (and when a viewer subscribes)
+     - registrants: RoomRegistrants written since the previous tick
+       (REGISTRANTS_SETTLE_SECONDS late, so none are stepped over, see read_registrants)
+    """
+
+    name = "live-feed-hub"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        counter: RegistrationCounter,
+        interval: float = 1,
+        max_queued_events: int = 100,
+    ):
+        """
+        :param session_maker: Used to poll the watched rooms
+        :param counter: Registration counts (see /room.stats)
+        :param interval: Seconds between polls
+        :param max_queued_events: Events queued for a viewer before it is considered gone
+        """
+        super().__init__(interval)
+        self._session_maker = session_maker
+        self._counter = counter
+        self._max_queued_events = max_queued_events
+        self._feeds: dict[uuid.UUID, _Feed] = {}
+
+    def subscribe(self, room_id: uuid.UUID) -> asyncio.Queue[Event]:
+        feed = self._feeds.setdefault(room_id, _Feed())
+        queue: asyncio.Queue[Event] = asyncio.Queue(self._max_queued_events)
+        feed.viewers.add(queue)
+        if feed.stats is not None:
+            queue.put_nowait(("stats", feed.stats))
+        return queue
+
+    def unsubscribe(self, room_id: uuid.UUID, queue: asyncio.Queue[Event]) -> None:
+        feed = self._feeds.get(room_id)
+        if feed is None:
+            return
+        feed.viewers.discard(queue)
+        if not feed.viewers:
+            del self._feeds[room_id]
+
+    @property
+    def viewers(self) -> int:
+        return sum(len(feed.viewers) for feed in self._feeds.values())
+
+    async def tick(self) -> None:
+        if not self._feeds:
+            return
+        async with self._session_maker() as session:
+            for room_id, feed in list(self._feeds.items()):
+                await self._poll(session, room_id, feed)
+
+    async def _poll(self, session: AsyncSession, room_id: uuid.UUID, feed: _Feed):
+        stats = room_stats(room_id, await self._counter.read(session, room_id))
+        if stats != feed.stats:
+            feed.stats = stats
+            self._publish(feed, ("stats", stats))
+
+        if not feed.started:
+            # Viewers load the registrants so far with /room.registrants, only push new ones
+            feed.cursor = await _latest_cursor(session, room_id)
+            feed.started = True
+            return
+        registrants = await read_registrants(
+            session, room_id, feed.cursor, REGISTRANTS_MAX_PAGE_SIZE
+        )
+        if registrants.registrants:
+            feed.cursor = RegistrantCursor.decode(registrants.nextCursor)
+            self._publish(feed, ("registrants", registrants))
+
+    def _publish(self, feed: _Feed, event: Event) -> None:
+        for queue in list(feed.viewers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The viewer is not reading, make room for a disconnect (it can reconnect and resync)
+                logger.warning("[%s] dropping a lagging viewer", self.name)
+                feed.viewers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+
+async def _latest_cursor(
+    session: AsyncSession,
+    room_id: uuid.UUID,
+    settle: float = CONFIG.registrants_settle_seconds,
+) -> RegistrantCursor | None:
+    """
+    Cursor of the last settled registrant (see read_registrants), later ones are pushed to the viewers
+    """
+    written_before = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=settle)
+    latest = (
+        await session.execute(
+            select(DbRegistrant.created_at, DbRegistrant.id)
+            .join(WaitingRoom, WaitingRoom.id == DbRegistrant.waiting_room_id)
+            .where(WaitingRoom.id == room_id)
+            .where(DbRegistrant.turnstile_timestamp > WaitingRoom.opens_at)
+            .where(DbRegistrant.turnstile_timestamp < WaitingRoom.closes_at)
+            .where(DbRegistrant.created_at < written_before)
+            .order_by(DbRegistrant.created_at.desc(), DbRegistrant.id.desc())
+            .limit(1)
+        )
+    ).one_or_none()
+    return None if latest is None else RegistrantCursor(*latest)
+
+
+def live_feed_hub(request: fastapi.Request) -> LiveFeedHub:
+    """
+    Get the live feed hub from the request state
+    """
+    return cast(LiveFeedHub, request.state.live_feed_hub)
+
+
+KEEPALIVE_SECONDS = 15
+
+TICKET_TTL_SECONDS = 60
+"""
+Time (seconds) a live feed ticket can be used to open the feed (an open feed is not cut when it expires)
+"""
+
+
+def sign_ticket(room_id: uuid.UUID, user_id: uuid.UUID, expires_at: int) -> str:
+    """
+    A ticket to open a room's live feed as the user until expires_at (UNIX time)
+    """
+    message = f"{room_id}.{user_id}.{expires_at}".encode("ascii")
+    signature = hmac.new(
+        CONFIG.live_ticket_secret.get_secret_value().encode("utf-8"),
+        message,
+        hashlib.sha256,
+    ).hexdigest()
+    return f"{user_id}.{expires_at}.{signature}"
+
+
+def verify_ticket(ticket: str, room_id: uuid.UUID) -> uuid.UUID | None:
+    """
+    The user a ticket was signed for (None if it is invalid, expired or for another room)
+
+    >>> room_id, user_id = uuid.uuid4(), uuid.uuid4()
+    >>> verify_ticket(sign_ticket(room_id, user_id, int(time.time()) + 60), room_id) == user_id
+    True
+    >>> verify_ticket(sign_ticket(room_id, user_id, int(time.time()) - 1), room_id) is None
+    True
+    >>> verify_ticket(sign_ticket(uuid.uuid4(), user_id, int(time.time()) + 60), room_id) is None
+    True
+    """
+    try:
+        user_id, expires_at, _signature = ticket.split(".")
+        user_id, expires_at = uuid.UUID(user_id), int(expires_at)
+    except ValueError:
+        return None
+    if expires_at < time.time():
+        return None
+    if not hmac.compare_digest(ticket, sign_ticket(room_id, user_id, expires_at)):
+        return None
+    return user_id
+
+
+class LiveTicket(BaseModel, TrpcMixin):
+    ticket: str
+    expiresAt: int
+
+
+class LiveQuery(RoomId):
+    ticket: str | None = None
+
+
+async def _owns_room(
+    session: AsyncSession, room_id: uuid.UUID, user_id: uuid.UUID
+) -> bool:
+    room = await session.execute(
+        select(WaitingRoom.id)
+        .where(WaitingRoom.id == str(room_id))
+        .where(WaitingRoom.owner_id == str(user_id))
+    )
+    return room.one_or_none() is not None
+
+
+@router.get("/room.liveTicket")
+@requires("authenticated", status_code=401)
+async def live_ticket(
+    request: fastapi.Request,
+    user: Annotated[User, Depends(authenticated_user)],
+    query: Annotated[RoomId, Depends(RoomId.from_trpc)],
+    session: Annotated[AsyncSession, Depends(db_session)],
+) -> TrpcResponse[LiveTicket]:
+    """
+    A short-lived ticket to open the room's live feed (see /room.live)
+    """
+    if not await _owns_room(session, query.id, user.id):
+        raise fastapi.HTTPException(status_code=401, detail="Invalid waiting room ID")
+    expires_at = int(time.time()) + TICKET_TTL_SECONDS
+    return LiveTicket(
+        ticket=sign_ticket(query.id, user.id, expires_at), expiresAt=expires_at
+    ).trpc
+
+
+@router.get("/room.live")
+async def live(
+    request: fastapi.Request,
+    user: MaybeUser,
+    query: Annotated[LiveQuery, Depends(LiveQuery.from_trpc)],
+    session: Annotated[AsyncSession, Depends(db_session)],
+    hub: Annotated[LiveFeedHub, Depends(live_feed_hub)],
+) -> StreamingResponse:
+    """
+    Stream a room's stats and new registrants as Server-Sent Events (see LiveFeedHub)
+
+    Authenticated by the Authorization header, or by a ticket (see /room.liveTicket) for EventSource
+    """
+    if user is not None:
+        user_id = user.id
+    elif query.ticket is not None:
+        user_id = verify_ticket(query.ticket, query.id)
+    else:
+        user_id = None
+    if user_id is None:
+        raise fastapi.HTTPException(
+            status_code=401, detail="You must be logged in to perform this action"
+        )
+    if not await _owns_room(session, query.id, user_id):
+        raise fastapi.HTTPException(status_code=401, detail="Invalid waiting room ID")
+
+    return StreamingResponse(
+        _events(hub, query.id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _events(hub: LiveFeedHub, room_id: uuid.UUID) -> AsyncIterator[str]:
+    queue = hub.subscribe(room_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            name, data = event
+            yield f"event: {name}\ndata: {data.model_dump_json()}\n\n"
+    finally:
+        hub.unsubscribe(room_id, queue)
@@ -9,8 +9,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.authentication import requires
 
 from ..db.session import db_session
+from ..db.user import User, authenticated_user
+from ..invalidation import InvalidationChannel, room_invalidation
+from ..markdown import render_markdown
 from ..models import WaitingRoom
-from ..types import TrpcData, TrpcResponse
+from ..trpc import trpc
+from ..types import TrpcResponse
 
 router = fastapi.APIRouter()
 
@@ -24,6 +28,10 @@ class WaitingRoomEditRequest(BaseModel):
 class WaitingRoomEditResponse(BaseModel):
     id: str
     markdown: str
+    html: str
+    """
+    The markdown rendered to sanitized HTML
+    """
     title: str
     updatedAt: datetime.datetime
 
@@ -32,8 +40,10 @@ class WaitingRoomEditResponse(BaseModel):
 @requires("authenticated", status_code=401)
 async def edit_waiting_room_content(
     request: fastapi.Request,
+    user: Annotated[User, Depends(authenticated_user)],
     edit_request: WaitingRoomEditRequest,
     session: Annotated[AsyncSession, Depends(db_session)],
+    invalidation: Annotated[InvalidationChannel, Depends(room_invalidation)],
 ) -> TrpcResponse[WaitingRoomEditResponse]:
     """
     Edit the markdown contents of a waiting room
@@ -46,27 +56,34 @@ async def edit_waiting_room_content(
 
     - TrpcResponse[WaitingRoomEditResponse]: The response containing the updated waiting room
     """
+    # Render once per edit (room reads serve the cached HTML)
+    html = await render_markdown(edit_request.markdown)
     async with session.begin():
         room = (
             await session.execute(
                 update(WaitingRoom)
                 .where(WaitingRoom.id == edit_request.id)
-                .where(WaitingRoom.owner_id == request.user.id)
+                .where(WaitingRoom.owner_id == user.id)
                 .values(
                     markdown=edit_request.markdown,
                     title=edit_request.title,
                 )
-                .returning(WaitingRoom)
+                .returning(
+                    WaitingRoom.id,
+                    WaitingRoom.markdown,
+                    WaitingRoom.title,
+                    WaitingRoom.updated_at,
+                )
             )
-        ).scalar_one()
+        ).one()
+    await invalidation.publish(edit_request.id, room.updated_at)
 
-    return TrpcResponse(
-        result=TrpcData(
-            data=WaitingRoomEditResponse(
-                id=room.id,
-                markdown=room.markdown,
-                title=room.title,
-                updatedAt=room.updated_at,
-            )
+    return trpc(
+        WaitingRoomEditResponse(
+            id=str(room.id),
+            markdown=room.markdown,
+            html=html,
+            title=room.title,
+            updatedAt=room.updated_at,
         )
     )
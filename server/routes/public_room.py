@@ -0,0 +1,154 @@
+"""
+Public read endpoint for published rooms
+
+Visitors refresh a room page again and again before it opens.
+The response of each room is rendered once and kept in memory (until the room changes, see invalidate_public_room,
+or for PUBLIC_ROOM_CACHE_TTL_SECONDS), so a crowd of visitors costs one database read per cache period.
+Responses carry a strong ETag (304 on If-None-Match) and a short public Cache-Control for CDNs and browsers.
+"""
+
+import datetime
+import hashlib
+import uuid
+from typing import Annotated, NamedTuple
+
+import fastapi
+from fastapi import Depends
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache.local import Cache
+from ..config import CONFIG
+from ..db.blob import image_url
+from ..db.session import db_session
+from ..markdown import render_markdown
+from ..models import User as DbUser, WaitingRoom
+from ..singleflight import SingleFlight
+from ..trpc import trpc_json
+from ..types import CommaSeparatedStr
+from .room import RoomId
+
+router = fastapi.APIRouter()
+
+
+class PublicRoom(BaseModel):
+    id: uuid.UUID
+    title: str
+    markdown: str
+    html: str
+    """
+    The markdown rendered to sanitized HTML
+    """
+    desktopImageBlob: str | None
+    mobileImageBlob: str | None
+    opensAt: datetime.datetime
+    closesAt: datetime.datetime
+    eventChoices: CommaSeparatedStr
+    ownerEmail: str
+    updatedAt: datetime.datetime
+
+
+class RenderedRoom(NamedTuple):
+    """
+    A rendered response (None for rooms that don't exist or are not published)
+    """
+
+    body: bytes | None
+    etag: str | None
+
+
+public_room_cache = Cache(
+    "public_rooms", maxsize=1024, ttl=CONFIG.public_room_cache_ttl_seconds
+)
+"""
+Rendered responses by room ID, evicted by invalidate_public_room when a room changes
+(a render that overlapped the invalidation isn't cached, see Cache.load)
+"""
+
+_renders = SingleFlight()
+
+
+def invalidate_public_room(room_id: uuid.UUID) -> None:
+    """
+    Evict a room's rendered response (subscribed to the room invalidation channel)
+    """
+    public_room_cache.invalidate(room_id)
+
+
+@router.get("/room.readPublic")
+async def read_public(
+    request: fastapi.Request,
+    query: Annotated[RoomId, Depends(RoomId.from_trpc)],
+    session: Annotated[AsyncSession, Depends(db_session)],
+) -> fastapi.Response:
+    """
+    A published room, as shown to visitors (no authentication)
+    """
+    rendered = public_room_cache.get(query.id)
+    if rendered is None:
+        rendered = await _renders.do(
+            query.id,
+            lambda: public_room_cache.load(
+                query.id, lambda: _render(request, session, query.id)
+            ),
+        )
+    if rendered.body is None:
+        raise fastapi.HTTPException(status_code=404, detail="Room not found")
+
+    headers = {
+        "ETag": rendered.etag,
+        "Cache-Control": f"public, max-age={CONFIG.public_room_max_age_seconds}, "
+        f"stale-while-revalidate={CONFIG.public_room_max_age_seconds}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and rendered.etag in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ):
+        return fastapi.Response(status_code=304, headers=headers)
+    return fastapi.Response(
+        rendered.body, media_type="application/json", headers=headers
+    )
+
+
+async def _render(
+    request: fastapi.Request, session: AsyncSession, room_id: uuid.UUID
+) -> RenderedRoom:
+    room = (
+        await session.execute(
+            select(
+                WaitingRoom.id,
+                WaitingRoom.title,
+                WaitingRoom.markdown,
+                WaitingRoom.desktop_image_blob,
+                WaitingRoom.mobile_image_blob,
+                WaitingRoom.opens_at,
+                WaitingRoom.closes_at,
+                WaitingRoom.event_choices,
+                DbUser.email,
+                WaitingRoom.updated_at,
+            )
+            .join(DbUser, DbUser.id == WaitingRoom.owner_id)
+            .where(WaitingRoom.id == room_id)
+            .where(WaitingRoom.published == True)
+        )
+    ).one_or_none()
+    if room is None:
+        return RenderedRoom(None, None)
+    body = trpc_json(
+        PublicRoom(
+            id=room[0],
+            title=room[1],
+            markdown=room[2],
+            html=await render_markdown(room[2]),
+            desktopImageBlob=image_url(request, room[3]),
+            mobileImageBlob=image_url(request, room[4]),
+            opensAt=room[5],
+            closesAt=room[6],
+            eventChoices=room[7],
+            ownerEmail=room[8],
+            updatedAt=room[9],
+        )
+    )
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return RenderedRoom(body, etag)
@@ -1,21 +1,27 @@
+import asyncio
+import hashlib
 import uuid
-from typing import Annotated, cast
+from typing import Annotated
 
 import fastapi
 import orjson
-from fastapi import Depends
+from fastapi import Depends, Header
 from pydantic import BaseModel, constr, EmailStr, UUID4
-from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..admission import Admission, admit
 from ..constants import PLAY_NICE_RESPONSE
+from ..db.registrant import RegistrantBatcher, registrant_audit, registrant_batcher
+from ..db.room_stats import RegistrationCounter, registration_counter
 from ..db.session import db_session
 from ..db.user import MaybeUser
 from ..db.waiting_room import CachedWaitingRoomQueryResult, fetch_waiting_room
 from ..logger import logger
+from ..middleware.turnstile import turnstile_verification
 from ..models import IdType, Registrant
 from ..trpc import TrpcMixin
-from ..turnstile import handle_turnstile_errors
+from ..turnstile import TurnstileOutcomeCache, handle_turnstile_errors, turnstile_cache
 from ..types import TrpcResponse, TurnstileOutcome
 
 router = fastapi.APIRouter()
@@ -44,13 +50,6 @@ class RegisterResponse(BaseModel, TrpcMixin):
     waitingRoomId: str
 
 
-def turnstile_outcome(request: fastapi.Request) -> TurnstileOutcome:
-    """
-    Get the turnstile outcome from the request state
-    """
-    return cast(TurnstileOutcome, request.state.turnstile_outcome)
-
-
 async def waiting_room(
     data: RegisterRequest,
     session: Annotated[AsyncSession, Depends(db_session)],
@@ -80,30 +79,71 @@ async def waiting_room(
 @router.post("/register")
 async def create_participant(
     data: RegisterRequest,
-    outcome: Annotated[TurnstileOutcome, Depends(turnstile_outcome)],
+    verification: Annotated[
+        asyncio.Future[TurnstileOutcome], Depends(turnstile_verification)
+    ],
     room: Annotated[CachedWaitingRoomQueryResult, Depends(waiting_room)],
     session: Annotated[AsyncSession, Depends(db_session)],
+    batcher: Annotated[RegistrantBatcher | None, Depends(registrant_batcher)],
+    audit: Annotated[RegistrantBatcher, Depends(registrant_audit)],
+    counter: Annotated[RegistrationCounter, Depends(registration_counter)],
+    tokens: Annotated[TurnstileOutcomeCache, Depends(turnstile_cache)],
+    x_turnstile_token: Annotated[str | None, Header()] = None,
 ) -> TrpcResponse[RegisterResponse]:
     """
     Register a participant for a waiting room
 
     Things that happen here:
+    - Wait for the turnstile validation (it started in the middleware and ran while
+      the body was validated and the waiting room was looked up)
+    - Admit the request before touching the database (using the cached waiting room and the turnstile outcome)
     - Validate the turnstile token (make sure this is a real person)
-        - If the token is invalid, return an error to the client (this will not be recorded in the database)
+        - If the token is invalid, record the request (audit) and return an error to the client
         - If the token is valid, continue
+        - If Cloudflare is unavailable, record the registration as pending and continue
+          (the token is validated in the background, see TurnstileReverifier)
+    - Claim the turnstile token for this registration (see TurnstileOutcomeCache.claim)
+        - A client retrying the same registration gets the original registrant ID back,
+          its row is written (again) with that ID, so a retry never adds a registrant
+        - Any other registration with the same token is a duplicate (recorded as a bot)
     - Verify the waiting room is open at the time of registration
         - Given a form was submitted too early (by someone opening the client source code and sending a request)
           We'll still record the registration, but we'll return an error to the client
           This will allow event organizers to see who tried to register too early and disqualify them (if they want to)
         - Given a form was submitted too late, we'll return an error to the client
           This will not be recorded in the database (as the event owner already closed the waiting room)
+        - Audit records are written in the background (batched), the client doesn't wait for them
+    - Count the registration for the room's stats (see RegistrationCounter)
     - Create a new participant
         - This step only validates the foreign key constraints (waiting room ID)
         - If the waiting room ID is invalid, return an error to the client (i.e they tried to register for
           a waiting room that doesn't exist, again, someone is trying to "hack" us)
+        - When registration batching is enabled, the row is queued and written together with
+          concurrent registrations (one multi-row INSERT instead of one transaction per request)
     - Return the new participant ID
         - this will be displayed on the client as "Your number registration number is: X"
     """
+    outcome = await verification
+
+    registrant_id = uuid.uuid4()
+    retry = False
+    if admit(outcome, room) in (Admission.ACCEPT, Admission.PENDING):
+        claimed_id = await tokens.claim(
+            outcome.token or x_turnstile_token,
+            hashlib.sha256(data.model_dump_json().encode()).hexdigest(),
+            registrant_id,
+        )
+        if claimed_id is None:
+            # The token registered someone else
+            outcome = TurnstileOutcome(
+                success=False,
+                challenge_ts=outcome.challenge_ts,
+                error_codes=["timeout-or-duplicate", "replayed"],
+            )
+        else:
+            retry = claimed_id != registrant_id
+            registrant_id = claimed_id
+
     registrant = {
         "legalName": data.legalName,
         "email": data.email,
@@ -118,47 +158,66 @@ async def create_participant(
 
     logger.info(orjson.dumps(registrant).decode("utf-8"))
 
-    await session.commit()
-    result = await session.execute(
-        insert(Registrant)
-        .values(
-            legal_name=data.legalName,
-            email=data.email,
-            phone_number=data.phoneNumber,
-            id_number=data.idNumber,
-            id_type=data.idType,
-            waiting_room_id=data.waitingRoomId,
-            event_choice=data.eventChoice,
-            turnstile_success=outcome.success,
-            turnstile_timestamp=outcome.challenge_ts,
-            turnstile_fail_reason=(
-                str(outcome.error_codes) if outcome.error_codes else None
-            ),
-        )
-        .returning(Registrant.id)
-    )
-    await session.commit()
-
-    _id = result.scalar_one()
-
-    handle_turnstile_errors(outcome, data.legalName)
+    values = {
+        "id": registrant_id,
+        "legal_name": data.legalName,
+        "email": data.email,
+        "phone_number": data.phoneNumber,
+        "id_number": data.idNumber,
+        "id_type": data.idType,
+        "waiting_room_id": data.waitingRoomId,
+        "event_choice": data.eventChoice,
+        "turnstile_success": outcome.success,
+        "turnstile_timestamp": outcome.challenge_ts,
+        "turnstile_fail_reason": (
+            str(outcome.error_codes) if outcome.error_codes else None
+        ),
+        "turnstile_token": outcome.token,
+    }
 
-    # Someone is trying to register too late
-    if outcome.challenge_ts > room.closes_at:
+    admission = admit(outcome, room)
+    if admission is Admission.TOO_LATE:
+        # Someone is trying to register too late
         raise fastapi.HTTPException(
             status_code=400,
             detail="Too late to register"
             + PLAY_NICE_RESPONSE.format(name=data.legalName),
         )
-    if outcome.challenge_ts < room.opens_at:
+    if admission is Admission.BOT:
+        if audit.record(values):
+            counter.add(room, values)
+        handle_turnstile_errors(outcome, data.legalName)
+        # The challenge succeeded, but without a timestamp we can't tell when it was solved
+        raise fastapi.HTTPException(
+            status_code=400,
+            detail="missing challenge_ts."
+            + PLAY_NICE_RESPONSE.format(name=data.legalName),
+        )
+    if admission is Admission.TOO_EARLY:
         # Someone is trying to register too early
         # We recorded the request, but we won't return a success response
+        audit.record(values)
         raise fastapi.HTTPException(
             status_code=400,
             detail="Too early to register."
             + PLAY_NICE_RESPONSE.format(name=data.legalName),
         )
 
+    # Release the connection used to look up the waiting room
+    await session.commit()
+    if batcher is not None:
+        _id = await batcher.submit(values)
+    else:
+        await session.execute(
+            insert(Registrant)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[Registrant.id])
+        )
+        await session.commit()
+        _id = registrant_id
+    if not retry:
+        counter.add(room, values)
+
     return RegisterResponse(
         id=str(_id),
         email=data.email,
@@ -1,21 +1,46 @@
+import base64
+import collections
+import csv
 import datetime
+import enum
+import io
 import uuid
-from typing import Annotated, cast
+from typing import (
+    Annotated,
+    AsyncIterator,
+    Callable,
+    Literal,
+    NamedTuple,
+    Sequence,
+)
 
 import fastapi
-import httpx
-import sqlalchemy
+import orjson
 from fastapi import Depends
-from pydantic import BaseModel
-from sqlalchemy import insert, select, update
-from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, BeforeValidator, Field
+from pydantic_core import PydanticCustomError
+from sqlalchemy import Row, Select, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import undefer
 from starlette.authentication import requires
 
+from ..db.blob import image_url, store_image
+from ..db.room_stats import RegistrationCounter, RoomCounts, registration_counter
+from ..db.timeline import room_timeline
+from ..db.waiting_room import fetch_waiting_room
 from ..db.user import User, authenticated_user
-from ..models import IdType, WaitingRoom, Registrant as DbRegistrant
+from ..models import (
+    IdType,
+    WaitingRoom,
+    Registrant as DbRegistrant,
+    RoomRegistrationCount,
+)
 from ..config import CONFIG
-from ..db.session import db_session
-from ..logger import logger
+from ..db.session import create_session_maker, db_session
+from ..deploy import DeployScheduler, DeployStatus, deploy_scheduler
+from ..invalidation import InvalidationChannel, room_invalidation
+from ..markdown import render_markdown
 from ..trpc import trpc, TrpcMixin
 from ..types import TrpcResponse, CommaSeparatedStr
 
@@ -34,6 +59,10 @@ class RoomQuery(BaseModel, TrpcMixin):
     closesAt: datetime.datetime
     eventChoices: CommaSeparatedStr
     published: bool
+    html: str | None = None
+    """
+    The markdown rendered to sanitized HTML
+    """
 
 
 class RoomMutation(BaseModel):
@@ -56,34 +85,159 @@ class RoomPublishRequest(BaseModel):
     publish: bool
 
 
+def _encode_cursor(timestamp: datetime.datetime, _id: uuid.UUID) -> str:
+    raw = orjson.dumps([timestamp, _id])
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    """
+    :raises ValueError: If the cursor is invalid
+    """
+    try:
+        timestamp, _id = orjson.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.datetime.fromisoformat(timestamp), uuid.UUID(_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _cursor_validator(cursor_type):
+    """
+    Decode cursors sent by clients, invalid ones are reported like any other invalid input
+    """
+
+    def validate(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return cursor_type.decode(value)
+        except ValueError:
+            raise PydanticCustomError("cursor", "Invalid cursor")
+
+    return validate
+
+
+class RoomCursor(NamedTuple):
+    """
+    Position of a room in the (createdAt, id) descending order, opaque to clients
+
+    >>> cursor = RoomCursor(
+    ...     datetime.datetime(2024, 10, 28, 12, 0, tzinfo=datetime.UTC),
+    ...     uuid.UUID("8b9228ce-3348-40c9-9d20-3992c5c5141f"),
+    ... )
+    >>> RoomCursor.decode(cursor.encode()) == cursor
+    True
+    """
+
+    created_at: datetime.datetime
+    id: uuid.UUID
+
+    def encode(self) -> str:
+        return _encode_cursor(self.created_at, self.id)
+
+    @classmethod
+    def decode(cls, cursor: str) -> "RoomCursor":
+        """
+        :raises ValueError: If the cursor is invalid
+        """
+        return cls(*_decode_cursor(cursor))
+
+
+ROOMS_MAX_PAGE_SIZE = 100
+
+
+class RoomReadManyQuery(BaseModel, TrpcMixin):
+    cursor: Annotated[
+        RoomCursor | None, BeforeValidator(_cursor_validator(RoomCursor))
+    ] = None
+    """
+    Only return rooms after this cursor (the last room's cursor of the previous page)
+    """
+    limit: Annotated[int, Field(gt=0, le=ROOMS_MAX_PAGE_SIZE)] = ROOMS_MAX_PAGE_SIZE
+
+
+class RoomSummary(BaseModel):
+    """
+    What the dashboard lists about a room (the markdown and images are only served by /room.readUnique)
+    """
+
+    id: uuid.UUID
+    title: str
+    createdAt: datetime.datetime
+    updatedAt: datetime.datetime
+    opensAt: datetime.datetime
+    closesAt: datetime.datetime
+    eventChoices: CommaSeparatedStr
+    published: bool
+    registrantsCount: int
+    """
+    Registrants within the opening window (see /room.stats), as of the last counter write
+    """
+    cursor: str
+    """
+    Pass as cursor to get the rooms after this one
+    """
+
+
 @router.get("/room.readMany")
 @requires("authenticated", status_code=401)
 async def read_many(
     request: fastapi.Request,
-    db: Annotated[AsyncConnection, Depends(db_session)],
+    db: Annotated[AsyncSession, Depends(db_session)],
     user: Annotated[User, Depends(authenticated_user)],
-) -> TrpcResponse[list[RoomQuery]]:
-    rooms_iterable = await db.scalars(
-        select(WaitingRoom)
+    query: Annotated[RoomReadManyQuery, Depends(RoomReadManyQuery.from_trpc)],
+) -> TrpcResponse[list[RoomSummary]]:
+    """
+    The user's rooms, newest first, a page of `limit` rooms at a time (a shorter page is the last one)
+    """
+    registrants_count = (
+        select(
+            RoomRegistrationCount.waiting_room_id,
+            func.sum(RoomRegistrationCount.count).label("count"),
+        )
+        .group_by(RoomRegistrationCount.waiting_room_id)
+        .subquery()
+    )
+    statement = (
+        select(
+            WaitingRoom.id,
+            WaitingRoom.title,
+            WaitingRoom.created_at,
+            WaitingRoom.updated_at,
+            WaitingRoom.opens_at,
+            WaitingRoom.closes_at,
+            WaitingRoom.event_choices,
+            WaitingRoom.published,
+            func.coalesce(registrants_count.c.count, 0),
+        )
+        .outerjoin(
+            registrants_count,
+            registrants_count.c.waiting_room_id == WaitingRoom.id,
+        )
         .where(WaitingRoom.owner_id == str(user.id))
-        .order_by(WaitingRoom.created_at.desc())
+        .order_by(WaitingRoom.created_at.desc(), WaitingRoom.id.desc())
+        .limit(query.limit)
     )
+    if query.cursor is not None:
+        statement = statement.where(
+            tuple_(WaitingRoom.created_at, WaitingRoom.id) < tuple_(*query.cursor)
+        )
+    rooms = await db.execute(statement)
     return trpc(
         [
-            RoomQuery(
-                id=str(room.id),
-                title=room.title,
-                markdown=room.markdown,
-                desktopImageBlob=room.desktop_image_blob,
-                mobileImageBlob=room.mobile_image_blob,
-                createdAt=room.created_at,
-                updatedAt=room.updated_at,
-                opensAt=room.opens_at,
-                closesAt=room.closes_at,
-                eventChoices=room.event_choices,
-                published=room.published,
+            RoomSummary(
+                id=room[0],
+                title=room[1],
+                createdAt=room[2],
+                updatedAt=room[3],
+                opensAt=room[4],
+                closesAt=room[5],
+                eventChoices=room[6],
+                published=room[7],
+                registrantsCount=room[8],
+                cursor=RoomCursor(room[2], room[0]).encode(),
             )
-            for room in rooms_iterable
+            for room in rooms
         ]
     )
 
@@ -121,20 +275,32 @@ async def read_unique(
         id=str(room[0]),
         title=room[1],
         markdown=room[2],
-        desktopImageBlob=room[3],
-        mobileImageBlob=room[4],
+        desktopImageBlob=image_url(request, room[3]),
+        mobileImageBlob=image_url(request, room[4]),
         createdAt=room[5],
         updatedAt=room[6],
         opensAt=room[7],
         closesAt=room[8],
         published=room[9],
         eventChoices=room[10],
+        html=await render_markdown(room[2]),
     ).trpc
 
 
+class RoomStatsQuery(BaseModel, TrpcMixin):
+    id: uuid.UUID
+    consistent: bool = False
+    """
+    Recount the registrants (instead of reading the maintained counters)
+    """
+
+
 class RoomStats(BaseModel, TrpcMixin):
     id: str
     registrantsCount: int
+    turnstileSuccessCount: int = 0
+    turnstileFailureCount: int = 0
+    eventChoiceCounts: dict[str, int] = {}
 
 
 @router.get("/room.stats")
@@ -142,9 +308,16 @@ class RoomStats(BaseModel, TrpcMixin):
 async def stats(
     request: fastapi.Request,
     user: Annotated[User, Depends(authenticated_user)],
-    query: Annotated[RoomId, Depends(RoomId.from_trpc)],
+    query: Annotated[RoomStatsQuery, Depends(RoomStatsQuery.from_trpc)],
     session: Annotated[AsyncSession, Depends(db_session)],
+    counter: Annotated[RegistrationCounter, Depends(registration_counter)],
 ) -> TrpcResponse[RoomStats]:
+    """
+    Registrant counts of a room (registrants within the opening window)
+
+    Served from the counters maintained as registrations are written (see RegistrationCounter),
+    with consistent=true the registrants are counted, and the counters are corrected
+    """
     room = await session.execute(
         select(WaitingRoom.id)
         .where(WaitingRoom.id == str(query.id))
@@ -154,21 +327,101 @@ async def stats(
     if room is None:
         raise fastapi.HTTPException(status_code=401, detail="Invalid waiting room ID")
 
-    count: int = (
-        await session.execute(
-            select(sqlalchemy.func.count(DbRegistrant.id))
-            .select_from(DbRegistrant)
-            .join(WaitingRoom, DbRegistrant.waiting_room_id == WaitingRoom.id)
-            .where(WaitingRoom.id == str(query.id))
-            .where(WaitingRoom.owner_id == str(user.id))
-            .where(DbRegistrant.turnstile_timestamp > WaitingRoom.opens_at)
-            .where(DbRegistrant.turnstile_timestamp < WaitingRoom.closes_at)
-        )
-    ).scalar_one()
+    if query.consistent:
+        counts = await counter.reconcile(query.id)
+    else:
+        counts = await counter.read(session, query.id)
+
+    return room_stats(query.id, counts).trpc
 
+
+def room_stats(room_id: uuid.UUID, counts: RoomCounts) -> RoomStats:
+    event_choice_counts = collections.Counter()
+    for (event_choice, _success), count in counts.items():
+        event_choice_counts[event_choice] += count
     return RoomStats(
-        id=str(query.id),
-        registrantsCount=count,
+        id=str(room_id),
+        registrantsCount=sum(counts.values()),
+        turnstileSuccessCount=sum(c for (_, success), c in counts.items() if success),
+        turnstileFailureCount=sum(
+            c for (_, success), c in counts.items() if not success
+        ),
+        eventChoiceCounts=event_choice_counts,
+    )
+
+
+TIMELINE_MAX_BUCKET_SECONDS = 24 * 60 * 60
+
+
+class RoomTimelineQuery(BaseModel, TrpcMixin):
+    id: uuid.UUID
+    bucketSeconds: Annotated[int, Field(gt=0, le=TIMELINE_MAX_BUCKET_SECONDS)] = 1
+
+
+class TimelineBucket(BaseModel):
+    start: datetime.datetime
+    turnstileSuccessCount: int
+    turnstileFailureCount: int
+
+
+class RoomTimeline(BaseModel, TrpcMixin):
+    id: uuid.UUID
+    bucketSeconds: int
+    opensAt: datetime.datetime
+    closesAt: datetime.datetime
+    buckets: list[TimelineBucket]
+    """
+    Buckets with registrations (empty buckets are left out), in order
+    """
+    earlyCount: int
+    lateCount: int
+    botCount: int
+    """
+    Turnstile failures (within the opening window, or without a timestamp)
+    """
+    complete: bool
+    """
+    The room closed, the timeline won't change
+    """
+
+
+@router.get("/room.timeline")
+@requires("authenticated", status_code=401)
+async def timeline(
+    request: fastapi.Request,
+    user: Annotated[User, Depends(authenticated_user)],
+    query: Annotated[RoomTimelineQuery, Depends(RoomTimelineQuery.from_trpc)],
+    session: Annotated[AsyncSession, Depends(db_session)],
+) -> TrpcResponse[RoomTimeline]:
+    """
+    Registrations per bucketSeconds after the room opened, and the attempts outside the opening window
+
+    Aggregated in the database, and cached (see room_timeline)
+    """
+    room = await fetch_waiting_room(session, str(query.id), str(user.id))
+    if room is None or room.owner_id != user.id:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid waiting room ID")
+
+    result = await room_timeline(session, room, query.bucketSeconds)
+    return RoomTimeline(
+        id=room.id,
+        bucketSeconds=query.bucketSeconds,
+        opensAt=room.opens_at,
+        closesAt=room.closes_at,
+        buckets=[
+            TimelineBucket(
+                start=room.opens_at
+                + datetime.timedelta(seconds=number * query.bucketSeconds),
+                turnstileSuccessCount=successes,
+                turnstileFailureCount=failures,
+            )
+            for number, (successes, failures) in sorted(result.buckets.items())
+        ],
+        earlyCount=result.early_count,
+        lateCount=result.late_count,
+        botCount=result.untimed_failures
+        + sum(failures for _, failures in result.buckets.values()),
+        complete=result.complete,
     ).trpc
 
 
@@ -189,9 +442,57 @@ class Registrant(BaseModel):
     updatedAt: datetime.datetime
 
 
+class RegistrantCursor(NamedTuple):
+    """
+    Position of a registrant in the (createdAt, id) order, opaque to clients
+
+    >>> cursor = RegistrantCursor(
+    ...     datetime.datetime(2024, 10, 28, 12, 0),
+    ...     uuid.UUID("8b9228ce-3348-40c9-9d20-3992c5c5141f"),
+    ... )
+    >>> RegistrantCursor.decode(cursor.encode()) == cursor
+    True
+    """
+
+    created_at: datetime.datetime
+    id: uuid.UUID
+
+    def encode(self) -> str:
+        return _encode_cursor(self.created_at, self.id)
+
+    @classmethod
+    def decode(cls, cursor: str) -> "RegistrantCursor":
+        """
+        :raises ValueError: If the cursor is invalid
+        """
+        return cls(*_decode_cursor(cursor))
+
+
+REGISTRANTS_MAX_PAGE_SIZE = 1000
+
+
+class RoomRegistrantsQuery(BaseModel, TrpcMixin):
+    id: uuid.UUID
+    cursor: Annotated[
+        RegistrantCursor | None, BeforeValidator(_cursor_validator(RegistrantCursor))
+    ] = None
+    """
+    Only return registrants after this cursor (a previous response's nextCursor)
+    """
+    limit: Annotated[int | None, Field(gt=0, le=REGISTRANTS_MAX_PAGE_SIZE)] = None
+    """
+    Maximum number of registrants to return
+    """
+
+
 class RoomRegistrants(BaseModel, TrpcMixin):
     id: uuid.UUID
     registrants: list[Registrant]
+    nextCursor: str | None = None
+    """
+    Pass as cursor to get the next page, or the registrants that arrived since this response
+    """
+    hasMore: bool = False
 
 
 @router.get("/room.registrants")
@@ -199,21 +500,77 @@ class RoomRegistrants(BaseModel, TrpcMixin):
 async def registrants(
     request: fastapi.Request,
     user: Annotated[User, Depends(authenticated_user)],
-    query: Annotated[RoomId, Depends(RoomId.from_trpc)],
+    query: Annotated[RoomRegistrantsQuery, Depends(RoomRegistrantsQuery.from_trpc)],
     session: Annotated[AsyncSession, Depends(db_session)],
 ) -> TrpcResponse[RoomRegistrants]:
-    result = await session.scalars(
+    """
+    Registrants of a room, in the order they were written ((createdAt, id))
+
+    Without a cursor or limit, every registrant is returned (in one response).
+    With them, each page is a range scan of the (waitingRoomId, createdAt) index,
+    and polling with the last nextCursor only reads registrants that arrived since.
+    Registrants are only returned REGISTRANTS_SETTLE_SECONDS after they were written:
+    createdAt is set when the writing transaction starts, the lag lets every transaction
+    that started before the cursor commit, so polling never steps over a registrant.
+    Registrants validated after the fact (accepted while Cloudflare was down) keep their place,
+    a full refresh picks up their new turnstile outcome.
+    """
+    return (
+        await read_registrants(
+            session, query.id, query.cursor, query.limit, owner_id=user.id
+        )
+    ).trpc
+
+
+async def read_registrants(
+    session: AsyncSession,
+    room_id: uuid.UUID,
+    cursor: RegistrantCursor | None = None,
+    limit: int | None = None,
+    owner_id: uuid.UUID | None = None,
+    settle: float = CONFIG.registrants_settle_seconds,
+) -> RoomRegistrants:
+    """
+    Registrants of a room after the cursor (all of them without a cursor or limit)
+
+    :param owner_id: Only return registrants if the room is owned by this user
+    :param settle: Seconds a registrant can take to be committed after its createdAt,
+        more recent registrants are left for the next poll
+    """
+    # createdAt is stored as naive UTC
+    written_before = datetime.datetime.now(datetime.UTC).replace(
+        tzinfo=None
+    ) - datetime.timedelta(seconds=settle)
+    statement = (
         select(DbRegistrant)
         .join(WaitingRoom, WaitingRoom.id == DbRegistrant.waiting_room_id)
-        .where(WaitingRoom.id == query.id)
-        .where(WaitingRoom.owner_id == user.id)
+        .where(WaitingRoom.id == room_id)
         .where(DbRegistrant.turnstile_timestamp > WaitingRoom.opens_at)
         .where(DbRegistrant.turnstile_timestamp < WaitingRoom.closes_at)
-        .order_by(DbRegistrant.turnstile_timestamp.asc().nulls_last())
+        .where(DbRegistrant.created_at < written_before)
+        .order_by(DbRegistrant.created_at.asc(), DbRegistrant.id.asc())
     )
+    if owner_id is not None:
+        statement = statement.where(WaitingRoom.owner_id == owner_id)
+    paginated = cursor is not None or limit is not None
+    limit = limit or REGISTRANTS_MAX_PAGE_SIZE
+    if cursor is not None:
+        statement = statement.where(
+            tuple_(DbRegistrant.created_at, DbRegistrant.id) > tuple_(*cursor)
+        )
+    if paginated:
+        # One extra row tells whether there is a next page
+        statement = statement.limit(limit + 1)
+    result = (await session.scalars(statement)).all()
+
+    has_more = paginated and len(result) > limit
+    if has_more:
+        result = result[:limit]
+    if result:
+        cursor = RegistrantCursor(result[-1].created_at, result[-1].id)
 
     return RoomRegistrants(
-        id=query.id,
+        id=room_id,
         registrants=[
             Registrant(
                 id=registrant.id,
@@ -231,7 +588,129 @@ async def registrants(
             )
             for registrant in result
         ],
-    ).trpc
+        nextCursor=cursor and cursor.encode(),
+        hasMore=has_more,
+    )
+
+
+EXPORT_COLUMNS = {
+    "id": DbRegistrant.id,
+    "legalName": DbRegistrant.legal_name,
+    "email": DbRegistrant.email,
+    "phoneNumber": DbRegistrant.phone_number,
+    "idNumber": DbRegistrant.id_number,
+    "idType": DbRegistrant.id_type,
+    "eventChoice": DbRegistrant.event_choice,
+    "turnstileSuccess": DbRegistrant.turnstile_success,
+    "turnstileTimestamp": DbRegistrant.turnstile_timestamp,
+    "turnstileFailReason": DbRegistrant.turnstile_fail_reason,
+    "createdAt": DbRegistrant.created_at,
+    "updatedAt": DbRegistrant.updated_at,
+}
+"""
+Exported registrant fields (same names as Registrant) and their columns
+"""
+
+EXPORT_BATCH_SIZE = 1000
+"""
+Rows fetched from the database cursor (and written to the response) at once
+"""
+
+
+@router.get("/room.registrantsExport")
+@requires("authenticated", status_code=401)
+async def registrants_export(
+    request: fastapi.Request,
+    user: Annotated[User, Depends(authenticated_user)],
+    query: Annotated[RoomId, Depends(RoomId.from_trpc)],
+    session: Annotated[AsyncSession, Depends(db_session)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(create_session_maker)
+    ],
+    format: Literal["ndjson", "csv"] = "ndjson",
+) -> StreamingResponse:
+    """
+    Stream the registrants of a room as NDJSON (one Registrant per line) or CSV
+
+    Rows are read through a server-side cursor and written as they arrive,
+    so memory stays constant regardless of the room's size (CompressionMiddleware compresses the stream as it goes).
+    Exports of closed (and settled) rooms don't change anymore, they carry an ETag and are compressed once.
+    """
+    room = (
+        await session.execute(
+            select(WaitingRoom.closes_at, WaitingRoom.updated_at)
+            .where(WaitingRoom.id == str(query.id))
+            .where(WaitingRoom.owner_id == str(user.id))
+        )
+    ).one_or_none()
+    if room is None:
+        raise fastapi.HTTPException(status_code=401, detail="Invalid waiting room ID")
+
+    statement = (
+        select(*EXPORT_COLUMNS.values())
+        .join(WaitingRoom, WaitingRoom.id == DbRegistrant.waiting_room_id)
+        .where(WaitingRoom.id == query.id)
+        .where(DbRegistrant.turnstile_timestamp > WaitingRoom.opens_at)
+        .where(DbRegistrant.turnstile_timestamp < WaitingRoom.closes_at)
+        .order_by(
+            DbRegistrant.turnstile_timestamp.asc().nulls_last(),
+            DbRegistrant.id.asc(),
+        )
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if format == "csv":
+        media_type, encode = "text/csv", _csv_rows
+    else:
+        media_type, encode = "application/x-ndjson", _ndjson_rows
+    headers = {
+        "Content-Disposition": f'attachment; filename="registrants-{query.id}.{format}"'
+    }
+    settle = datetime.timedelta(seconds=CONFIG.timeline_settle_seconds)
+    closes_at = room.closes_at.replace(tzinfo=datetime.UTC)
+    if datetime.datetime.now(datetime.UTC) > closes_at + settle:
+        headers["ETag"] = f'"{query.id}-{room.updated_at.timestamp()}-{format}"'
+    return StreamingResponse(
+        # The request's session is closed before the body is sent, the stream uses its own
+        _stream_rows(session_maker, statement, encode, header=format == "csv"),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+async def _stream_rows(
+    session_maker: async_sessionmaker[AsyncSession],
+    statement: Select,
+    encode: Callable[[Sequence[Sequence]], bytes],
+    header: bool,
+) -> AsyncIterator[bytes]:
+    if header:
+        yield encode([list(EXPORT_COLUMNS)])
+    async with session_maker() as session:
+        result = await session.stream(statement)
+        async for rows in result.partitions():
+            yield encode(rows)
+
+
+def _ndjson_rows(rows: Sequence[Row]) -> bytes:
+    return b"".join(
+        orjson.dumps(dict(zip(EXPORT_COLUMNS, row)), option=orjson.OPT_APPEND_NEWLINE)
+        for row in rows
+    )
+
+
+def _csv_rows(rows: Sequence[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _csv_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
 
 
 class RoomCreateRequest(BaseModel):
@@ -249,6 +728,8 @@ async def create(
     new_room: RoomCreateRequest,
     session: Annotated[AsyncSession, Depends(db_session)],
 ) -> TrpcResponse[RoomQuery]:
+    # Render once per write (room reads serve the cached HTML)
+    html = await render_markdown(new_room.markdown)
     async with session.begin():
         statement = (
             insert(WaitingRoom)
@@ -261,6 +742,8 @@ async def create(
                 published=False,
             )
             .returning(WaitingRoom)
+            # Heavy columns are deferred, the response needs them
+            .options(undefer("*"))
         )
         result = (await session.execute(statement)).scalar_one()
         return RoomQuery(
@@ -273,6 +756,7 @@ async def create(
             closesAt=result.closes_at,
             published=result.published,
             eventChoices="",
+            html=html,
         ).trpc
 
 
@@ -283,8 +767,19 @@ async def room_update(
     user: Annotated[User, Depends(authenticated_user)],
     room: RoomMutation,
     session: Annotated[AsyncSession, Depends(db_session)],
+    invalidation: Annotated[InvalidationChannel, Depends(room_invalidation)],
+    counter: Annotated[RegistrationCounter, Depends(registration_counter)],
 ) -> TrpcResponse[RoomQuery]:
+    html = await render_markdown(room.markdown)
     async with session.begin():
+        previous_window = (
+            await session.execute(
+                select(WaitingRoom.opens_at, WaitingRoom.closes_at)
+                .where(WaitingRoom.id == room.id)
+                .where(WaitingRoom.owner_id == user.id)
+                .with_for_update()
+            )
+        ).one_or_none()
         statement = (
             update(WaitingRoom)
             .where(WaitingRoom.id == room.id)
@@ -292,28 +787,37 @@ async def room_update(
             .values(
                 title=room.title,
                 markdown=room.markdown,
-                desktop_image_blob=room.desktopImageBlob,
-                mobile_image_blob=room.mobileImageBlob,
+                desktop_image_blob=await store_image(session, room.desktopImageBlob),
+                mobile_image_blob=await store_image(session, room.mobileImageBlob),
                 opens_at=room.opensAt,
                 closes_at=room.closesAt,
                 event_choices=room.eventChoices,
             )
             .returning(WaitingRoom)
+            # Heavy columns are deferred, the response needs them
+            .options(undefer("*"))
         )
         result = (await session.execute(statement)).scalar_one()
-        return RoomQuery(
+        updated_room = RoomQuery(
             id=str(result.id),
             title=result.title,
             markdown=result.markdown,
-            desktopImageBlob=result.desktop_image_blob,
-            mobileImageBlob=result.mobile_image_blob,
+            desktopImageBlob=image_url(request, result.desktop_image_blob),
+            mobileImageBlob=image_url(request, result.mobile_image_blob),
             createdAt=result.created_at,
             updatedAt=result.updated_at,
             opensAt=result.opens_at,
             closesAt=result.closes_at,
             published=result.published,
             eventChoices=result.event_choices,
-        ).trpc
+            html=html,
+        )
+
+    await invalidation.publish(updated_room.id, updated_room.updatedAt)
+    if tuple(previous_window) != (updated_room.opensAt, updated_room.closesAt):
+        # The registrants that count changed with the opening window (a full recount, only then)
+        await counter.reconcile(updated_room.id)
+    return updated_room.trpc
 
 
 @router.post("/room.publish")
@@ -323,7 +827,14 @@ async def publish(
     user: Annotated[User, Depends(authenticated_user)],
     room: RoomPublishRequest,
     session: Annotated[AsyncSession, Depends(db_session)],
+    invalidation: Annotated[InvalidationChannel, Depends(room_invalidation)],
+    deployer: Annotated[DeployScheduler, Depends(deploy_scheduler)],
 ) -> TrpcResponse[RoomQuery]:
+    if CONFIG.production and not deployer.configured:
+        raise fastapi.HTTPException(
+            status_code=500,
+            detail="Missing GitHub config, cannot trigger deployment",
+        )
     async with session.begin():
         statement = (
             update(WaitingRoom)
@@ -331,70 +842,39 @@ async def publish(
             .where(WaitingRoom.owner_id == user.id)
             .values(published=room.publish)
             .returning(WaitingRoom)
+            # Heavy columns are deferred, the response needs them
+            .options(undefer("*"))
         )
         result = (await session.execute(statement)).scalar_one()
         session.expunge(result)
-
-    # TODO: Limit deploy hook rate
-    if CONFIG.production:
-        await trigger_deployment(request)
+        if CONFIG.production:
+            # Re-render the published rooms (debounced, dispatched in the background by one worker)
+            await deployer.request(session)
+    await invalidation.publish(result.id, result.updated_at)
 
     return RoomQuery(
         id=str(result.id),
         title=result.title,
         markdown=result.markdown,
-        desktopImageBlob=result.desktop_image_blob,
-        mobileImageBlob=result.mobile_image_blob,
+        desktopImageBlob=image_url(request, result.desktop_image_blob),
+        mobileImageBlob=image_url(request, result.mobile_image_blob),
         createdAt=result.created_at,
         updatedAt=result.updated_at,
         opensAt=result.opens_at,
         closesAt=result.closes_at,
         published=result.published,
         eventChoices=result.event_choices,
+        html=await render_markdown(result.markdown),
     ).trpc
 
 
-async def trigger_deployment(request: fastapi.Request):
+@router.get("/room.deployStatus")
+@requires("authenticated", status_code=401)
+async def deploy_status(
+    request: fastapi.Request,
+    deployer: Annotated[DeployScheduler, Depends(deploy_scheduler)],
+) -> TrpcResponse[DeployStatus]:
     """
-    Trigger a deployment of the frontend, this will force the builder to "pre-render" all published waiting rooms
-
-    We use GitHubs API to re-trigger the CI workflow
-
-    https://docs.github.com/en/rest/actions/workflows?apiVersion=2022-11-28#create-a-workflow-dispatch-event
-
-    Equivalent cURL command:
-
-    curl -L \
-      -X POST \
-      -H "Accept: application/vnd.github+json" \
-      -H "Authorization: Bearer <YOUR-TOKEN>"\
-      -H "X-GitHub-Api-Version: 2022-11-28" \
-      https://api.github.com/repos/OWNER/REPO/actions/workflows/WORKFLOW_ID/dispatches \
-      -d '{"ref":"topic-branch","inputs":{"name":"Mona the Octocat","home":"San Francisco, CA"}}'
-
+    Whether a website deployment (re-rendering published rooms) is pending, and how the last dispatch went
     """
-    if (
-        not CONFIG.github_token
-        or not CONFIG.github_repo
-        or not CONFIG.github_workflow_id
-    ):
-        logger.error("Missing GitHub config, skipping deployment trigger")
-        raise fastapi.HTTPException(
-            status_code=500,
-            detail="Missing GitHub config, cannot trigger deployment",
-        )
-    logger.info("Triggering deployment")
-    url = f"/repos/{CONFIG.github_repo}/actions/workflows/{CONFIG.github_workflow_id}/dispatches"
-    client = cast(httpx.AsyncClient, request.state.gh_http_client)
-    response = await client.post(
-        url=url,
-        headers={
-            "Accept": "application/vnd.github+json",
-            "Authorization": f"Bearer {CONFIG.github_token and CONFIG.github_token.get_secret_value()}",
-            "X-GitHub-Api-Version": "2022-11-28",
-        },
-        json={
-            "ref": "main",
-        },
-    )
-    logger.info(f"Triggered deployment: {response.status_code} {response.text}")
+    return (await deployer.status()).trpc
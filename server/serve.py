@@ -0,0 +1,85 @@
+"""
+Production server: gunicorn managing uvicorn worker processes (uvloop, httptools)
+
+A single uvicorn process serves an opening stampede on one core. gunicorn runs one worker process per available
+CPU (or WEB_CONCURRENCY), imports the app once before forking them (preload), restarts workers that die,
+and can gracefully replace workers after SERVER_MAX_REQUESTS requests (disabled by default).
+Every worker has its own lifespan (database engine, batchers, caches), the database connection budget
+(DB_POOL_SIZE, DB_MAX_OVERFLOW) is split between them.
+
+Usage (from the repository root):
+
+    python -m server.serve
+"""
+
+import math
+import os
+from pathlib import Path
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may run on: its CPU affinity, capped by the container's CPU quota (cgroup v2)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on macOS
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .main import app
+
+        return app
+
+
+def main() -> None:
+    workers = int(os.environ.get("WEB_CONCURRENCY", "0")) or available_cpus()
+    # Before the config is loaded, every worker sizes its database pool from it
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    from .config import CONFIG
+
+    Server(
+        {
+            "bind": f"0.0.0.0:{os.environ.get('PORT', '8000')}",
+            "workers": workers,
+            "worker_class": UvloopWorker,
+            "preload_app": True,
+            "max_requests": CONFIG.server_max_requests,
+            # Workers share the load evenly, a small jitter would replace them together
+            "max_requests_jitter": CONFIG.server_max_requests // 2,
+            "graceful_timeout": CONFIG.server_graceful_timeout,
+            # Workers heartbeat from their event loop, a worker blocked this long is restarted
+            "timeout": 120,
+            # uvicorn's default (gunicorn's is 2 seconds)
+            "keepalive": 5,
+        }
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Coalesce concurrent calls with the same key into a single call
+
+Caches don't help with a miss storm: when an entry is missing (first request, or right after it expired)
+every concurrent caller misses together and runs the same query.
+With single-flight, the first caller runs it and the others await its result.
+"""
+
+import asyncio
+import functools
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from cachetools.keys import hashkey
+
+T = TypeVar("T")
+
+
+class _Abandoned(Exception):
+    """
+    The caller running the call was cancelled before it finished
+    """
+
+
+class SingleFlight:
+    """
+    Track in-flight calls by key
+
+    >>> async def example():
+    ...     group = SingleFlight()
+    ...     async def query():
+    ...         await asyncio.sleep(0.01)
+    ...         return "room"
+    ...     results = await asyncio.gather(*(group.do("key", query) for _ in range(10)))
+    ...     return results.count("room"), group.calls, group.shared
+    >>> asyncio.run(example())
+    (10, 1, 9)
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        """
+        Number of calls actually made
+        """
+        self.shared = 0
+        """
+        Number of callers that awaited a call made by someone else
+        """
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call fn, unless a call with the same key is in flight, then await its outcome
+
+        Exceptions are shared like results.
+        If the caller making the call is cancelled, one of the waiting callers makes the call instead.
+        """
+        while (flight := self._flights.get(key)) is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(flight)
+            except _Abandoned:
+                continue
+
+        flight = asyncio.get_running_loop().create_future()
+        # Don't warn about exceptions nobody else was waiting for
+        flight.add_done_callback(lambda f: f.exception())
+        self._flights[key] = flight
+        self.calls += 1
+        try:
+            result = await fn()
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        except BaseException:
+            flight.set_exception(_Abandoned())
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+
+def singleflight(key: Callable[..., Hashable] = hashkey):
+    """
+    Decorator to coalesce concurrent calls of a coroutine function
+
+    Cached functions are coalesced already (see server.cache.decorators.cached), this is for uncached ones::
+
+        @singleflight(key=methodkey)
+        async def fetch(session, id): ...
+
+    :param key: Computes the key of a call from its arguments (same as the cache's key)
+    """
+
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        group = SingleFlight()
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> T:
+            return await group.do(key(*args, **kwargs), lambda: fn(*args, **kwargs))
+
+        wrapper.singleflight = group
+        return wrapper
+
+    return decorator
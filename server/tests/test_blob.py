@@ -0,0 +1,40 @@
+import hashlib
+
+import fastapi
+import pytest
+
+from ..db.blob import blob_cache, store_image
+from ..models import ImageBlob
+
+pytestmark = pytest.mark.anyio
+
+DATA = b"\x89PNG image"
+HASH = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+async def stored(session_maker):
+    async with session_maker.begin() as session:
+        session.add(
+            ImageBlob(hash=HASH, content_type="image/png", size=len(DATA), data=DATA)
+        )
+    yield HASH
+    blob_cache.clear()
+
+
+@pytest.mark.parametrize(
+    "image", [HASH, f"https://api.example.com/blob/{HASH}", f"/blob/{HASH}"]
+)
+async def test_stored_images_are_kept(session_maker, stored, image):
+    async with session_maker() as session:
+        assert await store_image(session, image) == stored
+
+
+@pytest.mark.parametrize(
+    "image", [HASH, f"https://api.example.com/blob/{HASH}", f"/blob/{HASH}"]
+)
+async def test_unknown_images_are_rejected(session_maker, image):
+    async with session_maker() as session:
+        with pytest.raises(fastapi.HTTPException) as error:
+            await store_image(session, image)
+    assert error.value.status_code == 422
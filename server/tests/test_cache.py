@@ -0,0 +1,133 @@
+import asyncio
+import time
+import uuid
+
+import fakeredis
+import pytest
+
+from ..cache.local import MISSING, Cache, caches
+from ..cache.shared import SharedCache
+from ..circuit_breaker import CircuitBreaker, CircuitState
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+async def shared(server):
+    """
+    The shared cache of every cache, in a fake Redis server
+    """
+    async with SharedCache(
+        fakeredis.FakeAsyncRedis(server=server),
+        b"secret",
+        breaker=CircuitBreaker("shared-cache", failure_threshold=2, reset_timeout=60),
+    ) as shared:
+        caches.shared = shared
+        yield shared
+    caches.shared = None
+
+
+def shareable(ttl: float | None = 60) -> Cache:
+    # Unique names, caches are registered (and shared) by name
+    return Cache(f"test-{uuid.uuid4()}", maxsize=10, ttl=ttl, value_type=int)
+
+
+async def test_shared_entries_are_shared_between_processes(shared):
+    writer = shareable()
+    await writer.store("a", 1)
+    # Another worker, with its own local cache of the same name
+    reader = Cache(writer.name, maxsize=10, ttl=60, value_type=int)
+    assert await reader.lookup("a") == 1
+    assert reader.stats.shared_hits == 1
+
+
+async def test_entries_signed_with_another_secret_are_misses(server, shared):
+    cache = shareable()
+    forger = SharedCache(fakeredis.FakeAsyncRedis(server=server), b"not the secret")
+    await forger.set(cache.name, "a", b"1", ttl=60)
+    assert await shared.get(cache.name, "a") is None
+    assert await cache.lookup("a") is MISSING
+    assert cache.stats.shared_misses == 1
+
+
+async def test_entries_moved_to_another_key_are_misses(server, shared):
+    cache = shareable()
+    await cache.store("a", 1)
+    client = fakeredis.FakeAsyncRedis(server=server)
+    await client.set(
+        shared.key(cache.name, "b"), await client.get(shared.key(cache.name, "a"))
+    )
+    assert await shared.get(cache.name, "b") is None
+
+
+async def test_expired_entries_are_misses(server, shared):
+    cache = shareable()
+    key = shared.key(cache.name, "a")
+    # Kept by the server (e.g. its clock is behind), the signed expiry has passed
+    expired = int((time.time() - 1) * 1000)
+    await fakeredis.FakeAsyncRedis(server=server).set(
+        key, shared.sign(key, b"1", expired)
+    )
+    assert await shared.get(cache.name, "a") is None
+    assert await cache.lookup("a") is MISSING
+
+
+async def test_entries_expire_with_their_cache_ttl(shared):
+    cache = shareable(ttl=0.05)
+    await cache.store("a", 1)
+    assert await shared.get(cache.name, "a") == b"1"
+    await asyncio.sleep(0.1)
+    assert await shared.get(cache.name, "a") is None
+
+
+async def test_failing_server_opens_the_breaker_and_loads_fall_back(server, shared):
+    cache = shareable()
+    server.connected = False
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        return loads
+
+    assert await cache.fetch("a", load) == 1
+    assert await cache.fetch("b", load) == 2
+    assert shared._breaker.state is CircuitState.OPEN
+
+    # Skipped while open, even once the server is back
+    server.connected = True
+    assert await cache.fetch("c", load) == 3
+    assert await shared.get(cache.name, "c") is None
+    assert cache.get("a") == 1
+
+
+async def test_load_invalidated_meanwhile_is_not_cached(shared):
+    cache = shareable()
+
+    async def load():
+        # Another request updates the value (and invalidates it) while this one loads the old one
+        cache.invalidate("a")
+        return 1
+
+    assert await cache.load("a", load) == 1
+    assert cache.get("a") is None
+    await asyncio.gather(*cache._deletions.values())
+    assert await shared.get(cache.name, "a") is None
+
+    async def reload():
+        return 2
+
+    assert await cache.fetch("a", reload) == 2
+    assert cache.get("a") == 2
+
+
+async def test_claims_are_shared(shared):
+    cache = shareable()
+    assert await cache.claim("a", 1) == 1
+    other = Cache(cache.name, maxsize=10, ttl=60, value_type=int)
+    assert await other.claim("a", 2) == 1
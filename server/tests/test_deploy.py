@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+from ..deploy import DeployScheduler
+from ..models import Deployment
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def dispatches():
+    return []
+
+
+@pytest.fixture
+def scheduler_for(session_maker, dispatches):
+    def scheduler_for(
+        status_code: int, during_dispatch=None, **kwargs
+    ) -> DeployScheduler:
+        async def dispatch(request: httpx.Request) -> httpx.Response:
+            dispatches.append(request)
+            if during_dispatch is not None:
+                await during_dispatch(session_maker)
+            return httpx.Response(status_code)
+
+        return DeployScheduler(
+            httpx.AsyncClient(
+                base_url="https://api.github.com",
+                transport=httpx.MockTransport(dispatch),
+            ),
+            session_maker,
+            "owner/repo",
+            "deploy.yaml",
+            "token",
+            debounce=0,
+            **kwargs,
+        )
+
+    return scheduler_for
+
+
+async def request(session_maker) -> None:
+    """
+    A deployment request (DeployScheduler.request upserts, PostgreSQL only)
+    """
+    async with session_maker.begin() as session:
+        row = await session.get(Deployment, DeployScheduler.ROW_ID)
+        if row is None:
+            session.add(
+                Deployment(
+                    id=DeployScheduler.ROW_ID,
+                    requests=1,
+                    dispatched_requests=0,
+                    requested_at=datetime.now(UTC) - timedelta(seconds=1),
+                    failed_attempts=0,
+                    dispatches=0,
+                )
+            )
+        else:
+            await session.execute(
+                update(Deployment)
+                .where(Deployment.id == DeployScheduler.ROW_ID)
+                .values(requests=Deployment.requests + 1)
+            )
+
+
+async def deployment(session_maker) -> Deployment:
+    async with session_maker() as session:
+        return (await session.execute(select(Deployment))).scalar_one()
+
+
+async def test_requests_during_a_failed_attempt_wait_for_the_backoff(
+    session_maker, scheduler_for, dispatches
+):
+    scheduler = scheduler_for(500, backoff=60, during_dispatch=request)
+    await request(session_maker)
+    await scheduler.tick()
+    await scheduler.tick()
+    assert len(dispatches) == 1
+    row = await deployment(session_maker)
+    assert row.failed_attempts == 1
+    assert row.requests == 2
+    assert row.dispatched_requests == 0
+    assert row.lease_expires_at is None
+    assert row.next_attempt_at is not None
+
+
+async def test_attempts_are_capped(session_maker, scheduler_for, dispatches):
+    scheduler = scheduler_for(500, backoff=0.01, max_backoff=0.01, max_attempts=3)
+    await request(session_maker)
+    for _ in range(5):
+        await scheduler.tick()
+        await asyncio.sleep(0.02)
+    assert len(dispatches) == 3
+    row = await deployment(session_maker)
+    assert row.requests == row.dispatched_requests == 1
+    assert row.failed_attempts == 3
+
+
+async def test_requests_after_giving_up_start_over(
+    session_maker, scheduler_for, dispatches
+):
+    scheduler = scheduler_for(
+        500, backoff=0.01, max_backoff=0.01, max_attempts=2, during_dispatch=request
+    )
+    await request(session_maker)
+    for _ in range(2):
+        await scheduler.tick()
+        await asyncio.sleep(0.02)
+    row = await deployment(session_maker)
+    assert row.dispatched_requests == 2
+    assert row.requests == 3
+    assert row.failed_attempts == 0
+
+
+async def test_success_dispatches_the_requests(
+    session_maker, scheduler_for, dispatches
+):
+    await request(session_maker)
+    await request(session_maker)
+    await scheduler_for(204).tick()
+    await scheduler_for(204).tick()
+    assert len(dispatches) == 1
+    row = await deployment(session_maker)
+    assert row.requests == row.dispatched_requests == 2
+    assert row.dispatches == 1
+    assert row.last_error is None
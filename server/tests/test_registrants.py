@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from ..models import IdType, Registrant, WaitingRoom
+from ..routes.room import RegistrantCursor, read_registrants
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime.now(UTC).replace(tzinfo=None)
+
+
+async def add_room(session_maker) -> uuid.UUID:
+    room_id = uuid.uuid4()
+    async with session_maker.begin() as session:
+        session.add(
+            WaitingRoom(
+                id=room_id,
+                opens_at=NOW - timedelta(hours=1),
+                closes_at=NOW + timedelta(hours=1),
+                published=True,
+                markdown="",
+                title="Room",
+                event_choices="",
+                owner_id=uuid.uuid4(),
+            )
+        )
+    return room_id
+
+
+async def add_registrant(
+    session_maker, room_id: uuid.UUID, created_at: datetime, solved_at: datetime
+) -> uuid.UUID:
+    registrant_id = uuid.uuid4()
+    async with session_maker.begin() as session:
+        session.add(
+            Registrant(
+                id=registrant_id,
+                created_at=created_at,
+                legal_name="Bob",
+                email="bob@example.com",
+                id_number="1",
+                id_type=IdType.PASSPORT,
+                phone_number="1",
+                event_choice="",
+                turnstile_success=True,
+                turnstile_timestamp=solved_at.replace(tzinfo=UTC),
+                waiting_room_id=room_id,
+            )
+        )
+    return registrant_id
+
+
+async def test_since_cursor_returns_registrants_written_after_it(session_maker):
+    room_id = await add_room(session_maker)
+    first = await add_registrant(
+        session_maker,
+        room_id,
+        created_at=NOW - timedelta(minutes=2),
+        solved_at=NOW - timedelta(minutes=3),
+    )
+    async with session_maker() as session:
+        page = await read_registrants(session, room_id, limit=10)
+    assert [registrant.id for registrant in page.registrants] == [first]
+
+    # Solved the challenge before the first registrant, but written after the cursor was handed out
+    late = await add_registrant(
+        session_maker,
+        room_id,
+        created_at=NOW - timedelta(minutes=1),
+        solved_at=NOW - timedelta(minutes=10),
+    )
+    async with session_maker() as session:
+        page = await read_registrants(
+            session, room_id, RegistrantCursor.decode(page.nextCursor), 10
+        )
+    assert [registrant.id for registrant in page.registrants] == [late]
+
+
+async def test_since_cursor_waits_for_registrants_to_settle(session_maker):
+    room_id = await add_room(session_maker)
+    settled = await add_registrant(
+        session_maker,
+        room_id,
+        created_at=NOW - timedelta(minutes=1),
+        solved_at=NOW - timedelta(minutes=1),
+    )
+    # Its transaction may still be committing next to earlier ones, it is left for the next poll
+    recent = await add_registrant(
+        session_maker, room_id, created_at=NOW, solved_at=NOW - timedelta(minutes=5)
+    )
+    async with session_maker() as session:
+        page = await read_registrants(session, room_id, limit=10, settle=30)
+    assert [registrant.id for registrant in page.registrants] == [settled]
+
+    async with session_maker() as session:
+        page = await read_registrants(
+            session, room_id, RegistrantCursor.decode(page.nextCursor), 10, settle=0
+        )
+    assert [registrant.id for registrant in page.registrants] == [recent]
@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from ..db.waiting_room import RoomPrewarmer, pinned_rooms
+from ..models import WaitingRoom
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingPrewarmer(RoomPrewarmer):
+    """
+    Counts the pool fills instead of opening connections
+    """
+
+    fills = 0
+
+    async def _fill_pool(self) -> None:
+        self.fills += 1
+
+
+async def add_room(session_maker, opens_in: timedelta) -> uuid.UUID:
+    room_id = uuid.uuid4()
+    now = datetime.now(UTC).replace(tzinfo=None)
+    async with session_maker.begin() as session:
+        session.add(
+            WaitingRoom(
+                id=room_id,
+                opens_at=now + opens_in,
+                closes_at=now + opens_in + timedelta(hours=1),
+                published=True,
+                markdown="",
+                title="Room",
+                event_choices="",
+                owner_id=uuid.uuid4(),
+            )
+        )
+    return room_id
+
+
+@pytest.fixture
+def prewarmer(session_maker):
+    yield RecordingPrewarmer(engine=None, session_maker=session_maker, interval=30)
+    pinned_rooms.replace([])
+
+
+async def test_pool_is_filled_for_a_room_opening_while_another_is_open(
+    session_maker, prewarmer
+):
+    await add_room(session_maker, opens_in=timedelta(minutes=-5))
+    await prewarmer.tick()
+    assert prewarmer.fills == 0
+
+    await add_room(session_maker, opens_in=timedelta(seconds=45))
+    await prewarmer.tick()
+    assert prewarmer.fills == 1
+
+    # Once per room
+    await prewarmer.tick()
+    assert prewarmer.fills == 1
+
+
+async def test_pool_is_not_filled_for_rooms_opening_later(session_maker, prewarmer):
+    await add_room(session_maker, opens_in=timedelta(minutes=5))
+    await prewarmer.tick()
+    assert prewarmer.fills == 0
@@ -1,9 +1,203 @@
+import hashlib
+import uuid
+from datetime import datetime
+from typing import cast
+
 import fastapi
+import httpx
 
+from .cache.local import MISSING, Cache
+from .circuit_breaker import CircuitBreaker
+from .config import CONFIG
 from .constants import PLAY_NICE_RESPONSE
 from .types import TurnstileOutcome
 from .logger import logger
 
+TOKEN_LIFETIME_SECONDS = 300
+"""
+Cloudflare only accepts a token within 5 minutes of the challenge
+"""
+
+
+class TurnstileOutcomeCache:
+    """
+    Remember the outcome of recently validated tokens, to replay it when a client retries
+
+    Cloudflare only accepts a token once, a client retrying after a network blip
+    (resending the same token) would get timeout-or-duplicate and be recorded as a bot.
+    Replayed outcomes are marked with a "replayed" error code (visible to organizers).
+
+    A replayed outcome must not register anyone else: registrations claim their token (see claim),
+    binding it to their payload and registrant ID. A retry of the same registration gets the original ID back
+    (and rewrites the same row), any other payload is rejected as a duplicate.
+
+    Tokens are keyed by their SHA-256 digest, the tokens themselves are not kept in memory.
+    Outcomes and claims are kept in the "turnstile_outcomes" and "turnstile_claims" caches,
+    shared by the workers (see SharedCache): a retry is often served by another worker than the first attempt.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 120):
+        """
+        :param maxsize: Maximum number of remembered outcomes (and claims)
+        :param ttl: Seconds an outcome is remembered for
+        """
+        self._outcomes = Cache(
+            "turnstile_outcomes",
+            maxsize=maxsize,
+            ttl=ttl,
+            value_type=TurnstileOutcome,
+        )
+        self._claims = Cache(
+            "turnstile_claims",
+            maxsize=maxsize,
+            ttl=TOKEN_LIFETIME_SECONDS,
+            value_type=tuple[str, uuid.UUID],
+        )
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def get(self, token: str) -> TurnstileOutcome | None:
+        """
+        Get the outcome to replay for a token we have already validated (None if we haven't)
+        """
+        outcome = await self._outcomes.lookup(self._key(token))
+        if outcome is MISSING:
+            return None
+        return outcome.model_copy(
+            update={"error_codes": [*(outcome.error_codes or []), "replayed"]}
+        )
+
+    async def put(self, token: str, outcome: TurnstileOutcome) -> None:
+        """
+        Remember the outcome of a token
+
+        Pending outcomes are not remembered, nor are duplicates
+        (a concurrent attempt with the same token got the real outcome).
+        """
+        if outcome.pending or "timeout-or-duplicate" in (outcome.error_codes or []):
+            return
+        await self._outcomes.store(self._key(token), outcome)
+
+    async def claim(
+        self, token: str, payload: str, registrant_id: uuid.UUID
+    ) -> uuid.UUID | None:
+        """
+        Bind a token to the registration using it, atomically across workers
+
+        :param payload: Digest of the registration request
+        :param registrant_id: ID the registrant will be written with
+        :return: The registrant ID bound to the token (registrant_id, or the original one for a retry),
+            None if the token was used for another payload
+        """
+        claimed_payload, claimed_id = await self._claims.claim(
+            self._key(token), (payload, registrant_id)
+        )
+        return claimed_id if claimed_payload == payload else None
+
+    def __len__(self) -> int:
+        return len(self._outcomes)
+
+
+async def verify_turnstile_token(
+    client: httpx.AsyncClient,
+    token: str,
+    breaker: CircuitBreaker | None = None,
+    cache: TurnstileOutcomeCache | None = None,
+) -> TurnstileOutcome:
+    """
+    Validate a turnstile token against Cloudflare's siteverify API
+
+    More details: https://developers.cloudflare.com/turnstile/get-started/server-side-validation/
+
+    When Cloudflare is unavailable (timeouts, 5xx, or the circuit breaker is open)
+    the outcome is pending (see TurnstileOutcome.PENDING), instead of failing the user.
+    Tokens that were already validated (client retries) are answered from the cache,
+    registrations using them must claim them (see TurnstileOutcomeCache.claim).
+
+    :param client: HTTP client for https://challenges.cloudflare.com
+    :param token: The token sent by the client (X-Turnstile-Token header)
+    :param breaker: Circuit breaker guarding calls to Cloudflare
+    :param cache: Outcomes of recently validated tokens
+    """
+    if cache is not None and (outcome := await cache.get(token)) is not None:
+        return outcome
+
+    if breaker is not None and not breaker.allow():
+        logger.debug("Turnstile circuit is open, deferring validation")
+        return TurnstileOutcome.PENDING(token)
+
+    try:
+        outcome = await _siteverify(client, token)
+    except httpx.HTTPError as e:
+        # Timeouts, connection errors, exhausted connection pool, 5xx responses
+        logger.exception("Cloudflare is unavailable: %s", e, exc_info=e)
+        if breaker is not None:
+            breaker.record_failure()
+        return TurnstileOutcome.PENDING(token)
+
+    if breaker is not None:
+        breaker.record_success()
+    if cache is not None:
+        await cache.put(token, outcome)
+    return outcome
+
+
+async def _siteverify(client: httpx.AsyncClient, token: str) -> TurnstileOutcome:
+    """
+    :raises httpx.HTTPError: If Cloudflare is unavailable
+    """
+    data = {}
+    try:
+        response = await client.post(
+            "/turnstile/v0/siteverify",
+            timeout=CONFIG.turnstile_timeout,
+            data={
+                "secret": (
+                    CONFIG.turnstile_secret
+                    and CONFIG.turnstile_secret.get_secret_value()
+                ),  # Our secret
+                "response": token,  # Came from the client
+            },
+        )
+        response.raise_for_status()
+        data = response.json()
+        challenge_ts = datetime.fromisoformat(data["challenge_ts"])
+    except (KeyError, ValueError):
+        logger.debug("Invalid turnstile token (challenge_ts)")
+        return TurnstileOutcome(
+            success=False,
+            challenge_ts=None,
+            error_codes=data.get("error-codes", []),
+            hostname=data.get("hostname"),
+            action=data.get("action"),
+            data=data,
+        )
+    except httpx.HTTPStatusError as e:
+        if e.response.is_server_error:
+            raise
+        logger.exception(
+            "Error validating turnstile token: %s", e.response.text, exc_info=e
+        )
+        return TurnstileOutcome(
+            success=False,
+            challenge_ts=None,
+            error_codes=[e.response.text],
+            hostname=None,
+            action=None,
+            data=None,
+        )
+
+    return TurnstileOutcome(
+        success=data["success"],
+        challenge_ts=challenge_ts,
+        error_codes=data.get("error-codes", []),
+        hostname=data.get("hostname"),
+        action=data.get("action"),
+        data=data,
+    )
+
 
 def handle_turnstile_errors(outcome: TurnstileOutcome, name: str) -> None:
     """
@@ -42,3 +236,10 @@ def handle_turnstile_errors(outcome: TurnstileOutcome, name: str) -> None:
         status_code=403,
         detail="Invalid turnstile token" + PLAY_NICE_RESPONSE.format(name=name),
     )
+
+
+def turnstile_cache(request: fastapi.Request) -> TurnstileOutcomeCache:
+    """
+    Get the turnstile outcome cache from the request state
+    """
+    return cast(TurnstileOutcomeCache, request.state.turnstile_cache)
@@ -9,11 +9,27 @@ from starlette.authentication import BaseUser
 
 from server.string_manipulation import comma_separated
 
+if typing.TYPE_CHECKING:
+    from server.circuit_breaker import CircuitBreaker
+    from server.db.registrant import RegistrantBatcher
+    from server.db.room_stats import RegistrationCounter
+    from server.deploy import DeployScheduler
+    from server.invalidation import InvalidationChannel
+    from server.routes.live import LiveFeedHub
+    from server.turnstile import TurnstileOutcomeCache
+
 
 class State(TypedDict):
     cf_http_client: httpx.AsyncClient
-    gh_http_client: httpx.AsyncClient
+    deploy_scheduler: "DeployScheduler"
     db: async_sessionmaker[AsyncSession]
+    registrant_batcher: "RegistrantBatcher | None"
+    registrant_audit: "RegistrantBatcher"
+    turnstile_breaker: "CircuitBreaker"
+    turnstile_cache: "TurnstileOutcomeCache"
+    room_invalidation: "InvalidationChannel"
+    registration_counter: "RegistrationCounter"
+    live_feed_hub: "LiveFeedHub"
 
 
 DataT = typing.TypeVar("DataT")
@@ -79,11 +95,37 @@ class TurnstileOutcome(BaseModel):
     hostname: str | None = None
     action: str | None = None
     data: dict | None = None
+    pending: bool = (
+        False  # Cloudflare is unavailable, the token will be validated later
+    )
+    token: str | None = (
+        None  # Only kept for pending outcomes (needed to validate later)
+    )
 
     @classmethod
     def NO_TOKEN(cls):
         return cls(success=False, error_codes=["no-token"], challenge_ts=None)
 
+    @classmethod
+    def PENDING(cls, token: str):
+        """
+        Cloudflare couldn't be reached, accept the request for now and validate the token later
+        The time of the request stands in for the challenge timestamp until then
+        """
+        return cls(
+            success=False,
+            error_codes=[UNVERIFIED_PENDING],
+            challenge_ts=datetime.datetime.now(datetime.UTC),
+            pending=True,
+            token=token,
+        )
+
+
+UNVERIFIED_PENDING = "unverified-pending"
+"""
+Error code of turnstile outcomes that will be validated later (see TurnstileOutcome.PENDING)
+"""
+
 
 CommaSeparatedStr: TypeAlias = Annotated[
     str,
@@ -6,17 +6,24 @@ import CreateRoomCard from "./CreateRoomCard";
 import Spinner from "./Spinner";
 import WaitingRoomDashboardCard from "./WaitingRoomDashboardCard";
 
+// The server's maximum page size (a shorter page is the last one)
+const PAGE_SIZE = 100;
+
 export default function DashboardRoomsList() {
   const signInCheck = useSigninCheck();
-  const { data } = trpc.room.readMany.useQuery(
-    {},
-    {
-      refetchOnWindowFocus: true,
-      refetchInterval: false,
-      networkMode: "online",
-    },
-  );
-  const rooms = data?.map((room) => ({
+  const { data, hasNextPage, fetchNextPage, isFetchingNextPage } =
+    trpc.room.readMany.useInfiniteQuery(
+      { limit: PAGE_SIZE },
+      {
+        // The cursor of the last room of a page is where the next page starts
+        getNextPageParam: (lastPage) =>
+          lastPage.length < PAGE_SIZE ? undefined : lastPage.at(-1)?.cursor,
+        refetchOnWindowFocus: true,
+        refetchInterval: false,
+        networkMode: "online",
+      },
+    );
+  const rooms = data?.pages.flat().map((room) => ({
     ...room,
     opensAt: moment(room.opensAt).utc(true).local(),
     closesAt: moment(room.closesAt).utc(true).local(),
@@ -48,6 +55,16 @@ export default function DashboardRoomsList() {
             <Spinner />
           </>
         )}
+        {hasNextPage && (
+          <button
+            type="button"
+            disabled={isFetchingNextPage}
+            onClick={() => fetchNextPage()}
+            className="mt-2 mr-2 rounded bg-indigo-500 px-4 py-2 text-white hover:bg-indigo-700"
+          >
+            {isFetchingNextPage ? "Loading..." : "Load more rooms"}
+          </button>
+        )}
       </div>
     </>
   );
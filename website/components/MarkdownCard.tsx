@@ -1,13 +1,14 @@
+import { ReactNode } from "react";
 import { useContainerQuery } from "react-container-query";
-import ReactMarkdown from "react-markdown";
-import rehypeSanitize from "rehype-sanitize";
-import remarkGfm from "remark-gfm";
 
 type MarkdownProps = {
-  content: string;
   title: string;
   mobileImageBlob?: string;
   desktopImageBlob?: string;
+  /** Sanitized HTML, rendered by the server when the markdown was written */
+  html?: string;
+  /** Shown instead of html when there is none (the editor's preview) */
+  children?: ReactNode;
 };
 
 // NOTE: The query must be defined outside the component
@@ -19,14 +20,18 @@ const query = {
 };
 
 export default function MarkdownCard({
-  content,
+  html,
+  children,
   title,
   desktopImageBlob,
   mobileImageBlob,
 }: MarkdownProps) {
   const [params, containerRef] = useContainerQuery(query, {});
   const isMobile = params.isMobile;
-  const imageUrl = isMobile ? mobileImageBlob : desktopImageBlob;
+  const image = isMobile ? mobileImageBlob : desktopImageBlob;
+  // Stored images may come with a URL relative to the server
+  const imageUrl =
+    image && new URL(image, import.meta.env.PUBLIC_SERVER_URL).href;
 
   return (
     <div
@@ -41,85 +46,11 @@ export default function MarkdownCard({
       <h2 className="my-4 text-center font-extrabold text-3xl sm:text-4xl">
         {title}
       </h2>
-      <ReactMarkdown
-        allowedElements={[
-          "h1",
-          "h2",
-          "h3",
-          "h4",
-          "h5",
-          "img",
-          "p",
-          "a",
-          "ul",
-          "ol",
-          "li",
-          "b",
-          "i",
-          "strong",
-          "em",
-        ]}
-        remarkPlugins={[remarkGfm]}
-        rehypePlugins={[rehypeSanitize]}
-        components={{
-          /* eslint-disable @typescript-eslint/no-unused-vars */
-          h1: ({ node, ...props }) => (
-            <h1 {...props} className="my-1 font-bold text-2xl" dir="auto" />
-          ),
-          h2: ({ node, ...props }) => (
-            <h2 {...props} className="my-1 font-bold text-xl" dir="auto" />
-          ),
-          h3: ({ node, ...props }) => (
-            <h3 {...props} className="my-1 font-bold text-lg" dir="auto" />
-          ),
-          h4: ({ node, ...props }) => (
-            <h4 {...props} className="my-1 font-bold text-base" dir="auto" />
-          ),
-          h5: ({ node, ...props }) => (
-            <h5 {...props} className="my-1 font-bold text-sm" dir="auto" />
-          ),
-          img: ({ node, ...props }) => (
-            <div className="flex justify-center">
-              <img {...props} className="max-w-full" />
-            </div>
-          ),
-          p: ({ node, children, ...props }) => (
-            <>
-              <p {...props} className="text-base" dir="auto" />
-              <div {...props} dir="auto">
-                {children}
-              </div>
-            </>
-          ),
-          a: ({ node, ...props }) => (
-            <a {...props} className="text-blue-500 underline" dir="auto" />
-          ),
-          ul: ({ node, ...props }) => (
-            <ul {...props} className="list-inside list-disc" dir="auto" />
-          ),
-          ol: ({ node, ...props }) => (
-            <ol {...props} className="list-inside list-decimal" dir="auto" />
-          ),
-          li: ({ node, ...props }) => (
-            <li {...props} className="text-base" dir="auto" />
-          ),
-          b: ({ node, ...props }) => (
-            <b {...props} className="font-bold" dir="auto" />
-          ),
-          i: ({ node, ...props }) => (
-            <i {...props} className="italic" dir="auto" />
-          ),
-          strong: ({ node, ...props }) => (
-            <strong {...props} className="font-bold" dir="auto" />
-          ),
-          em: ({ node, ...props }) => (
-            <em {...props} className="italic" dir="auto" />
-          ),
-          /* eslint-enable @typescript-eslint/no-unused-vars */
-        }}
-      >
-        {content}
-      </ReactMarkdown>
+      {html === undefined ? (
+        <div className="markdown">{children}</div>
+      ) : (
+        <div className="markdown" dangerouslySetInnerHTML={{ __html: html }} />
+      )}
     </div>
   );
 }
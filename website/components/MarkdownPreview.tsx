@@ -0,0 +1,54 @@
+import ReactMarkdown from "react-markdown";
+import rehypeSanitize from "rehype-sanitize";
+import remarkGfm from "remark-gfm";
+
+/**
+ * Unsaved markdown, rendered in the browser while the organizer edits it.
+ * Mirrors what the server renders (server/markdown.py): same elements, dir="auto" on each.
+ */
+export default function MarkdownPreview({ markdown }: { markdown: string }) {
+  return (
+    <ReactMarkdown
+      allowedElements={[
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "img",
+        "p",
+        "a",
+        "ul",
+        "ol",
+        "li",
+        "b",
+        "i",
+        "strong",
+        "em",
+      ]}
+      remarkPlugins={[remarkGfm]}
+      rehypePlugins={[rehypeSanitize]}
+      components={{
+        /* eslint-disable @typescript-eslint/no-unused-vars */
+        h1: ({ node, ...props }) => <h1 {...props} dir="auto" />,
+        h2: ({ node, ...props }) => <h2 {...props} dir="auto" />,
+        h3: ({ node, ...props }) => <h3 {...props} dir="auto" />,
+        h4: ({ node, ...props }) => <h4 {...props} dir="auto" />,
+        h5: ({ node, ...props }) => <h5 {...props} dir="auto" />,
+        img: ({ node, ...props }) => <img {...props} dir="auto" />,
+        p: ({ node, ...props }) => <p {...props} dir="auto" />,
+        a: ({ node, ...props }) => <a {...props} dir="auto" />,
+        ul: ({ node, ...props }) => <ul {...props} dir="auto" />,
+        ol: ({ node, ...props }) => <ol {...props} dir="auto" />,
+        li: ({ node, ...props }) => <li {...props} dir="auto" />,
+        b: ({ node, ...props }) => <b {...props} dir="auto" />,
+        i: ({ node, ...props }) => <i {...props} dir="auto" />,
+        strong: ({ node, ...props }) => <strong {...props} dir="auto" />,
+        em: ({ node, ...props }) => <em {...props} dir="auto" />,
+        /* eslint-enable @typescript-eslint/no-unused-vars */
+      }}
+    >
+      {markdown}
+    </ReactMarkdown>
+  );
+}
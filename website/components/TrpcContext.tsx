@@ -1,10 +1,16 @@
 import { QueryClient, QueryClientProvider } from "@tanstack/react-query";
-import { httpLink } from "@trpc/client";
+import { httpBatchLink, httpLink, splitLink } from "@trpc/client";
 import { PropsWithChildren, useCallback, useEffect, useState } from "react";
 import { useAuth, useSigninCheck } from "reactfire";
 import { trpc } from "../utils/trpc";
 import { useTurnstile } from "./TurnstileContext";
 
+/**
+ * Procedures answered with ETag / Cache-Control (by the server, CDNs and the browser's cache),
+ * sent on their own: a batch is answered as a whole, without them
+ */
+const CACHEABLE_PROCEDURES = new Set(["room.readPublic"]);
+
 export default function TrpcContext({ children }: PropsWithChildren) {
   const [turnstileToken] = useTurnstile();
   const signInCheck = useSigninCheck();
@@ -24,15 +30,24 @@ export default function TrpcContext({ children }: PropsWithChildren) {
   const createClient = useCallback(() => {
     return trpc.createClient({
       links: [
-        httpLink({
-          url: import.meta.env.PUBLIC_SERVER_URL,
-          headers: headers,
-          fetch(url, options) {
-            return fetch(url, {
-              ...options,
-              credentials: "include",
-            });
-          },
+        splitLink({
+          condition: (op) => CACHEABLE_PROCEDURES.has(op.path),
+          // Public, no credentials: the same request for every visitor
+          true: httpLink({
+            url: import.meta.env.PUBLIC_SERVER_URL,
+          }),
+          false: httpBatchLink({
+            url: import.meta.env.PUBLIC_SERVER_URL,
+            // Batched inputs travel in the query string of GET requests
+            maxURLLength: 2083,
+            headers: headers,
+            fetch(url, options) {
+              return fetch(url, {
+                ...options,
+                credentials: "include",
+              });
+            },
+          }),
         }),
       ],
     });
@@ -8,6 +8,7 @@ import { Link } from "../renderer/Link";
 import { eventChoiceSchema } from "../types/eventChoicesSchema";
 import type { RoomUpdateInput } from "../types/roomsProcedures";
 import { trpc } from "../utils/trpc";
+import MarkdownPreview from "./MarkdownPreview";
 import Spinner from "./Spinner";
 import { WaitingRoomPage } from "./WaitingRoomPage";
 
@@ -497,7 +498,6 @@ export default function WaitingRoomEditor({ id }: WaitingRoomContentProps) {
         <div className="w-full max-w-3xl xl:w-1/2">
           <WaitingRoomPage
             title={liveTitle}
-            content={liveMarkdown}
             mobileImageBlob={smallImageUrl}
             desktopImageBlob={largeImageUrl}
             waitingRoomId={id}
@@ -505,7 +505,9 @@ export default function WaitingRoomEditor({ id }: WaitingRoomContentProps) {
             closesAt={liveClosesAt}
             ownerEmail={user.data?.email ?? "not signed in"}
             eventChoices={liveEventChoices}
-          />
+          >
+            <MarkdownPreview markdown={liveMarkdown} />
+          </WaitingRoomPage>
         </div>
       </div>
     </>
@@ -1,9 +1,13 @@
 import moment from "moment/moment";
+import { ReactNode } from "react";
 import MarkdownCard from "./MarkdownCard";
 import WaitingRoomForm from "./WaitingRoomForm";
 
 export function WaitingRoomPage(props: {
-  content: string;
+  /** The room's sanitized HTML (room pages) */
+  html?: string;
+  /** Rendered in place of html (the editor's live preview) */
+  children?: ReactNode;
   title: string;
   mobileImageBlob: string;
   desktopImageBlob: string;
@@ -16,11 +20,13 @@ export function WaitingRoomPage(props: {
   return (
     <div className="mx-auto max-w-3xl">
       <MarkdownCard
-        content={props.content}
+        html={props.html}
         title={props.title}
         mobileImageBlob={props.mobileImageBlob}
         desktopImageBlob={props.desktopImageBlob}
-      />
+      >
+        {props.children}
+      </MarkdownCard>
       <WaitingRoomForm
         waitingRoomId={props.waitingRoomId}
         opensAt={moment(props.opensAt).toDate()}
@@ -6,8 +6,10 @@ import { protectedProcedure, publicProcedure, router } from "./trpc";
 
 import {
   RoomCreateOutput,
+  RoomLiveTicketOutput,
   RoomParticipantsOutput,
   RoomReadManyOutput,
+  RoomReadPublicOutput,
   RoomReadUniqueOutput,
   RoomStatsOutput,
   RoomUpdateOutput,
@@ -31,6 +33,11 @@ export const appRouter = router({
       .query(async (): Promise<RoomReadUniqueOutput> => {
         return {} as RoomReadUniqueOutput;
       }),
+    readPublic: publicProcedure
+      .input(roomQueryInputSchema)
+      .query(async (): Promise<RoomReadPublicOutput> => {
+        return {} as RoomReadPublicOutput;
+      }),
     readMany: protectedProcedure
       .input(roomReadManyInputSchema)
       .query(async (): Promise<RoomReadManyOutput> => {
@@ -61,6 +68,11 @@ export const appRouter = router({
       .query(async (): Promise<RoomParticipantsOutput> => {
         return {} as RoomParticipantsOutput;
       }),
+    liveTicket: protectedProcedure
+      .input(roomQueryInputSchema)
+      .query(async (): Promise<RoomLiveTicketOutput> => {
+        return {} as RoomLiveTicketOutput;
+      }),
   }),
 });
 
@@ -1,11 +1,103 @@
 import moment from "moment";
+import { useEffect, useState } from "react";
 import CountUp from "react-countup";
 import Spinner from "../../../../components/Spinner";
 import { usePageContext } from "../../../../renderer/usePageContext";
+import type {
+  RoomParticipantsOutput,
+  RoomStatsOutput,
+} from "../../../../types/roomsProcedures";
 import { trpc } from "../../../../utils/trpc";
 
 export { Page };
 
+const RECONNECT_DELAY_MS = 5000;
+const LATEST_REGISTRANTS = 10;
+
+type LiveRegistrant = RoomParticipantsOutput["registrants"][number];
+
+/**
+ * Subscribe to the room's live feed (Server-Sent Events pushed by the server):
+ * its stats, and the registrants written since the page opened (latest first)
+ *
+ * EventSource can't send an Authorization header,
+ * the feed is opened with a short-lived ticket instead.
+ * The browser reconnects by itself when the stream drops, a refused reconnection
+ * (e.g. with an expired ticket) is retried with a new ticket.
+ */
+function useLiveFeed(id: string) {
+  const utils = trpc.useUtils();
+  const [stats, setStats] = useState<RoomStatsOutput | null>(null);
+  const [registrants, setRegistrants] = useState<LiveRegistrant[]>([]);
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    let source: EventSource | undefined;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const reconnect = () => {
+      setConnected(false);
+      if (!closed) {
+        retry = setTimeout(connect, RECONNECT_DELAY_MS);
+      }
+    };
+
+    const connect = async () => {
+      let ticket: string;
+      try {
+        ({ ticket } = await utils.room.liveTicket.fetch(
+          { id },
+          { staleTime: 0 },
+        ));
+      } catch (error) {
+        console.error(error);
+        reconnect();
+        return;
+      }
+      if (closed) {
+        return;
+      }
+      const serverUrl = import.meta.env.PUBLIC_SERVER_URL.replace(/\/$/, "");
+      const input = encodeURIComponent(JSON.stringify({ id, ticket }));
+      source = new EventSource(`${serverUrl}/room.live?input=${input}`, {
+        withCredentials: true,
+      });
+      source.onopen = () => setConnected(true);
+      source.addEventListener("stats", (event) => {
+        setStats(JSON.parse((event as MessageEvent<string>).data));
+      });
+      source.addEventListener("registrants", (event) => {
+        const data: RoomParticipantsOutput = JSON.parse(
+          (event as MessageEvent<string>).data,
+        );
+        setRegistrants((latest) =>
+          [...data.registrants.reverse(), ...latest].slice(
+            0,
+            LATEST_REGISTRANTS,
+          ),
+        );
+      });
+      source.onerror = () => {
+        if (source?.readyState === EventSource.CLOSED) {
+          reconnect();
+        } else {
+          setConnected(false);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }, [id, utils]);
+
+  return { stats, registrants, connected };
+}
+
 function Page() {
   const pageContext = usePageContext();
   const id = pageContext.routeParams?.id as string;
@@ -15,16 +107,7 @@ function Page() {
       networkMode: "offlineFirst",
     },
   );
-  const stats = trpc.room.stats.useQuery(
-    { id },
-    {
-      retry: false,
-      refetchOnWindowFocus: true,
-      refetchInterval: 5000,
-      networkMode: "online",
-      initialData: { registrantsCount: 0, id },
-    },
-  );
+  const feed = useLiveFeed(id);
   const participants = trpc.room.registrants.useQuery(
     { id },
     {
@@ -47,17 +130,55 @@ function Page() {
                 Stats
               </h3>
               <div>
-                {stats.isFetching ? (
-                  <Spinner />
-                ) : (
+                {feed.connected ? (
                   <Spinner className="opacity-0" />
+                ) : (
+                  <Spinner />
                 )}
               </div>
               <p className="">
                 Participants in this room:{" "}
-                <CountUp end={stats.data?.registrantsCount} preserveValue />
+                <CountUp
+                  end={feed.stats?.registrantsCount ?? 0}
+                  preserveValue
+                />
               </p>
-              <p>(updates every 5 seconds)</p>
+              <p>(live)</p>
+            </div>
+          </div>
+        </div>
+        <div className="mx-auto max-w-3xl">
+          <div className="overflow-hidden bg-white bg-opacity-80 shadow sm:rounded-lg">
+            <div className="px-4 py-5 sm:px-6">
+              <h3 className="font-medium text-gray-900 text-lg leading-6">
+                Latest registrants
+              </h3>
+              {feed.registrants.length === 0 ? (
+                <p className="text-gray-500">
+                  New registrants will show up here
+                </p>
+              ) : (
+                <ul className="divide-y divide-gray-200">
+                  {feed.registrants.map((registrant) => (
+                    <li
+                      key={registrant.id}
+                      className="flex justify-between py-2"
+                    >
+                      <span>
+                        {registrant.legalName}
+                        {registrant.eventChoice &&
+                          ` (${registrant.eventChoice})`}
+                      </span>
+                      <span className="text-gray-500">
+                        {moment
+                          .utc(registrant.createdAt)
+                          .local()
+                          .format("HH:mm:ss")}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
             </div>
           </div>
         </div>
@@ -1,7 +1,6 @@
-import moment from "moment";
 import { render } from "vite-plugin-ssr/abort";
 import { PageContextServer } from "../../../renderer/types";
-import { findPublishedRooms, findRoomById } from "../../../utils/queries";
+import { fetchPublicRoom, findPublishedRooms } from "../../../utils/queries";
 
 export { onBeforeRender, prerender };
 
@@ -12,27 +11,14 @@ async function prerender() {
 
 async function onBeforeRender(pageContext: PageContextServer) {
   const id = pageContext.routeParams.id;
-  const room = await findRoomById(id);
+  const room = await fetchPublicRoom(id);
   if (!room) {
     throw render(404, "Room not found");
   }
-  if (!room.published) {
-    throw render(403, "Room not published");
-  }
 
   return {
     pageContext: {
-      pageProps: {
-        id: room.id,
-        title: room.title,
-        markdown: room.markdown,
-        opensAt: moment(room.opensAt).toISOString(),
-        closesAt: moment(room.closesAt).toISOString(),
-        ownerEmail: room.owner.email,
-        mobileImageBlob: room.mobileImageBlob,
-        desktopImageBlob: room.desktopImageBlob,
-        eventChoices: room.eventChoices,
-      },
+      pageProps: room,
     },
   };
 }
@@ -1,5 +1,6 @@
 import { WaitingRoomPage } from "../../../components/WaitingRoomPage";
 import { inferProps } from "../../../renderer/types";
+import { trpc } from "../../../utils/trpc";
 import type { onBeforeRender } from "./index.page.server";
 
 export { Page };
@@ -17,29 +18,24 @@ See you around!
 
 - Soof`);
 
-function Page({
-  id,
-  markdown,
-  title,
-  opensAt,
-  closesAt,
-  ownerEmail,
-  mobileImageBlob,
-  desktopImageBlob,
-  eventChoices,
-}: Props) {
+function Page(props: Props) {
+  // The page is prerendered, visitors pick up later edits from the (cached) public endpoint
+  const { data: room } = trpc.room.readPublic.useQuery(
+    { id: props.id },
+    { initialData: props },
+  );
   return (
     <div className="mx-auto max-w-7xl px-2 lg:px-8">
       <WaitingRoomPage
-        content={markdown}
-        title={title}
-        mobileImageBlob={mobileImageBlob}
-        desktopImageBlob={desktopImageBlob}
-        waitingRoomId={id}
-        opensAt={opensAt}
-        closesAt={closesAt}
-        ownerEmail={ownerEmail}
-        eventChoices={eventChoices}
+        html={room.html}
+        title={room.title}
+        mobileImageBlob={room.mobileImageBlob}
+        desktopImageBlob={room.desktopImageBlob}
+        waitingRoomId={room.id}
+        opensAt={room.opensAt}
+        closesAt={room.closesAt}
+        ownerEmail={room.ownerEmail}
+        eventChoices={room.eventChoices}
       />
     </div>
   );
@@ -13,6 +13,7 @@ export const roomQueryOutputSchema = z.object({
   desktopImageBlob: z.string().nullable(),
   mobileImageBlob: z.string().nullable(),
   eventChoices: eventChoiceSchema,
+  html: z.string().nullish(),
 });
 
 export const roomMutationInputSchema = z.object({
@@ -64,8 +65,14 @@ export const roomReadUniqueOutputSchema = roomQueryOutputSchema;
 export type RoomReadUniqueInput = z.infer<typeof roomQueryInputSchema>;
 export type RoomReadUniqueOutput = z.infer<typeof roomReadUniqueOutputSchema>;
 
-export const roomReadManyInputSchema = z.object({});
-export const roomReadManyOutputSchema = z.array(roomReadUniqueOutputSchema);
+export const roomReadManyInputSchema = z.object({
+  cursor: z.string().optional(),
+  limit: z.number().int().positive().max(100).optional(),
+});
+export const roomSummaryOutputSchema = roomQueryOutputSchema
+  .omit({ markdown: true, desktopImageBlob: true, mobileImageBlob: true })
+  .extend({ registrantsCount: z.number(), cursor: z.string() });
+export const roomReadManyOutputSchema = z.array(roomSummaryOutputSchema);
 
 export type RoomReadManyInput = z.infer<typeof roomReadManyInputSchema>;
 export type RoomReadManyOutput = z.infer<typeof roomReadManyOutputSchema>;
@@ -87,6 +94,29 @@ export type RoomUpdateOutput = z.infer<typeof roomUpdateOutputSchema>;
 
 export type RoomStatsOutput = z.infer<typeof roomStatsOutputSchema>;
 
+export const roomReadPublicOutputSchema = z.object({
+  id: z.string().uuid(),
+  title: z.string(),
+  markdown: z.string(),
+  html: z.string(),
+  desktopImageBlob: z.string().nullable(),
+  mobileImageBlob: z.string().nullable(),
+  opensAt: z.string(),
+  closesAt: z.string(),
+  eventChoices: eventChoiceSchema,
+  ownerEmail: z.string(),
+  updatedAt: z.string(),
+});
+
+export type RoomReadPublicOutput = z.infer<typeof roomReadPublicOutputSchema>;
+
+export const roomLiveTicketOutputSchema = z.object({
+  ticket: z.string(),
+  expiresAt: z.number(),
+});
+
+export type RoomLiveTicketOutput = z.infer<typeof roomLiveTicketOutputSchema>;
+
 export type RoomParticipantsOutput = z.infer<
   typeof roomParticipantsOutputSchema
 >;
@@ -1,5 +1,9 @@
 import moment from "moment/moment";
 import { prisma } from "../server/db";
+import {
+  type RoomReadPublicOutput,
+  roomReadPublicOutputSchema,
+} from "../types/roomsProcedures";
 
 const roomFilter = {
   published: true,
@@ -22,14 +26,22 @@ export async function findPublishedRooms() {
   });
 }
 
-export async function findRoomById(id: string) {
-  return prisma.waitingRoom.findFirst({
-    where: {
-      id,
-      ...roomFilter,
-    },
-    include: {
-      owner: true,
-    },
-  });
+/**
+ * A published room as the server's public (cached) endpoint serves it, null when it doesn't exist or isn't published.
+ * Its markdown is already rendered to sanitized HTML, and its image URLs resolved.
+ */
+export async function fetchPublicRoom(
+  id: string,
+): Promise<RoomReadPublicOutput | null> {
+  const serverUrl = import.meta.env.PUBLIC_SERVER_URL.replace(/\/$/, "");
+  const input = encodeURIComponent(JSON.stringify({ id }));
+  const response = await fetch(`${serverUrl}/room.readPublic?input=${input}`);
+  if (response.status === 404) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`room.readPublic failed with ${response.status}`);
+  }
+  const body = await response.json();
+  return roomReadPublicOutputSchema.parse(body.result.data);
 }